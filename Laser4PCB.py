@@ -1,10 +1,16 @@
+import os
+import sys
+import time
+
+# Referencia de --profile-startup, tomada antes de importar wx
+_STARTUP_T0 = time.perf_counter()
+
 import threading
 import wx
 import wx.adv
 import wx.svg
 import app_base as ab
-from gcode_generator import generate_gcode, parse_gcode_for_preview
-from grbl_communicator import GrblCommunicator
+from profile_dialog import ProfileDialog
 from settings_dialog import EVT_CONFIG_UPDATED, SettingsDialog
 from utils import (
     build_wildcard,
@@ -13,25 +19,81 @@ from utils import (
     primitives_to_geometry,
 )
 import logging
-from gerber_parser import GerberParser
 from vector_canvas import VectorCanvas
 from pathlib import Path
 
+# El parser, el generador y la comunicación (shapely, numpy, asyncio, pyserial)
+# se importan después de mostrar la ventana, en _background_startup o al usarse.
+
+
+class StartupProfile:
+    """Tiempos de las fases del arranque, que se imprimen con --profile-startup."""
+
+    def __init__(self, t0):
+        self.enabled = False
+        self.t0 = t0
+        self.last = t0
+        self.phases = []
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """Cierra una fase del hilo principal, que empezó en la marca anterior."""
+        now = time.perf_counter()
+        self.record(phase, self.last, now)
+        self.last = now
+
+    def record(self, phase, start, end=None):
+        end = time.perf_counter() if end is None else end
+        with self._lock:
+            self.phases.append((phase, start - self.t0, end - start))
+
+    def report(self):
+        if not self.enabled:
+            return
+        print(f"{'phase':28s} {'start':>9s} {'duration':>9s}")
+        for phase, start, duration in sorted(self.phases, key=lambda p: p[1]):
+            print(f"{phase:28s} {start * 1000:7.1f}ms {duration * 1000:7.1f}ms")
+
+
+startup = StartupProfile(_STARTUP_T0)
+
 
 class L4PFrame(wx.Frame):
     global _
 
+    MOVEMENT_COMMANDS = {
+        "UpLeft": "G91 G0 X-10Y10 F3000",
+        "Up": "G91 G0 Y10 F3000",
+        "UpRight": "G91 G0 X10Y10 F3000",
+        "Left": "G91 G0 X-10 F3000",
+        "Stop": b"\x18",
+        "Right": "G91 G0 X10 F3000",
+        "DownLeft": "G91 G0 X-10Y-10 F3000",
+        "Down": "G91 G0 Y-10 F3000",
+        "DownRight": "G91 G0 X10Y-10 F3000",
+    }
+
     def __init__(self, parent, **kwds):
         super(L4PFrame, self).__init__(parent, **kwds)
 
         self.primitives = []
         self.gcode_lines = []
-        self.grbl = GrblCommunicator()
+        # Se crea al terminar de cargar los módulos en segundo plano
+        self.grbl = None
         self.communication_thread = None
+        # Envío en curso: lo último confirmado e informado por GRBL, que un
+        # temporizador pasa a la vista del G-code 10 veces por segundo
+        self.stream_thread = None
+        self._acked_line = 0
+        self._status_report = None
+        self._work_offset = (0.0, 0.0, 0.0)
+        self._pending_icons = []
+        self._pending_startup_tasks = 0
 
         self.panel = None
         self.notebook = None
         self.controls_panel = None
+        self.stop_button = None
         self.log_text = None
 
         # IDs para Menús y Atajos
@@ -44,10 +106,14 @@ class L4PFrame(wx.Frame):
         self.ID_MNU_CTRL_SET_HOME = wx.NewIdRef()
         self.ID_MNU_GO_HOME = wx.NewIdRef()
         self.ID_MNU_CTRL_SEND = wx.NewIdRef()
+        self.ID_MNU_CTRL_RESUME = wx.NewIdRef()
+        self.ID_MNU_PROFILING = wx.NewIdRef()
 
         self.status_queue = []
         self.status_timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self.OnClearStatus, self.status_timer)
+        self.progress_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.OnProgressTimer, self.progress_timer)
 
         self.init_ui()
         self._enable_movement_controls(False)
@@ -178,7 +244,13 @@ class L4PFrame(wx.Frame):
                         _("Preferences\tCtrl+P"),
                         _("Open configuration dialog"),
                         self.OnConfiguracion,
-                    )
+                    ),
+                    (
+                        self.ID_MNU_PROFILING,
+                        _("Profiling...\tCtrl+Shift+P"),
+                        _("Show the time spent in each processing stage"),
+                        self.OnProfiling,
+                    ),
                 ],
             ),
             (
@@ -202,6 +274,12 @@ class L4PFrame(wx.Frame):
                         _("Send to engraver"),
                         self.OnSend,
                     ),
+                    (
+                        self.ID_MNU_CTRL_RESUME,
+                        _("Resume from line...\tCtrl+U"),
+                        _("Resume an interrupted job from a given line"),
+                        self.OnResume,
+                    ),
                 ],
             ),
             (
@@ -239,11 +317,8 @@ class L4PFrame(wx.Frame):
 
         # --- Crear los widgets ---
         port_label = wx.StaticText(comm_panel, label=_("Port:"))
-        self.port_combo = wx.ComboBox(
-            comm_panel,
-            choices=GrblCommunicator.get_available_ports(),
-            style=wx.CB_READONLY,
-        )
+        # Los puertos se enumeran en segundo plano (ver _background_startup)
+        self.port_combo = wx.ComboBox(comm_panel, style=wx.CB_READONLY)
 
         speed_label = wx.StaticText(comm_panel, label=_("Speed:"))
 
@@ -297,6 +372,7 @@ class L4PFrame(wx.Frame):
         return comm_panel
 
     def populate_grid(self, grid, panel, buttons_data):
+        buttons = []
         for label, command, tooltip, icon in buttons_data:
             if isinstance(command, str):
                 def handler(event, cmd=command):
@@ -305,18 +381,14 @@ class L4PFrame(wx.Frame):
                 handler = command
             button = wx.Button(panel, size=(64, 64), label=label)
             if icon:
-                try :
-                    # ico = wx.Bitmap(f'resources/{icon}', wx.BITMAP_TYPE_ANY)
-                    # ico.SetScaleFactor(scale= ico.Width/42)
-                    # button.SetBitmap(ico)
-                    ico=wx.svg.SVGimage.CreateFromFile(f'resources/{icon}')
-                    button.SetBitmap(ico.ConvertToScaledBitmap((36,36)))
-                except Exception as e :
-                    logging.warning(_("Failed to load icon: {icon}. Error: {e}").format(icon=icon, e=e))
+                # Los SVG se rasterizan con la ventana ya visible (_load_next_icon)
+                self._pending_icons.append((button, icon))
 
             button.SetToolTip(tooltip)
             button.Bind(wx.EVT_BUTTON, handler)
             grid.Add(button, 0, wx.EXPAND)
+            buttons.append(button)
+        return buttons
 
     def create_buttons_layout(self, parent_sizer):
         self.controls_panel = wx.Panel(self.panel, style=wx.BORDER_NONE)
@@ -346,7 +418,9 @@ class L4PFrame(wx.Frame):
         movement_grid = wx.GridSizer(3, 3, 8, 8)
         action_grid = wx.GridSizer(1, 3, 8, 8)
 
-        self.populate_grid(movement_grid, self.controls_panel, move_buttons)
+        movement = self.populate_grid(movement_grid, self.controls_panel, move_buttons)
+        # Durante un envío solo queda activo el paro (comando de tiempo real)
+        self.stop_button = movement[4]
         self.populate_grid(action_grid, self.controls_panel, action_buttons)
 
         controls_sizer.Add(movement_grid, 0, wx.ALIGN_CENTER | wx.ALL, 10)
@@ -391,10 +465,72 @@ class L4PFrame(wx.Frame):
 
         return gcode_grid_sizer
 
+    def start_deferred(self):
+        """
+        Tareas de arranque que no hacen falta para mostrar la ventana: importar
+        los módulos pesados, enumerar los puertos y rasterizar los iconos.
+        """
+        startup.mark("first idle (window visible)")
+        self._pending_startup_tasks = 2
+        threading.Thread(
+            target=self._background_startup, name="startup", daemon=True
+        ).start()
+        wx.CallAfter(self._load_next_icon, time.perf_counter())
+
+    def _background_startup(self):
+        start = time.perf_counter()
+        import gcode_generator  # noqa: F401
+        import gerber_parser  # noqa: F401
+        from grbl_communicator import GrblCommunicator
+
+        startup.record("background imports", start)
+        start = time.perf_counter()
+        try:
+            ports = GrblCommunicator.get_available_ports()
+        except Exception as e:
+            logging.warning(f"Error listing serial ports: {e}")
+            ports = []
+        startup.record("port enumeration", start)
+        wx.CallAfter(self._on_background_ready, ports)
+
+    def _on_background_ready(self, ports):
+        if not self:
+            return
+        from grbl_communicator import GrblCommunicator
+
+        self.grbl = GrblCommunicator()
+        self.grbl.checkpoint_file = f"{app.AppName}.checkpoint"
+        self.port_combo.Set(ports)
+        self._startup_task_done()
+
+    def _load_next_icon(self, start):
+        # Un icono por iteración del bucle de eventos para no bloquear la ventana
+        if not self:
+            return
+        if self._pending_icons:
+            button, icon = self._pending_icons.pop(0)
+            try:
+                ico = wx.svg.SVGimage.CreateFromFile(f"resources/{icon}")
+                button.SetBitmap(ico.ConvertToScaledBitmap((36, 36)))
+            except Exception as e:
+                logging.warning(
+                    _("Failed to load icon: {icon}. Error: {e}").format(icon=icon, e=e)
+                )
+            wx.CallAfter(self._load_next_icon, start)
+        else:
+            startup.record("icons", start)
+            self._startup_task_done()
+
+    def _startup_task_done(self):
+        self._pending_startup_tasks -= 1
+        if self._pending_startup_tasks == 0:
+            startup.report()
+
     def OnUpdateUI(self, event):
         eventId = event.GetId()
-        is_connected = self.grbl.is_connected()
+        is_connected = self.grbl is not None and self.grbl.is_connected()
         has_primitives = len(self.primitives) > 0
+        streaming = self._is_streaming()
 
         if eventId in (self.ID_MNU_SAVE_GCODE, self.ID_MNU_SAVE_IMG):
             event.Enable(has_primitives)
@@ -402,8 +538,9 @@ class L4PFrame(wx.Frame):
             self.ID_MNU_CTRL_SET_HOME,
             self.ID_MNU_GO_HOME,
             self.ID_MNU_CTRL_SEND,
+            self.ID_MNU_CTRL_RESUME,
         ):
-            event.Enable(is_connected)
+            event.Enable(is_connected and not streaming)
         else:
             event.Skip()
 
@@ -514,12 +651,16 @@ class L4PFrame(wx.Frame):
             info = _("Loading GCODE from: {pathname}").format(pathname=pathname.name)
 
             try:
-                self.gcode_lines = pathname.read_text().splitlines()
+                from gcode_document import GCodeDocument
+                from gcode_generator import parse_gcode_for_preview
+
+                self._set_gcode_lines(GCodeDocument.open(pathname))
                 self.canvas_gcode.set_graphic_info(
                     parse_gcode_for_preview(self.gcode_lines)
                 )
                 self.set_status(info)
                 logging.info(info)
+                self._show_estimate()
             except IOError as e:
                 error = _("Error loading GCODE file {filename}: {e}").format(
                     filename=pathname.name, e=e
@@ -528,6 +669,8 @@ class L4PFrame(wx.Frame):
                 self.set_status(error, high_priority=True)
 
     def OnGuardarGCode(self, event):
+        from gcode_document import GCodeDocument
+
         with wx.FileDialog(
             self,
             _("Save GCODE file"),
@@ -541,7 +684,10 @@ class L4PFrame(wx.Frame):
             info = _("Saving GCODE in: {pathname}").format(pathname=pathname.name)
 
             try:
-                pathname.write_text("\n".join(self.gcode_lines))
+                if isinstance(self.gcode_lines, GCodeDocument):
+                    pathname.write_bytes(self.gcode_lines.buffer)
+                else:
+                    pathname.write_text("\n".join(self.gcode_lines))
                 self.set_status(info)
                 logging.info(info)
             except IOError as e:
@@ -585,6 +731,10 @@ class L4PFrame(wx.Frame):
             else:
                 self.set_status(_("Canceled by the user"))
 
+    def OnProfiling(self, event):
+        with ProfileDialog(self) as dialog:
+            dialog.ShowModal()
+
     def OnQuit(self, event):
         self.Close()
 
@@ -607,6 +757,8 @@ class L4PFrame(wx.Frame):
         if not port:
             self.log_message("Por favor, selecciona un puerto.")
             return
+        if self.grbl is None:
+            return
 
         if self.grbl.serial_port and self.grbl.serial_port.is_open:
             self.grbl.disconnect()
@@ -621,38 +773,137 @@ class L4PFrame(wx.Frame):
             self.communication_thread.start()
 
     def OnMovementCommand(self, event, command_name):
+        from grbl_transport import is_realtime_command
+
+        command = self.MOVEMENT_COMMANDS.get(command_name)
+        # Durante un envío cualquier otra línea se colaría en el trabajo
+        if not command or (
+            self._is_streaming() and not is_realtime_command(command)
+        ):
+            return
         self.set_status(_("Move head: {command}").format(command=command_name))
-        commands = {
-            "UpLeft": "G91 G0 X-10Y10 F3000",
-            "Up": "G91 G0 Y10 F3000",
-            "UpRight": "G91 G0 X10Y10 F3000",
-            "Left": "G91 G0 X-10 F3000",
-            "Stop": b"\x18",
-            "Right": "G91 G0 X10 F3000",
-            "DownLeft": "G91 G0 X-10Y-10 F3000",
-            "Down": "G91 G0 Y-10 F3000",
-            "DownRight": "G91 G0 X10Y-10 F3000",
-        }
-        command = commands.get(command_name)
-        if command:
-            self.grbl.send_command(command)
+        self.grbl.send_command(command)
 
     def OnSetOrigin(self, event):
+        if self._is_streaming():
+            return
         self.set_status(_("Setting origin"))
         self.grbl.send_command("G92 X0 Y0 Z0")
 
     def OnGoHome(self, event):
+        if self._is_streaming():
+            return
         self.set_status(_("Going to origin"))
         self.grbl.send_command("G28")
 
     def OnSend(self, event):
+        if self._is_streaming():
+            return
         self.set_status(_("Sending..."))
-        self.grbl.stream_gcode_text(self.gcode_lines)
+        self._stream_gcode()
+
+    def OnResume(self, event):
+        total = len(self.gcode_lines)
+        if total == 0 or self._is_streaming():
+            return
+        checkpoint = self.grbl.load_checkpoint()
+        value = 1
+        # Los envíos por bloques cuentan líneas limpias, no las del programa
+        if (
+            checkpoint
+            and checkpoint.get("resumable", True)
+            and checkpoint.get("total") == total
+        ):
+            # No la siguiente a la última confirmada: GRBL puede no haber
+            # ejecutado aún las que tenía en el planificador
+            value = min(checkpoint["resume"], total)
+        start_line = wx.GetNumberFromUser(
+            _("The job will be resumed restoring the machine state."),
+            _("Line:"),
+            _("Resume from line"),
+            value,
+            1,
+            total,
+            self,
+        )
+        if start_line < 1:
+            return
+        self.set_status(_("Resuming from line {line}...").format(line=start_line))
+        self._stream_gcode(start_line)
+
+    def _stream_gcode(self, start_line=1):
+        from gcode_document import GCodeDocument
+        from gcode_estimator import toolpath_moves
+
+        if self._is_streaming():
+            return
+        self.grbl.laser_off_cmd = app.config["Engraver"]["laser_off_cmd"]
+        document = self.gcode_lines
+        if not isinstance(document, GCodeDocument):
+            document = GCodeDocument.from_lines(document)
+        self.canvas_gcode.set_progress_moves(toolpath_moves(document))
+        self._acked_line = start_line - 1
+        self._status_report = None
+        self.canvas_gcode.set_progress(self._acked_line)
+        self.grbl.start_status_polling(self._on_status_report, interval=0.1)
+        self.progress_timer.Start(100)
+        self.stream_thread = threading.Thread(
+            target=self._stream_thread, args=(document, start_line), daemon=True
+        )
+        self.stream_thread.start()
+        self._enable_movement_controls(False, keep_stop=True)
+
+    def _stream_thread(self, document, start_line):
+        try:
+            self.grbl.stream_gcode_document(
+                document, progress=self._on_stream_progress, start_line=start_line
+            )
+        finally:
+            wx.CallAfter(self._stream_finished)
+
+    def _on_stream_progress(self, line, total):
+        # Llega desde el hilo del transporte en cada línea: solo se guarda
+        self._acked_line = line
+
+    def _on_status_report(self, report):
+        self._status_report = report
+
+    def _is_streaming(self):
+        return self.stream_thread is not None and self.stream_thread.is_alive()
+
+    def _stream_finished(self):
+        self.stream_thread = None
+        self._enable_movement_controls(self.grbl.is_connected())
+        self.progress_timer.Stop()
+        self.grbl.stop_status_polling()
+        self.OnProgressTimer(None)
+
+    def OnProgressTimer(self, event):
+        from grbl_communicator import parse_status
+
+        self.canvas_gcode.set_progress(self._acked_line)
+        report = self._status_report
+        if report is None:
+            return
+        status = parse_status(report)
+        self._work_offset = status.get("WCO", self._work_offset)
+        if "WPos" in status:
+            position = status["WPos"][:2]
+        elif "MPos" in status:
+            mpos, wco = status["MPos"], self._work_offset
+            position = (mpos[0] - wco[0], mpos[1] - wco[1])
+        else:
+            return
+        self.canvas_gcode.set_head_position(position)
 
     def _load_gerber(self, paths):
+        from gerber_parser import GerberParser
+
         for file in paths:
             self.notebook.SetSelection(0)
-            gerber = GerberParser()
+            gerber = GerberParser(
+                max_chord_error=app.config["GCode"].getfloat("max_chord_error")
+            )
             gerber.parse(filepath=str(file))
             self.primitives = gerber.get_primitives()
             self._process_gerber()
@@ -666,13 +917,57 @@ class L4PFrame(wx.Frame):
         self.canvas_gerber.set_graphic_info(geometry_to_polygons((self.geometry)))
 
     def _process_gcode(self):
+        from gcode_document import GCodeDocument
+        from gcode_generator import generate_gcode, parse_gcode_for_preview
+
         if self.primitives:
-            self.gcode_lines = generate_gcode(
-                self.geometry, app.get_config(), app.AppName
-            )
+            config = app.get_config()
+            tile_size = config["GCode"]["tile_size"]
+            if tile_size > 0:
+                from tiling import generate_gcode_tiled
+
+                gcode_lines = GCodeDocument(
+                    b"".join(
+                        generate_gcode_tiled(
+                            self.primitives,
+                            config,
+                            app.AppName,
+                            tile_size,
+                            config["GCode"]["invert_layer"],
+                            jobs=os.cpu_count() or 1,
+                        )
+                    )
+                )
+            else:
+                gcode_lines = generate_gcode(self.geometry, config, app.AppName)
+            self._set_gcode_lines(gcode_lines)
             self.canvas_gcode.set_graphic_info(
                 parse_gcode_for_preview(self.gcode_lines)
             )
+            self._show_estimate()
+
+    def _show_estimate(self):
+        from gcode_estimator import estimate_job, format_duration, machine_settings
+
+        # El G-code generado trae ya su estimación; el cargado de fichero no
+        estimate = getattr(self.gcode_lines, "estimate", None)
+        if estimate is None:
+            estimate = estimate_job(self.gcode_lines, machine_settings(app.get_config()))
+        self.set_status(
+            _("Estimated time: {total} (burning {burn}, travel {travel})").format(
+                total=format_duration(estimate["total_time"]),
+                burn=format_duration(estimate["burn_time"]),
+                travel=format_duration(estimate["travel_time"]),
+            )
+        )
+
+    def _set_gcode_lines(self, gcode_lines):
+        from gcode_document import GCodeDocument
+
+        # Los documentos cargados de fichero mantienen un mmap abierto
+        if isinstance(self.gcode_lines, GCodeDocument):
+            self.gcode_lines.close()
+        self.gcode_lines = gcode_lines
 
     def _connect_thread(self, port, speed):
         if self.grbl.connect(port, speed):
@@ -692,11 +987,11 @@ class L4PFrame(wx.Frame):
             wx.CallAfter(self.connect_btn.SetLabel, _("Connect"))
             wx.CallAfter(self._enable_movement_controls, False)
 
-    def _enable_movement_controls(self, enable):
+    def _enable_movement_controls(self, enable, keep_stop=False):
         if self.controls_panel:
             for child in self.controls_panel.GetChildren():
                 if isinstance(child, (wx.Button, wx.StaticBitmap)):
-                    child.Enable(enable)
+                    child.Enable(enable or (keep_stop and child is self.stop_button))
 
     def log_message(self, message):
         wx.CallAfter(self._do_log_message, message)
@@ -728,10 +1023,22 @@ class L4PFrame(wx.Frame):
 
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        startup.enabled = True
+    startup.mark("imports")
     app = ab.BaseApp(redirect=False)
+    startup.mark("app, config and locale")
     frame = L4PFrame(None, title=app.AppDisplayName, size=(1024, 768))
     frame.SetMinSize((600, 600))
     frame.SetIcons(wx.IconBundle("./resources/Laser4PCB.ico", wx.BITMAP_TYPE_ICO))
     app.SetTopWindow(frame)
+    startup.mark("main frame")
     frame.Show()
+    startup.mark("show")
+    wx.CallAfter(frame.start_deferred)
     app.MainLoop()
+    # Los procesos de generación se reutilizan entre generaciones
+    generator = sys.modules.get("gcode_generator")
+    if generator:
+        generator.shutdown_pool()
@@ -8,13 +8,13 @@
 # the wxPython wiki.
 #
 import builtins
-import configparser
 import logging
 import sys
 import os
 import wx
 from wx.lib.mixins.inspection import InspectionMixin
 
+from app_config import load_config, typed_config
 from settings_dialog import EVT_CONFIG_UPDATED
 
 appName = "Laser4PCB"
@@ -90,55 +90,14 @@ class BaseApp(wx.App, InspectionMixin):
             print(f"Configuración guardada en '{self.config_file}'")
 
     def _load_settings(self):
-        self.config = configparser.ConfigParser()
-        self.config["Settings"] = {
-            "Language": "es",
-            "LogLevel": "INFO",
-        }
-        self.config["Engraver"] = {
-            "feed_rate": "3000",
-            "fast_move_rate": "6000",
-            "laser_power": "1000",
-            "laser_on_cmd": "M3",
-            "laser_off_cmd": "M5",
-        }
-        self.config["GCode"] = {
-            "trace_outline": "True",
-            "fill_inner": "True",
-            "offset_distance": "-0.04",
-            "fill_spacing": "0.1",
-            "invert_layer": "False",
-        }
-        self.config.read(self.config_file)
+        self.config = load_config(self.config_file)
         self.sanitize_config()
 
     def get_config(self):
         """
         Devuelve un diccionario con todas las opciones de configurarión con sus tipos correctos
         """
-        config = {}
-        Settings = self.config["Settings"]
-        config["Settings"] = {
-            "Language": Settings["Language"],
-            "LogLevel": Settings["LogLevel"],
-        }
-        Engraver = self.config["Engraver"]
-        config["Engraver"] = {
-            "feed_rate": Engraver.getint("feed_rate"),
-            "fast_move_rate": Engraver.getint("fast_move_rate"),
-            "laser_power": Engraver.getint("laser_power"),
-            "laser_on_cmd": Engraver["laser_on_cmd"],
-            "laser_off_cmd": Engraver["laser_off_cmd"],
-        }
-        GCode = self.config["GCode"]
-        config["GCode"] = {
-            "trace_outline": GCode.getboolean("trace_outline"),
-            "fill_inner": GCode.getboolean("fill_inner"),
-            "offset_distance": GCode.getfloat("offset_distance"),
-            "fill_spacing": GCode.getfloat("fill_spacing"),
-            "invert_layer": GCode.getboolean("invert_layer"),
-        }
-        return config
+        return typed_config(self.config)
 
     def save_settings(self):
         """Guarda la configuración actual en el archivo .ini."""
@@ -0,0 +1,89 @@
+import configparser
+
+
+def default_config():
+    """Crea un ConfigParser con los valores por defecto de la aplicación."""
+    config = configparser.ConfigParser()
+    config["Settings"] = {
+        "Language": "es",
+        "LogLevel": "INFO",
+    }
+    config["Engraver"] = {
+        "feed_rate": "3000",
+        "fast_move_rate": "6000",
+        "laser_power": "1000",
+        "laser_on_cmd": "M3",
+        "laser_off_cmd": "M5",
+    }
+    config["GCode"] = {
+        "trace_outline": "True",
+        "fill_inner": "True",
+        "offset_distance": "-0.04",
+        "fill_spacing": "0.1",
+        "invert_layer": "False",
+        "compact_output": "False",
+        "arc_tolerance": "0",
+        "max_chord_error": "0.005",
+        "tile_size": "0",
+        "fill_mode": "vector",
+        "workers": "0",
+        "fill_angles": "1",
+        "report_vanished": "True",
+    }
+    # Parámetros de GRBL para estimar la duración: $120, $11 y $110
+    config["Machine"] = {
+        "acceleration": "500",
+        "junction_deviation": "0.01",
+        "max_rate": "6000",
+    }
+    return config
+
+
+def load_config(config_file):
+    """Lee el fichero .ini sobre los valores por defecto. No necesita wx."""
+    config = default_config()
+    config.read(config_file)
+    return config
+
+
+def typed_config(config):
+    """
+    Devuelve un diccionario con todas las opciones de configurarión con sus tipos correctos
+    """
+    result = {}
+    Settings = config["Settings"]
+    result["Settings"] = {
+        "Language": Settings["Language"],
+        "LogLevel": Settings["LogLevel"],
+    }
+    Engraver = config["Engraver"]
+    result["Engraver"] = {
+        "feed_rate": Engraver.getint("feed_rate"),
+        "fast_move_rate": Engraver.getint("fast_move_rate"),
+        "laser_power": Engraver.getint("laser_power"),
+        "laser_on_cmd": Engraver["laser_on_cmd"],
+        "laser_off_cmd": Engraver["laser_off_cmd"],
+    }
+    GCode = config["GCode"]
+    result["GCode"] = {
+        "trace_outline": GCode.getboolean("trace_outline"),
+        "fill_inner": GCode.getboolean("fill_inner"),
+        "offset_distance": GCode.getfloat("offset_distance"),
+        "fill_spacing": GCode.getfloat("fill_spacing"),
+        "invert_layer": GCode.getboolean("invert_layer"),
+        "compact_output": GCode.getboolean("compact_output"),
+        "arc_tolerance": GCode.getfloat("arc_tolerance"),
+        "max_chord_error": GCode.getfloat("max_chord_error"),
+        "tile_size": GCode.getfloat("tile_size"),
+        "fill_mode": GCode["fill_mode"],
+        "workers": GCode.getint("workers"),
+        "fill_angles": GCode.getint("fill_angles"),
+        "report_vanished": GCode.getboolean("report_vanished"),
+    }
+    Machine = config["Machine"]
+    result["Machine"] = {
+        "acceleration": Machine.getfloat("acceleration"),
+        "junction_deviation": Machine.getfloat("junction_deviation"),
+        "max_rate": Machine.getfloat("max_rate"),
+    }
+    return result
@@ -0,0 +1,97 @@
+import math
+
+# Número mínimo de vértices para sustituir un tramo de polilínea por un arco
+MIN_ARC_POINTS = 5
+# Por encima de este radio (mm) el tramo se considera recto
+MAX_ARC_RADIUS = 1000.0
+
+
+def _circle_through(p1, p2, p3):
+    """Centro y radio de la circunferencia que pasa por tres puntos, o None si son colineales."""
+    ax, ay = p1
+    bx, by = p2
+    cx, cy = p3
+    d = 2.0 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-12:
+        return None
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return (ux, uy), math.dist((ux, uy), p1)
+
+
+def _fit(points, start, end, tolerance):
+    """
+    Comprueba si points[start:end + 1] se puede sustituir por un único arco sin
+    apartarse más de `tolerance`. Devuelve (centro, horario) o None.
+    """
+    circle = _circle_through(points[start], points[(start + end) // 2], points[end])
+    if circle is None:
+        return None
+    (cx, cy), radius = circle
+    if radius > MAX_ARC_RADIUS:
+        return None
+    direction = 0
+    total_angle = 0.0
+    for k in range(start, end + 1):
+        if abs(math.dist(points[k], (cx, cy)) - radius) > tolerance:
+            return None
+        if k == end:
+            break
+        x1, y1 = points[k][0] - cx, points[k][1] - cy
+        x2, y2 = points[k + 1][0] - cx, points[k + 1][1] - cy
+        cross = x1 * y2 - y1 * x2
+        if cross == 0:
+            return None
+        sign = 1 if cross > 0 else -1
+        if direction == 0:
+            direction = sign
+        elif sign != direction:
+            return None
+        angle = abs(math.atan2(cross, x1 * x2 + y1 * y2))
+        # Flecha entre la cuerda original y el arco
+        if radius * (1 - math.cos(angle / 2)) > tolerance:
+            return None
+        total_angle += angle
+    if total_angle > 2 * math.pi + 1e-9:
+        return None
+    return (cx, cy), direction < 0
+
+
+def fit_arcs(points, tolerance):
+    """
+    Recorre una polilínea y agrupa los tramos que siguen una circunferencia.
+    Devuelve una lista de segmentos ("line", fin) o ("arc", fin, centro, horario),
+    empezando desde points[0].
+    """
+    points = [tuple(p) for p in points]
+    n = len(points)
+    segments = []
+    i = 0
+    while i < n - 1:
+        best = None
+        end = i + MIN_ARC_POINTS - 1
+        if end < n and _fit(points, i, end, tolerance):
+            # Búsqueda exponencial y luego binaria del arco más largo
+            good, step = end, MIN_ARC_POINTS - 1
+            while good + step < n and _fit(points, i, good + step, tolerance):
+                good += step
+                step *= 2
+            bad = min(good + step, n)
+            while bad - good > 1:
+                mid = (good + bad) // 2
+                if _fit(points, i, mid, tolerance):
+                    good = mid
+                else:
+                    bad = mid
+            best = good
+        if best is None:
+            segments.append(("line", points[i + 1]))
+            i += 1
+        else:
+            center, clockwise = _fit(points, i, best, tolerance)
+            segments.append(("arc", points[best], center, clockwise))
+            i = best
+    return segments
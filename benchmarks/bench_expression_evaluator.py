@@ -0,0 +1,159 @@
+"""
+Micro-benchmark del evaluador de expresiones de macros.
+
+Compara el coste por evaluación de:
+  - analizar la expresión en cada llamada (sustituir $n en el texto, tokenizar,
+    pasar a postfija y evaluar) con el analizador original, que era lo que
+    hacía evaluate();
+  - evaluate() actual, que usa la caché LRU de expresiones compiladas;
+  - llamar directamente a la expresión compilada con un vector de variables.
+
+Uso: python benchmarks/bench_expression_evaluator.py [repeticiones]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from expression_evaluator import ExpressionEvaluator  # noqa: E402
+
+# Expresiones típicas de las macros RoundRect y similares de KiCad/Altium
+EXPRESSIONS = [
+    "$1+$1",
+    "$2x-1",
+    "($2+$4)/2",
+    "-$3+$1/2",
+    "$5-$1x2",
+    "0.5x($6-$8)+$1",
+]
+VARIABLES = {i: 0.1 * i for i in range(1, 10)}
+
+
+class OriginalEvaluator(ExpressionEvaluator):
+    """Analizador anterior a la caché: re.match en cada posición del texto."""
+
+    def tokenize(self, expr):
+        tokens = []
+        i = 0
+        prev_type = None
+        while i < len(expr):
+            if expr[i].isspace():
+                i += 1
+                continue
+            if expr[i] in "+-":
+                if (i == 0 or prev_type in ("OP", "LPAREN")) and expr[i] == "-":
+                    j = i + 1
+                    while j < len(expr) and (expr[j].isdigit() or expr[j] == "."):
+                        j += 1
+                    tokens.append(("NUMBER", float(expr[i:j])))
+                    i = j
+                    prev_type = "NUMBER"
+                    continue
+                else:
+                    # El original no aceptaba el '-' binario: se añade para
+                    # poder medir las mismas expresiones
+                    tokens.append(("OP", expr[i]))
+                    i += 1
+                    prev_type = "OP"
+                    continue
+            if expr[i] in "*/":
+                tokens.append(("OP", expr[i]))
+                i += 1
+                prev_type = "OP"
+                continue
+            if expr[i] == "(":
+                tokens.append(("LPAREN", "("))
+                i += 1
+                prev_type = "LPAREN"
+                continue
+            if expr[i] == ")":
+                tokens.append(("RPAREN", ")"))
+                i += 1
+                prev_type = "RPAREN"
+                continue
+            m = re.match(r"\d+(\.\d*)?|\.\d+", expr[i:])
+            if m:
+                tokens.append(("NUMBER", float(m.group(0))))
+                i += len(m.group(0))
+                prev_type = "NUMBER"
+                continue
+            raise ValueError(f"Token inesperado en expresión: {expr[i:]}")
+        return tokens
+
+    def to_postfix(self, tokens):
+        output, stack = [], []
+        for idx, (type_, value) in enumerate(tokens):
+            if type_ == "NUMBER":
+                output.append(value)
+            elif type_ == "OP":
+                if value == "-" and (
+                    idx == 0 or tokens[idx - 1][0] in ("OP", "LPAREN")
+                ):
+                    stack.append("UNARY_MINUS")
+                else:
+                    while (
+                        stack
+                        and stack[-1] not in ("(", "UNARY_MINUS")
+                        and self.precedence(stack[-1]) >= self.precedence(value)
+                    ):
+                        output.append(stack.pop())
+                    stack.append(value)
+            elif type_ == "LPAREN":
+                stack.append("(")
+            elif type_ == "RPAREN":
+                while stack and stack[-1] != "(":
+                    output.append(stack.pop())
+                stack.pop()
+                if stack and stack[-1] == "UNARY_MINUS":
+                    output.append(stack.pop())
+        while stack:
+            output.append(stack.pop())
+        return output
+
+
+def parse_every_time(evaluator, expr_str, variables):
+    """El evaluate() original: sustituye las variables en el texto y lo analiza."""
+    for i in sorted(variables.keys(), reverse=True):
+        expr_str = expr_str.replace(f"${i}", str(variables[i]))
+    expr_str = expr_str.replace("x", "*").replace("X", "*")
+    if not re.match(r"^[\d\.\s\+\-\*\/\(\)]*$", expr_str):
+        raise ValueError(f"Expresión no segura en macro: {expr_str}")
+    try:
+        tokens = evaluator.tokenize(expr_str)
+        postfix = evaluator.to_postfix(tokens)
+        return evaluator.eval_postfix(postfix)
+    except Exception as e:
+        raise ValueError(f"Error evaluando '{expr_str}': {e}")
+
+
+def run(number=20000):
+    evaluator = ExpressionEvaluator()
+    original = OriginalEvaluator()
+    vector = [None] + [VARIABLES[i] for i in range(1, 10)]
+    compiled = [evaluator.compile(e) for e in EXPRESSIONS]
+
+    cases = {
+        "analizar en cada llamada": lambda: [
+            parse_every_time(original, e, VARIABLES) for e in EXPRESSIONS
+        ],
+        "evaluate() con caché": lambda: [
+            evaluator.evaluate(e, VARIABLES) for e in EXPRESSIONS
+        ],
+        "compilada con vector": lambda: [c(vector) for c in compiled],
+    }
+    results = {}
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=number, repeat=3))
+        results[name] = seconds / (number * len(EXPRESSIONS)) * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    results = run(number)
+    baseline = results["analizar en cada llamada"]
+    for name, micros in results.items():
+        print(f"{name:28s} {micros:8.3f} µs/evaluación  (x{baseline / micros:.1f})")
@@ -0,0 +1,107 @@
+"""
+Mide el tiempo de importación de los módulos sin interfaz gráfica.
+
+Cada módulo se importa en un intérprete nuevo para que las cachés de módulos
+no falseen la medida, y se comprueba que no arrastra wx. Con --detail se
+muestran los módulos más lentos según `python -X importtime`.
+
+Uso: python benchmarks/import_time.py [--repeat N] [--detail] [modulo ...]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEADLESS_MODULES = [
+    "expression_evaluator",
+    "arc_fitting",
+    "gerber_parser",
+    "geometry",
+    "gcode_generator",
+    "gcode_document",
+    "grbl_communicator",
+    "app_config",
+    "instrumentation",
+    "utils",
+    "l4p_batch",
+    "job_dispatcher",
+]
+
+_PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "t = time.perf_counter() - t\n"
+    "print(t, 'wx' in sys.modules)\n"
+)
+
+
+def measure(module, repeat=3):
+    """Devuelve (mejor tiempo en segundos, si se ha cargado wx)."""
+    best, loads_wx = None, False
+    for i in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module)],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        seconds = float(out[0])
+        loads_wx = loads_wx or out[1] == "True"
+        best = seconds if best is None else min(best, seconds)
+    return best, loads_wx
+
+
+def top_imports(module, count=8):
+    """Módulos con mayor tiempo acumulado según -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        name = fields[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Los hijos se listan antes que el padre: solo interesan las
+        # importaciones directas que preceden a la línea del propio módulo
+        if depth == 0:
+            if name.strip() == module:
+                return sorted(rows, reverse=True)[:count]
+            rows = []
+        elif depth == 1:
+            rows.append((int(fields[1]), name.strip()))
+    return []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=HEADLESS_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--detail", action="store_true")
+    args = parser.parse_args(argv)
+
+    with_wx = []
+    for module in args.modules:
+        seconds, loads_wx = measure(module, args.repeat)
+        flag = "  << importa wx" if loads_wx else ""
+        print(f"{module:22s} {seconds * 1000:8.1f} ms{flag}")
+        if loads_wx:
+            with_wx.append(module)
+        if args.detail:
+            for micros, name in top_imports(module):
+                print(f"    {name:26s} {micros / 1000:8.1f} ms")
+    return 1 if with_wx else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Benchmarks del pipeline completo sobre placas sintéticas.
+
+Mide GerberParser.parse, primitives_to_geometry, generate_gcode,
+parse_gcode_for_preview y el envío de G-code a un emulador GRBL local, y
+guarda los resultados en JSON para poder comparar ejecuciones:
+
+    python benchmarks/run_benchmarks.py --preset medium -o results/base.json
+    python benchmarks/run_benchmarks.py --preset medium --compare results/base.json
+
+Con --compare termina con código 1 si alguna fase es más lenta que la
+referencia por encima del umbral (--threshold, 1.2 por defecto).
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from app_config import default_config, typed_config  # noqa: E402
+from gcode_generator import generate_gcode, parse_gcode_for_preview  # noqa: E402
+from geometry import primitives_to_geometry  # noqa: E402
+from gerber_parser import GerberParser  # noqa: E402
+from synthetic_board import PRESETS, generate_board  # noqa: E402
+
+# Líneas que se envían al emulador: basta para medir el ritmo sostenido
+STREAM_LINES = 3000
+
+
+def _measure(func, repeat):
+    """Ejecuta func `repeat` veces y devuelve (tiempos, último resultado)."""
+    times = []
+    result = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def _summary(times, **counters):
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "runs": len(times),
+        "counters": counters,
+    }
+
+
+def _parse(text):
+    parser = GerberParser()
+    parser.parse(gerber_content=text)
+    return parser.get_primitives()
+
+
+def bench_stream(gcode_lines, line_delay=0.0):
+    """Envía las líneas a un GrblEmulator y devuelve (segundos, líneas enviadas)."""
+    from grbl_communicator import GrblCommunicator
+    from grbl_emulator import GrblEmulator
+
+    with GrblEmulator(line_delay=line_delay) as emulator:
+        grbl = GrblCommunicator()
+        if not grbl.connect(emulator.port, 115200):
+            raise RuntimeError(f"No se pudo conectar al emulador en {emulator.port}")
+        try:
+            start = time.perf_counter()
+            sent = grbl.stream_gcode_text(gcode_lines)
+            return time.perf_counter() - start, sent
+        finally:
+            grbl.disconnect()
+            grbl.close()
+
+
+def run(counts, repeat=3, stream=True, seed=1):
+    text = generate_board(seed=seed, **counts)
+    config = typed_config(default_config())
+    results = {}
+
+    times, primitives = _measure(lambda: _parse(text), repeat)
+    results["parse"] = _summary(times, bytes=len(text), primitives=len(primitives))
+
+    times, geometry = _measure(lambda: primitives_to_geometry(primitives), repeat)
+    results["primitives_to_geometry"] = _summary(
+        times, parts=len(getattr(geometry, "geoms", [geometry]))
+    )
+
+    times, gcode_lines = _measure(lambda: generate_gcode(geometry, config), repeat)
+    results["generate_gcode"] = _summary(times, lines=len(gcode_lines))
+
+    times, preview = _measure(lambda: parse_gcode_for_preview(gcode_lines), repeat)
+    results["parse_gcode_for_preview"] = _summary(
+        times, paths=len(preview["polygons"])
+    )
+
+    if stream and os.name == "posix":
+        lines = gcode_lines[:STREAM_LINES]
+        times = []
+        sent = 0
+        for i in range(repeat):
+            seconds, sent = bench_stream(lines)
+            times.append(seconds)
+        results["stream"] = _summary(
+            times, lines=sent, lines_per_second=round(sent / min(times))
+        )
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Imprime la relación con la referencia; devuelve las fases que empeoran."""
+    regressions = []
+    for stage, result in current["results"].items():
+        reference = baseline["results"].get(stage)
+        if not reference:
+            continue
+        ratio = result["min"] / reference["min"] if reference["min"] > 0 else 1.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  << más lento"
+            regressions.append(stage)
+        print(
+            f"{stage:26s} {reference['min'] * 1000:9.1f} ms -> "
+            f"{result['min'] * 1000:9.1f} ms  x{ratio:.2f}{flag}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    for name in ("tracks", "flashes", "macros", "regions", "arcs"):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("-o", "--output", help="fichero JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    counts = dict(PRESETS[args.preset])
+    for name in counts:
+        value = getattr(args, name)
+        if value is not None:
+            counts[name] = value
+
+    results = run(counts, args.repeat, not args.no_stream, args.seed)
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "preset": args.preset,
+        "board": counts,
+        "seed": args.seed,
+        "results": results,
+    }
+    for stage, result in results.items():
+        counters = ", ".join(f"{k}={v}" for k, v in result["counters"].items())
+        print(
+            f"{stage:26s} min {result['min'] * 1000:9.1f} ms  "
+            f"mediana {result['median'] * 1000:9.1f} ms  {counters}"
+        )
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("board") != counts:
+            print("Aviso: la referencia se midió con otra placa")
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
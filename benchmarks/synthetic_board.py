@@ -0,0 +1,155 @@
+"""
+Generador de placas Gerber sintéticas para los benchmarks.
+
+Produce una capa de cobre con un número controlado de pistas, pads (flashes),
+pads con macro, regiones y arcos, siempre igual para la misma semilla.
+
+Uso: python benchmarks/synthetic_board.py --tracks 500 --flashes 200 -o board.gtl
+"""
+
+import argparse
+import math
+import random
+
+# Tamaño de placa (mm) y factor del formato FSLAX46Y46
+BOARD_SIZE = (100.0, 80.0)
+_SCALE = 10**6
+
+# Presets usados por run_benchmarks.py
+PRESETS = {
+    "small": dict(tracks=200, flashes=100, macros=50, regions=10, arcs=50),
+    "medium": dict(tracks=1000, flashes=500, macros=200, regions=40, arcs=200),
+    "large": dict(tracks=5000, flashes=2000, macros=1000, regions=150, arcs=1000),
+}
+
+_HEADER = [
+    "%FSLAX46Y46*%",
+    "%MOMM*%",
+    "%TF.FileFunction,Copper,L1,Top*%",
+    "%AMRoundRect*"
+    "0 Rectangle with rounded corners*"
+    "4,1,4,$2,$3,$4,$5,$6,$7,$8,$9,$2,$3,0*"
+    "1,1,$1+$1,$2,$3*"
+    "1,1,$1+$1,$4,$5*"
+    "1,1,$1+$1,$6,$7*"
+    "1,1,$1+$1,$8,$9*"
+    "20,1,$1+$1,$2,$3,$4,$5,0*"
+    "20,1,$1+$1,$4,$5,$6,$7,0*"
+    "20,1,$1+$1,$6,$7,$8,$9,0*"
+    "20,1,$1+$1,$8,$9,$2,$3,0*%",
+    "%ADD10C,0.250000*%",
+    "%ADD11C,1.600000*%",
+    "%ADD12R,1.500000X1.000000*%",
+    "%ADD13O,1.200000X2.000000*%",
+    "%ADD14C,0.400000*%",
+    "G75*",
+    "%LPD*%",
+]
+# Aperturas con macro distintas, para que la caché de instancias también trabaje
+_MACRO_VARIANTS = 20
+_FIRST_MACRO_D = 20
+
+
+def _xy(x, y):
+    return f"X{round(x * _SCALE)}Y{round(y * _SCALE)}"
+
+
+def _point(rng, margin=2.0):
+    return (
+        rng.uniform(margin, BOARD_SIZE[0] - margin),
+        rng.uniform(margin, BOARD_SIZE[1] - margin),
+    )
+
+
+def generate_board(tracks=0, flashes=0, macros=0, regions=0, arcs=0, seed=1):
+    """Devuelve el texto de un Gerber con los elementos pedidos."""
+    rng = random.Random(seed)
+    lines = list(_HEADER)
+    for i in range(_MACRO_VARIANTS):
+        r = 0.05 + 0.01 * i
+        w, h = 0.4 + 0.02 * i, 0.25 + 0.01 * i
+        lines.append(
+            f"%ADD{_FIRST_MACRO_D + i}RoundRect,{r:.3f}X{-w:.3f}X{-h:.3f}X{w:.3f}X{-h:.3f}"
+            f"X{w:.3f}X{h:.3f}X{-w:.3f}X{h:.3f}*%"
+        )
+
+    # Pistas en ángulos de 45º, de varios tramos cada una
+    lines += ["G01*", "D10*"]
+    for i in range(tracks):
+        x, y = _point(rng)
+        lines.append(f"{_xy(x, y)}D02*")
+        for k in range(rng.randint(1, 4)):
+            angle = rng.choice(range(0, 360, 45))
+            length = rng.uniform(1.0, 8.0)
+            x = min(max(x + length * math.cos(math.radians(angle)), 0), BOARD_SIZE[0])
+            y = min(max(y + length * math.sin(math.radians(angle)), 0), BOARD_SIZE[1])
+            lines.append(f"{_xy(x, y)}D01*")
+
+    # Arcos con I/J en modo multicuadrante
+    lines.append("D14*")
+    for i in range(arcs):
+        cx, cy = _point(rng, margin=6.0)
+        radius = rng.uniform(0.5, 5.0)
+        a0 = rng.uniform(0, 2 * math.pi)
+        a1 = a0 + rng.uniform(0.3, 1.8 * math.pi)
+        sx, sy = cx + radius * math.cos(a0), cy + radius * math.sin(a0)
+        ex, ey = cx + radius * math.cos(a1), cy + radius * math.sin(a1)
+        lines.append(f"{_xy(sx, sy)}D02*")
+        lines.append("G03*")
+        lines.append(
+            f"{_xy(ex, ey)}I{round((cx - sx) * _SCALE)}J{round((cy - sy) * _SCALE)}D01*"
+        )
+        lines.append("G01*")
+
+    # Pads: círculos, rectángulos y óvalos
+    for i in range(flashes):
+        lines.append(f"D{rng.choice((11, 12, 13))}*")
+        lines.append(f"{_xy(*_point(rng))}D03*")
+
+    for i in range(macros):
+        lines.append(f"D{_FIRST_MACRO_D + rng.randrange(_MACRO_VARIANTS)}*")
+        lines.append(f"{_xy(*_point(rng))}D03*")
+
+    # Regiones: rectángulos con una esquina redondeada por un arco
+    for i in range(regions):
+        x, y = _point(rng, margin=8.0)
+        w, h = rng.uniform(2.0, 6.0), rng.uniform(2.0, 6.0)
+        r = min(w, h) / 3
+        lines += [
+            "G36*",
+            f"{_xy(x, y)}D02*",
+            "G01*",
+            f"{_xy(x + w - r, y)}D01*",
+            "G03*",
+            f"{_xy(x + w, y + r)}I0J{round(r * _SCALE)}D01*",
+            "G01*",
+            f"{_xy(x + w, y + h)}D01*",
+            f"{_xy(x, y + h)}D01*",
+            f"{_xy(x, y)}D01*",
+            "G37*",
+        ]
+
+    lines.append("M02*")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un Gerber sintético.")
+    parser.add_argument("--preset", choices=sorted(PRESETS))
+    for name in ("tracks", "flashes", "macros", "regions", "arcs"):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", default="synthetic.gtl")
+    args = parser.parse_args(argv)
+
+    counts = dict(PRESETS[args.preset]) if args.preset else {}
+    for name in ("tracks", "flashes", "macros", "regions", "arcs"):
+        value = getattr(args, name)
+        if value is not None:
+            counts[name] = value
+    with open(args.output, "w") as f:
+        f.write(generate_board(seed=args.seed, **counts))
+
+
+if __name__ == "__main__":
+    main()
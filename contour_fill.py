@@ -0,0 +1,179 @@
+"""
+Relleno concéntrico (contour-parallel).
+
+Cada polígono se rellena con anillos paralelos a su contorno, obtenidos con
+buffer(-spacing) sucesivos. En pistas finas y diagonales da muchos menos
+tramos que las líneas horizontales, que en ese caso son muy cortas y cada una
+obliga a encender y apagar el láser.
+
+Los anillos de cada polígono se ordenan por vecino más cercano para reducir
+los desplazamientos en vacío.
+"""
+
+import numpy as np
+import shapely
+from shapely.geometry import MultiPolygon, Polygon
+
+from gcode_estimator import move_times
+from scan_angle import scan_spans
+
+
+def _polygons(geometry):
+    if isinstance(geometry, Polygon):
+        return [] if geometry.is_empty else [geometry]
+    if isinstance(geometry, MultiPolygon):
+        return [g for g in geometry.geoms if not g.is_empty]
+    return []
+
+
+def contour_rings(polygon, spacing):
+    """
+    Anillos concéntricos de un polígono, de fuera a dentro. El primero está a
+    spacing / 2 del contorno y los siguientes cada spacing.
+    Devuelve listas de coordenadas cerradas (se pueden enviar entre procesos).
+    """
+    # Con esquinas redondeadas cada offset añade vértices en las esquinas
+    # cóncavas y el coste crece con cada anillo; a inglete el número se mantiene
+    style = {"join_style": "mitre", "mitre_limit": 2.0}
+    rings = []
+    current = polygon.buffer(-spacing / 2, **style)
+    while not current.is_empty:
+        for part in _polygons(current):
+            rings.append(list(part.exterior.coords))
+            rings.extend(list(interior.coords) for interior in part.interiors)
+        current = current.buffer(-spacing, **style)
+    return rings
+
+
+def order_rings(rings, start):
+    """
+    Ordena los anillos por vecino más cercano desde start. Cada anillo cerrado
+    se rota para empezar en su vértice más próximo a la posición actual.
+    """
+    remaining = [
+        np.asarray(ring[:-1], dtype=float) for ring in rings if len(ring) > 2
+    ]
+    if not remaining:
+        return []
+    # La distancia a la caja de cada anillo acota la de su vértice más cercano,
+    # así solo se miran los vértices de los anillos que pueden ganar
+    boxes = np.array([[*r.min(axis=0), *r.max(axis=0)] for r in remaining])
+    pending = np.ones(len(remaining), dtype=bool)
+    position = np.asarray(start, dtype=float)
+    ordered = []
+    for n in range(len(remaining)):
+        dx = np.maximum(boxes[:, 0] - position[0], position[0] - boxes[:, 2])
+        dy = np.maximum(boxes[:, 1] - position[1], position[1] - boxes[:, 3])
+        dx, dy = np.maximum(dx, 0), np.maximum(dy, 0)
+        bound = np.where(pending, dx * dx + dy * dy, np.inf)
+        best, best_vertex, best_distance = -1, 0, np.inf
+        for i in np.argsort(bound):
+            if bound[i] >= best_distance:
+                break
+            distances = ((remaining[i] - position) ** 2).sum(axis=1)
+            k = int(distances.argmin())
+            if distances[k] < best_distance:
+                best, best_vertex, best_distance = i, k, distances[k]
+        pending[best] = False
+        ring = np.roll(remaining[best], -best_vertex, axis=0)
+        points = [tuple(p) for p in ring.tolist()]
+        ordered.append(points + [points[0]])
+        position = ring[0]
+    return ordered
+
+
+def _stop_to_stop(length, rate, machine):
+    """Tiempo de tramos rectos sueltos, que empiezan y acaban parados, a rate mm/s."""
+    length = np.atleast_1d(np.asarray(length, dtype=float))
+    direction = np.tile([1.0, 0.0], (len(length), 1))
+    nominal = np.full(len(length), rate)
+    synced = np.arange(len(length))
+    return move_times(length, direction, direction, nominal, synced, machine)
+
+
+def span_overhead(spacing, feed_rate, machine):
+    """
+    Tiempo (s) que añade cada tramo de relleno largo: arrancar y parar en vez
+    de ir siempre a feed_rate, y el desplazamiento corto hasta el siguiente.
+    """
+    rate = feed_rate / 60.0
+    hop = float(_stop_to_stop(spacing, machine["max_rate"] / 60.0, machine)[0])
+    return rate / machine["acceleration"] + hop
+
+
+def _corner_time(coords, rate, machine):
+    """
+    Lo que se tarda de más en recorrer un anillo, respecto a hacerlo entero a
+    rate mm/s, por frenar en sus vértices (desviación de unión) y al acabar.
+    """
+    delta = np.diff(np.asarray(coords, dtype=float), axis=0)
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    keep = length > 1e-9
+    if not keep.any():
+        return 0.0
+    length = length[keep]
+    direction = delta[keep] / length[:, None]
+    nominal = np.full(len(length), rate)
+    synced = np.zeros(len(length))
+    times = move_times(length, direction, direction, nominal, synced, machine)
+    return float(times.sum() - length.sum() / rate)
+
+
+def _fill_times(polygon, spacing, feed_rate, machine, angle=0.0):
+    """
+    Tiempos estimados (s) del relleno con líneas a angle grados y del
+    concéntrico, con el modelo del planificador de gcode_estimator. Las
+    líneas paran al principio y al final de cada tramo; los anillos además
+    frenan en cada vértice y hay un desplazamiento de un anillo al siguiente.
+    """
+    rate = feed_rate / 60.0
+    travel_rate = machine["max_rate"] / 60.0
+    burn_length = polygon.area / spacing
+    # Desplazamiento corto entre tramos o anillos vecinos
+    hop = float(_stop_to_stop(spacing, travel_rate, machine)[0])
+
+    # Las líneas van de un borde al otro cada spacing empezando en el primero,
+    # así que hay hasta una línea más que altura / spacing
+    a = np.radians(angle)
+    coords = np.asarray(polygon.exterior.coords)
+    v = coords[:, 1] * np.cos(a) - coords[:, 0] * np.sin(a)
+    height = v.max() - v.min()
+    extra = np.floor(height / spacing) + 1 - height / spacing if height > 0 else 1.0
+    spans = scan_spans(polygon, spacing, angle) + extra
+    scan_length = burn_length + (extra * polygon.area / height if height > 0 else 0.0)
+    span = float(_stop_to_stop(scan_length / spans, rate, machine)[0])
+    scanline = spans * (span + hop)
+
+    # Anillos: el contorno exterior da tantos como el radio inscrito entre el
+    # paso; los de cada agujero duran hasta juntarse con los vecinos, más o
+    # menos la mitad de la semianchura media (área / perímetro)
+    radius = shapely.maximum_inscribed_circle(polygon, spacing).length
+    perimeter = polygon.length
+    half_width = polygon.area / perimeter if perimeter > 0 else 0
+    outer_rings = max(radius / spacing, 1.0)
+    hole_rings = half_width / (2 * spacing)
+    outer_corners = _corner_time(polygon.exterior.coords, rate, machine)
+    hole_corners = [_corner_time(i.coords, rate, machine) for i in polygon.interiors]
+    # Los anillos que encogen conservan los vértices de su borde; los que
+    # crecen alrededor de los agujeros se juntan y suman los de sus vecinos,
+    # así que se cuenta al menos la misma densidad de frenadas por mm que en el borde
+    corners = max(
+        outer_rings * outer_corners + hole_rings * sum(hole_corners),
+        burn_length * (outer_corners + sum(hole_corners)) / perimeter,
+    )
+    rings = outer_rings + hole_rings * len(polygon.interiors)
+    contour = burn_length / rate + corners + rings * hop
+    for interior in polygon.interiors:
+        # Cada agujero se alcanza una vez desde el anillo exterior más cercano
+        distance = polygon.exterior.distance(interior)
+        contour += float(_stop_to_stop(distance, travel_rate, machine)[0])
+    return scanline, contour
+
+
+def prefer_contour(polygon, spacing, feed_rate, machine, angle=0.0):
+    """
+    Indica si el relleno concéntrico se estima más rápido que las líneas
+    a angle grados. machine es machine_settings() de gcode_estimator.
+    """
+    scanline, contour = _fill_times(polygon, spacing, feed_rate, machine, angle)
+    return contour < scanline
@@ -1,5 +1,10 @@
+import functools
+import operator
 import re
 
+_TOKEN_RE = re.compile(r"\s*(?:(?P<num>\d+\.?\d*|\.\d+)|\$(?P<var>\d+)|(?P<op>[-+*/()]))")
+_SAFE_RE = re.compile(r"^[\d\.\s\+\-\*\/\(\)\$]*$")
+
 
 class ExpressionEvaluator:
     def __init__(self):
@@ -10,52 +15,42 @@ class ExpressionEvaluator:
             return 1
         if op in ("*", "/"):
             return 2
+        if op == "UNARY_MINUS":
+            return 3
         return 0
 
     def tokenize(self, expr):
         tokens = []
-        i = 0
-        prev_type = None
-        while i < len(expr):
-            if expr[i].isspace():
-                i += 1
-                continue
-            if expr[i] in "+-":
-                if (i == 0 or prev_type in ("OP", "LPAREN")) and expr[i] == "-":
-                    j = i + 1
-                    while j < len(expr) and (expr[j].isdigit() or expr[j] == "."):
-                        j += 1
-                    tokens.append(("NUMBER", float(expr[i:j])))
-                    i = j
-                    prev_type = "NUMBER"
-                    continue
-                elif expr[i] == "+":
-                    tokens.append(("OP", "+"))
-                    i += 1
-                    prev_type = "OP"
-                    continue
-            if expr[i] in "*/":
-                tokens.append(("OP", expr[i]))
-                i += 1
-                prev_type = "OP"
-                continue
-            if expr[i] == "(":
+        pos = 0
+        length = len(expr)
+        while pos < length:
+            m = _TOKEN_RE.match(expr, pos)
+            if not m:
+                if expr[pos:].strip():
+                    raise ValueError(f"Token inesperado en expresión: {expr[pos:]}")
+                break
+            pos = m.end()
+            number, var, op = m.group("num", "var", "op")
+            prev_type = tokens[-1][0] if tokens else None
+            if number is not None:
+                value = float(number)
+                # Un '-' al principio o tras operador/paréntesis forma parte del número
+                if (
+                    prev_type == "OP"
+                    and tokens[-1][1] == "-"
+                    and (len(tokens) == 1 or tokens[-2][0] in ("OP", "LPAREN"))
+                ):
+                    tokens[-1] = ("NUMBER", -value)
+                else:
+                    tokens.append(("NUMBER", value))
+            elif var is not None:
+                tokens.append(("VAR", int(var)))
+            elif op == "(":
                 tokens.append(("LPAREN", "("))
-                i += 1
-                prev_type = "LPAREN"
-                continue
-            if expr[i] == ")":
+            elif op == ")":
                 tokens.append(("RPAREN", ")"))
-                i += 1
-                prev_type = "RPAREN"
-                continue
-            m = re.match(r"\d+(\.\d*)?|\.\d+", expr[i:])
-            if m:
-                tokens.append(("NUMBER", float(m.group(0))))
-                i += len(m.group(0))
-                prev_type = "NUMBER"
-                continue
-            raise ValueError(f"Token inesperado en expresión: {expr[i:]}")
+            else:
+                tokens.append(("OP", op))
         return tokens
 
     def to_postfix(self, tokens):
@@ -63,6 +58,8 @@ class ExpressionEvaluator:
         for idx, (type_, value) in enumerate(tokens):
             if type_ == "NUMBER":
                 output.append(value)
+            elif type_ == "VAR":
+                output.append(("VAR", value))
             elif type_ == "OP":
                 if value == "-" and (
                     idx == 0 or tokens[idx - 1][0] in ("OP", "LPAREN")
@@ -71,7 +68,7 @@ class ExpressionEvaluator:
                 else:
                     while (
                         stack
-                        and stack[-1] not in ("(", "UNARY_MINUS")
+                        and stack[-1] != "("
                         and self.precedence(stack[-1]) >= self.precedence(value)
                     ):
                         output.append(stack.pop())
@@ -111,17 +108,100 @@ class ExpressionEvaluator:
                     stack.append(a / b)
         return stack[0]
 
-    def evaluate(self, expr_str, variables=None):
-        if variables is None:
-            variables = {}
-        for i in sorted(variables.keys(), reverse=True):
-            expr_str = expr_str.replace(f"${i}", str(variables[i]))
+    def compile(self, expr_str):
+        """
+        Devuelve la expresión compilada (CompiledExpression), analizándola solo
+        la primera vez: las compilaciones se guardan en una caché LRU por texto.
+        """
+        return compile_expression(expr_str)
+
+    def build(self, expr_str):
         expr_str = expr_str.replace("x", "*").replace("X", "*")
-        if not re.match(r"^[\d\.\s\+\-\*\/\(\)]*$", expr_str):
+        if not _SAFE_RE.match(expr_str):
             raise ValueError(f"Expresión no segura en macro: {expr_str}")
         try:
-            tokens = self.tokenize(expr_str)
-            postfix = self.to_postfix(tokens)
-            return self.eval_postfix(postfix)
+            postfix = self.to_postfix(self.tokenize(expr_str))
+            return CompiledExpression(expr_str, postfix)
+        except Exception as e:
+            raise ValueError(f"Error analizando '{expr_str}': {e}")
+
+    def evaluate(self, expr_str, variables=None):
+        program = self.compile(expr_str)
+        if not variables:
+            return program(())
+        vector = [None] * (max(variables) + 1)
+        for i, value in variables.items():
+            vector[i] = value
+        return program(vector)
+
+
+def _divide(a, b):
+    if b == 0:
+        raise ZeroDivisionError("División por cero")
+    return a / b
+
+
+_BINARY_OPS = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": _divide,
+}
+
+
+class CompiledExpression:
+    """
+    Expresión ya analizada. Se evalúa llamándola con un vector de variables
+    donde vector[n] es el valor de $n. Internamente es un árbol de funciones
+    con las subexpresiones constantes ya calculadas.
+    """
+
+    __slots__ = ("text", "postfix", "_function")
+
+    def __init__(self, text, postfix):
+        self.text = text
+        self.postfix = postfix
+        stack = []
+        for token in postfix:
+            if isinstance(token, float):
+                stack.append(token)
+            elif isinstance(token, tuple):
+                stack.append(operator.itemgetter(token[1]))
+            elif token == "UNARY_MINUS":
+                a = stack.pop()
+                if isinstance(a, float):
+                    stack.append(-a)
+                else:
+                    stack.append(lambda v, a=a: -a(v))
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                stack.append(self._binary(_BINARY_OPS[token], a, b))
+        if len(stack) != 1:
+            raise ValueError("Expresión mal formada")
+        result = stack[0]
+        self._function = (lambda v: result) if isinstance(result, float) else result
+
+    @staticmethod
+    def _binary(op, a, b):
+        if isinstance(a, float) and isinstance(b, float):
+            return op(a, b)
+        if isinstance(a, float):
+            return lambda v: op(a, b(v))
+        if isinstance(b, float):
+            return lambda v: op(a(v), b)
+        return lambda v: op(a(v), b(v))
+
+    def __call__(self, vector):
+        try:
+            return float(self._function(vector))
         except Exception as e:
-            raise ValueError(f"Error evaluando '{expr_str}': {e}")
+            raise ValueError(f"Error evaluando '{self.text}': {e}")
+
+
+_PARSER = ExpressionEvaluator()
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_expression(expr_str):
+    return _PARSER.build(expr_str)
@@ -0,0 +1,265 @@
+import mmap
+import re
+import numpy as np
+
+# Tamaño de bloque usado al construir el índice de líneas. Así nunca creamos
+# arrays temporales del tamaño del fichero completo.
+INDEX_CHUNK_SIZE = 16 * 1024 * 1024
+# Tamaño de los bloques que se normalizan de una vez: _normalize crea varios
+# arrays temporales por byte, así que son más pequeños que los del índice
+NORMALIZE_CHUNK_SIZE = 1024 * 1024
+# Líneas que se decodifican de una vez al iterar el documento
+ITER_CHUNK_LINES = 65536
+
+_PAREN_COMMENT_RE = re.compile(rb"\([^)\n]*\)")
+# Tabla para pasar las minúsculas a mayúsculas byte a byte
+_UPPER = np.arange(256, dtype=np.uint8)
+_UPPER[ord("a") : ord("z") + 1] -= 32
+_WHITESPACE = np.frombuffer(b" \t\r", dtype=np.uint8)
+
+
+def _build_line_index(buffer):
+    """
+    Devuelve un array de offsets (int64) tal que la línea i ocupa
+    buffer[offsets[i]:offsets[i + 1]], incluyendo su salto de línea.
+    """
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    size = len(data)
+    parts = [np.zeros(1, dtype=np.int64)]
+    for pos in range(0, size, INDEX_CHUNK_SIZE):
+        newlines = np.flatnonzero(data[pos : pos + INDEX_CHUNK_SIZE] == 0x0A)
+        parts.append(newlines.astype(np.int64) + (pos + 1))
+    # Liberamos la vista para que el mmap se pueda cerrar después
+    del data
+    offsets = np.concatenate(parts)
+    if offsets[-1] != size:
+        # La última línea no termina en salto de línea
+        offsets = np.append(offsets, np.int64(size))
+    return offsets
+
+
+def _normalize(text):
+    """
+    Normaliza un bloque de líneas completas. Devuelve (bytes, longitudes,
+    índices): las líneas que quedan, con su salto, la longitud de cada una y
+    su índice (desde 0) dentro del bloque.
+    """
+    if b"(" in text:
+        text = _PAREN_COMMENT_RE.sub(b"", text)
+    if text and not text.endswith(b"\n"):
+        text += b"\n"
+    data = np.frombuffer(text, dtype=np.uint8)
+    index = np.arange(len(data))
+    newline = data == 0x0A
+    # Un byte es comentario si hay un ';' entre el inicio de su línea y él
+    line_start = np.zeros(len(data), dtype=bool)
+    line_start[:1] = True
+    line_start[1:] = newline[:-1]
+    starts = np.maximum.accumulate(np.where(line_start, index, 0))
+    semicolon = np.maximum.accumulate(np.where(data == ord(";"), index, -1))
+    keep = ((semicolon < starts) & ~np.isin(data, _WHITESPACE)) | newline
+    data = _UPPER[data[keep]]
+
+    ends = np.flatnonzero(data == 0x0A)
+    lengths = np.diff(ends, prepend=-1)
+    empty = lengths == 1
+    if empty.any():
+        keep = np.ones(len(data), dtype=bool)
+        keep[ends[empty]] = False
+        data = data[keep]
+    return data.tobytes(), lengths[~empty], np.flatnonzero(~empty)
+
+
+class NormalizedGCode:
+    """
+    Un texto G-code preparado para enviar: sin comentarios ni espacios, en
+    mayúsculas, sin líneas vacías y cada línea con su salto de línea. Solo se
+    guarda el índice (número de línea original y longitud de cada una, para
+    el progreso, la reanudación y comprobar las líneas largas); el texto se
+    normaliza por bloques al iterar, sin guardar una segunda copia del programa.
+    """
+
+    def __init__(self, buffer, line_offsets=None):
+        if line_offsets is None:
+            line_offsets = _build_line_index(buffer)
+        self._buffer = buffer
+        self._line_offsets = line_offsets
+        lengths, numbers = [], []
+        first = 0
+        while first < len(line_offsets) - 1:
+            # Bloques de líneas completas de unos NORMALIZE_CHUNK_SIZE bytes
+            limit = line_offsets[first] + NORMALIZE_CHUNK_SIZE
+            last = int(np.searchsorted(line_offsets, limit, side="right")) - 1
+            last = min(max(last, first + 1), len(line_offsets) - 1)
+            start, end = int(line_offsets[first]), int(line_offsets[last])
+            _data, chunk_lengths, indices = _normalize(bytes(buffer[start:end]))
+            lengths.append(chunk_lengths)
+            numbers.append(indices + first + 1)
+            first = last
+        self.lengths = (
+            np.concatenate(lengths) if lengths else np.zeros(0, np.int64)
+        ).astype(np.int64)
+        self.numbers = (
+            np.concatenate(numbers) if numbers else np.zeros(0, np.int64)
+        ).astype(np.int64)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def lines_through(self, line):
+        """Cuántas líneas se envían hasta la línea original line incluida."""
+        return int(np.searchsorted(self.numbers, line, side="right"))
+
+    def long_lines(self, max_bytes):
+        """Números de las líneas que con su salto ocupan más de max_bytes."""
+        return self.numbers[self.lengths > max_bytes]
+
+    def iter_lines(self, start_line=1):
+        """
+        Itera (número de línea original, memoryview) desde start_line. Se
+        normalizan de una vez hasta ITER_CHUNK_LINES líneas que sumen como
+        mucho NORMALIZE_CHUNK_SIZE bytes del texto original.
+        """
+        first = int(np.searchsorted(self.numbers, start_line))
+        while first < len(self):
+            stop = min(first + ITER_CHUNK_LINES, len(self))
+            numbers = self.numbers[first:stop]
+            # Fin en el texto original de cada línea (la línea n es la n - 1)
+            ends = self._line_offsets[numbers]
+            start = int(self._line_offsets[numbers[0] - 1])
+            limit = start + NORMALIZE_CHUNK_SIZE
+            count = max(int(np.searchsorted(ends, limit, side="right")), 1)
+            end = int(ends[count - 1])
+            data, lengths, _indices = _normalize(bytes(self._buffer[start:end]))
+            view = memoryview(data)
+            offsets = np.concatenate(([0], np.cumsum(lengths))).tolist()
+            for k, number in enumerate(numbers[:count].tolist()):
+                yield number, view[offsets[k] : offsets[k + 1]]
+            first += count
+
+
+class GCodeDocument:
+    """
+    Documento G-code de solo lectura respaldado por un buffer (normalmente un mmap).
+    El índice de líneas se construye una única vez, de modo que el acceso a la
+    línea N y el número de líneas son O(1), sin cargar el fichero como strings.
+    Se puede iterar como una lista de líneas de texto.
+    """
+
+    def __init__(self, buffer, name=None):
+        self._file = None
+        self._buffer = buffer
+        self.name = name
+        self._offsets = _build_line_index(buffer)
+        self._normalized = None
+        # Estimación de tiempos (estimate_job) si quien generó el documento ya la calculó
+        self.estimate = None
+
+    @classmethod
+    def open(cls, filename):
+        """Abre un fichero G-code mapeándolo en memoria."""
+        f = open(filename, "rb")
+        try:
+            # mmap no admite ficheros vacíos
+            if f.seek(0, 2) == 0:
+                buffer = b""
+            else:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        document = cls(buffer, name=str(filename))
+        document._file = f
+        return document
+
+    @classmethod
+    def from_lines(cls, lines, name=None):
+        """
+        Crea un documento en memoria a partir de una lista de líneas de texto,
+        con tantas líneas como la lista (incluidas las vacías del final).
+        """
+        return cls("".join(line + "\n" for line in lines).encode("utf-8"), name=name)
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                # Quedan memoryview vivas; el mmap se liberará con ellas
+                pass
+        self._buffer = b""
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._normalized = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @property
+    def buffer(self):
+        """Buffer con el texto completo del documento (bytes o mmap)."""
+        return self._buffer
+
+    def normalized(self):
+        """
+        El documento listo para enviar (NormalizedGCode). Se prepara la primera
+        vez y queda guardado, así el envío no procesa cada línea de nuevo.
+        """
+        if self._normalized is None:
+            self._normalized = NormalizedGCode(self._buffer, self._offsets)
+        return self._normalized
+
+    @property
+    def size(self):
+        """Tamaño en bytes del documento."""
+        return int(self._offsets[-1])
+
+    def line_bytes(self, index):
+        """
+        Devuelve la línea `index` como memoryview sobre el buffer (sin copia),
+        sin el salto de línea final.
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Línea fuera de rango")
+        start = int(self._offsets[index])
+        end = int(self._offsets[index + 1])
+        buffer = self._buffer
+        if end > start and buffer[end - 1] == 0x0A:
+            end -= 1
+        if end > start and buffer[end - 1] == 0x0D:
+            end -= 1
+        return memoryview(buffer)[start:end]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return str(self.line_bytes(index), "utf-8", errors="replace")
+
+    def __iter__(self):
+        # Se decodifica por bloques de líneas completas en vez de línea a línea
+        offsets = self._offsets
+        step = ITER_CHUNK_LINES
+        for first in range(0, len(self), step):
+            last = min(first + step, len(self))
+            start, end = int(offsets[first]), int(offsets[last])
+            text = str(self._buffer[start:end], "utf-8", errors="replace")
+            lines = text.split("\n")
+            if text.endswith("\n"):
+                lines.pop()
+            for line in lines:
+                yield line[:-1] if line.endswith("\r") else line
+
+    def iter_bytes(self, start=0):
+        """Itera las líneas como memoryview a partir de la línea `start`."""
+        for i in range(start, len(self)):
+            yield self.line_bytes(i)
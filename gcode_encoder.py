@@ -0,0 +1,148 @@
+"""
+Escritura de G-code directamente en bytes.
+
+Los recorridos se formatean de golpe con NumPy: cada coordenada se pasa a
+micras enteras y sus dígitos se escriben en un array de bytes, sin crear un
+string por línea ni por número. El resultado está listo para escribirse en
+un fichero, enviarse por el puerto serie o abrirse como GCodeDocument.
+"""
+
+import numpy as np
+
+# Potencias de 10 para separar los dígitos de la parte entera
+_POWERS = 10 ** np.arange(19, dtype=np.int64)
+# Por debajo de estas filas el coste fijo de NumPy supera al de formatear en Python
+MIN_VECTOR_ROWS = 64
+
+
+def _number_lengths(values):
+    """(micras, negativo, dígitos de la parte entera, longitud) de cada número con 3 decimales."""
+    values = np.asarray(values, dtype=float)
+    negative = np.signbit(values)
+    scaled = np.abs(values) * 1000
+    microns = np.rint(scaled).astype(np.int64)
+    # Cerca de media micra el producto puede redondear distinto que f"{x:.3f}",
+    # que usa el valor binario exacto: esos pocos casos se formatean en Python
+    ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    for i in ties:
+        microns[i] = int(f"{abs(values[i]):.3f}".replace(".", ""))
+    integer = microns // 1000
+    digits = 1 + (integer[:, None] >= _POWERS[1:]).sum(axis=1)
+    return microns, negative, digits, negative + digits + 4
+
+
+def _write_numbers(out, position, microns, negative, digits):
+    """Escribe cada número como "-123.456" a partir de su posición en out."""
+    out[position[negative]] = ord("-")
+    position = position + negative
+    integer = microns // 1000
+    for k in range(int(digits.max())):
+        selected = k < digits
+        value = integer[selected] // _POWERS[digits[selected] - 1 - k] % 10
+        out[position[selected] + k] = value + ord("0")
+    position = position + digits
+    out[position] = ord(".")
+    fraction = microns % 1000
+    out[position + 1] = fraction // 100 + ord("0")
+    out[position + 2] = fraction // 10 % 10 + ord("0")
+    out[position + 3] = fraction % 10 + ord("0")
+
+
+def _format_rows(parts):
+    """encode_rows formateando en Python, para pocas filas."""
+    columns = [
+        part.decode("utf-8")
+        if isinstance(part, bytes)
+        else [f"{x:.3f}" for x in np.asarray(part, dtype=float).tolist()]
+        for part in parts
+    ]
+    rows = len(next(c for c in columns if not isinstance(c, str)))
+    text = "".join(
+        "".join(c if isinstance(c, str) else c[i] for c in columns) + "\n"
+        for i in range(rows)
+    )
+    return text.encode("utf-8")
+
+
+def encode_rows(parts):
+    """
+    Formatea una fila por elemento de los arrays de parts. parts mezcla
+    constantes (bytes) y arrays de números del mismo tamaño, que se escriben
+    con 3 decimales como f"{x:.3f}". Cada fila termina en salto de línea y las
+    constantes pueden contener otros saltos para formar varias líneas:
+
+        encode_rows([b"G1 X", xs, b" Y", ys, b" F3000"])
+    """
+    rows = len(next(part for part in parts if not isinstance(part, bytes)))
+    if rows == 0:
+        return b""
+    if rows < MIN_VECTOR_ROWS:
+        return _format_rows(parts)
+    numbers = [
+        _number_lengths(part) for part in parts if not isinstance(part, bytes)
+    ]
+    constant = sum(len(part) for part in parts if isinstance(part, bytes))
+    row_length = constant + 1 + sum(number[3] for number in numbers)
+    position = np.cumsum(row_length) - row_length
+    out = np.empty(int(row_length.sum()), dtype=np.uint8)
+
+    numbers = iter(numbers)
+    for part in parts:
+        if isinstance(part, bytes):
+            if part:
+                offsets = np.arange(len(part))
+                out[position[:, None] + offsets] = np.frombuffer(part, dtype=np.uint8)
+                position = position + len(part)
+        else:
+            microns, negative, digits, length = next(numbers)
+            _write_numbers(out, position, microns, negative, digits)
+            position = position + length
+    out[position] = ord("\n")
+    return out.tobytes()
+
+
+def encode_lines(lines):
+    """Líneas de texto como bytes, cada una con su salto de línea."""
+    return "".join(line + "\n" for line in lines).encode("utf-8")
+
+
+class GCodeWriter:
+    """
+    Programa G-code en construcción sobre un bytearray. Las líneas sueltas se
+    añaden con append/extend como en una lista y los recorridos con rows.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def append(self, line):
+        self.buffer += line.encode("utf-8")
+        self.buffer += b"\n"
+
+    def extend(self, lines):
+        self.buffer += encode_lines(lines)
+
+    def rows(self, parts):
+        """Añade las filas de encode_rows(parts)."""
+        self.buffer += encode_rows(parts)
+
+    def write(self, data):
+        """Añade bytes ya formateados (líneas completas, con su salto de línea)."""
+        self.buffer += data
+
+    def insert(self, index, line):
+        """Inserta una línea delante de la línea index, como list.insert."""
+        position = 0
+        for i in range(index):
+            position = self.buffer.index(b"\n", position) + 1
+        self.buffer[position:position] = line.encode("utf-8") + b"\n"
+
+    def lines(self):
+        """Las líneas como strings (para las pasadas que trabajan por línea)."""
+        return self.buffer.decode("utf-8").split("\n")[:-1]
+
+    def getvalue(self):
+        return bytes(self.buffer)
+
+    def __len__(self):
+        return self.buffer.count(b"\n")
@@ -0,0 +1,465 @@
+"""
+Estimación del tiempo de un trabajo a partir de su G-code.
+
+Recorre el programa con un modelo del planificador de GRBL: cada tramo acelera
+y frena con la aceleración de la máquina, la velocidad en cada unión entre
+tramos está limitada por la desviación de unión ($11) y la máquina se detiene
+en los cambios de láser (M3/M4/M5), que GRBL sincroniza.
+
+Todo el cálculo, incluida la lectura del texto, se hace con operaciones de
+NumPy sin recorrer las líneas en Python. El texto se lee por bloques de líneas
+completas, pasando el estado modal (posición, G90/G91, movimiento, láser, F y
+S) de un bloque al siguiente, y solo se juntan los datos de los tramos. Se
+suponen coordenadas en milímetros, que es lo que genera la aplicación.
+"""
+
+import math
+import re
+
+import numpy as np
+
+# Comentarios entre paréntesis (los de ';' se quitan con NumPy)
+_PAREN_COMMENT_RE = re.compile(rb"\([^)\n]*\)")
+# Códigos G que no mueven la máquina aunque lleven X/Y (G92 solo cambia el origen)
+_NO_MOTION_G = (10, 28, 30, 53, 92)
+
+# Clase de cada byte para leer las palabras sin recorrer el texto en Python
+_OTHER, _LETTER, _NEWLINE, _DIGIT, _DOT, _MINUS = range(6)
+_CHAR_KIND = np.zeros(256, dtype=np.uint8)
+_CHAR_KIND[ord("A") : ord("Z") + 1] = _LETTER
+_CHAR_KIND[ord("\n")] = _NEWLINE
+_CHAR_KIND[ord("0") : ord("9") + 1] = _DIGIT
+_CHAR_KIND[ord(".")] = _DOT
+_CHAR_KIND[ord("-")] = _MINUS
+_MAX_EXPONENT = 20
+_POWERS_OF_TEN = 10.0 ** np.arange(-_MAX_EXPONENT, _MAX_EXPONENT + 1)
+# Tamaño de los bloques de líneas completas que se leen de una vez. Así nunca
+# creamos arrays temporales (varios por byte) del tamaño del programa completo.
+CHUNK_SIZE = 1024 * 1024
+
+
+def machine_settings(config):
+    """Parámetros de la máquina leídos de la configuración tipada (typed_config)."""
+    machine = config.get("Machine", {})
+    return {
+        "acceleration": machine.get("acceleration", 500.0),
+        "junction_deviation": machine.get("junction_deviation", 0.01),
+        "max_rate": machine.get("max_rate", 6000.0),
+    }
+
+
+def _tokens(text):
+    """
+    Palabras del programa como arrays (letra, valor, línea) y número de líneas.
+    Los números se leen dígito a dígito con NumPy: cada dígito aporta
+    d * 10^e, con e según su distancia al punto decimal (o al final del número).
+    """
+    text = bytes(text).upper()
+    if b"(" in text:
+        text = _PAREN_COMMENT_RE.sub(b"", text)
+    data = np.frombuffer(text, dtype=np.uint8)
+    kind = _CHAR_KIND[data]
+    semicolons = np.flatnonzero(data == ord(";"))
+    if len(semicolons):
+        # De cada ';' al final de su línea todo cuenta como comentario
+        newlines = np.append(np.flatnonzero(kind == _NEWLINE), len(data))
+        line_end = newlines[np.searchsorted(newlines, semicolons)]
+        first = np.append(True, line_end[1:] != line_end[:-1])
+        inside = np.zeros(len(data) + 1, dtype=np.int8)
+        inside[semicolons[first]] = 1
+        inside[line_end[first]] = -1
+        kind[np.cumsum(inside, dtype=np.int8)[:-1] > 0] = _OTHER
+    starts = np.flatnonzero((kind == _LETTER) | (kind == _NEWLINE))
+    n_lines = int(np.count_nonzero(kind == _NEWLINE)) + 1
+    # Palabra de cada carácter: la de la última letra o salto de línea. Los
+    # números que no siguen a una letra caen en la palabra del salto y se descartan;
+    # la palabra 0 recoge lo que haya antes del primer inicio
+    word = np.zeros(len(data), dtype=np.int32)
+    word[starts] = 1
+    np.cumsum(word, out=word)
+
+    digits = np.flatnonzero(kind == _DIGIT)
+    digit_word = word[digits]
+    # Fin de la parte entera de cada palabra: su punto o, si no tiene, su último dígito + 1
+    integer_end = np.zeros(len(starts) + 1, dtype=np.int64)
+    if len(digits):
+        last = np.append(np.flatnonzero(np.diff(digit_word)), len(digits) - 1)
+        integer_end[digit_word[last]] = digits[last] + 1
+    dots = np.flatnonzero(kind == _DOT)
+    integer_end[word[dots]] = dots
+    end = integer_end[digit_word]
+    exponent = end - digits - (digits < end)
+    weights = (data[digits] - 0x30) * _POWERS_OF_TEN[
+        np.clip(exponent, -_MAX_EXPONENT, _MAX_EXPONENT) + _MAX_EXPONENT
+    ]
+    values = np.bincount(digit_word, weights=weights, minlength=len(starts) + 1)
+    values[word[np.flatnonzero(kind == _MINUS)]] *= -1
+
+    is_letter = kind[starts] == _LETTER
+    line = np.cumsum(~is_letter)
+    return data[starts][is_letter], values[1:][is_letter], line[is_letter], n_lines
+
+
+def _per_line(letters, values, lines, n_lines, code):
+    """Valor de la letra code en cada línea (NaN si no aparece)."""
+    result = np.full(n_lines, np.nan)
+    mask = letters == ord(code)
+    result[lines[mask]] = values[mask]
+    return result
+
+
+def _fill_forward(values, initial):
+    """Propaga el último valor no NaN (estado modal); antes del primero, initial."""
+    values = np.concatenate(([initial], values))
+    index = np.where(np.isnan(values), 0, np.arange(len(values)))
+    return values[np.maximum.accumulate(index)][1:]
+
+
+def _axis(values, relative, start):
+    """
+    Posición en un eje en cada línea: values son cotas absolutas o, en las
+    líneas en G91 (relative), incrementos; start es la posición inicial.
+    """
+    absolute = ~relative & ~np.isnan(values)
+    moved = np.cumsum(np.where(relative, np.nan_to_num(values), 0.0))
+    # Cada cota absoluta fija la posición; los incrementos posteriores se suman
+    return _fill_forward(np.where(absolute, values - moved, np.nan), start) + moved
+
+
+def _segment_times(length, entry2, exit2, nominal, acceleration):
+    """Tiempo de cada tramo con perfil trapezoidal (o triangular si no llega a nominal)."""
+    entry, exit_ = np.sqrt(entry2), np.sqrt(exit2)
+    accel_distance = (nominal**2 - entry2) / (2 * acceleration)
+    decel_distance = (nominal**2 - exit2) / (2 * acceleration)
+    cruise = length - accel_distance - decel_distance
+    trapezoid = (
+        (nominal - entry) / acceleration
+        + (nominal - exit_) / acceleration
+        + np.maximum(cruise, 0) / nominal
+    )
+    peak = np.sqrt(np.maximum((2 * acceleration * length + entry2 + exit2) / 2, 0))
+    triangle = (2 * peak - entry - exit_) / acceleration
+    return np.where(cruise >= 0, trapezoid, triangle)
+
+
+def _text(gcode):
+    """Texto en bytes de una lista de líneas, un GCodeDocument o unos bytes."""
+    if isinstance(gcode, memoryview):
+        return bytes(gcode)
+    if isinstance(gcode, (bytes, bytearray)):
+        return gcode
+    if hasattr(gcode, "buffer"):
+        return gcode.buffer
+    return "\n".join(gcode).encode("utf-8")
+
+
+def _chunks(text):
+    """Trozos de text de unos CHUNK_SIZE bytes, cada uno con líneas completas."""
+    start = 0
+    while True:
+        end = text.find(b"\n", start + CHUNK_SIZE) + 1 or len(text)
+        yield text[start:end]
+        if end >= len(text):
+            return
+        start = end
+
+
+def _line_state(text, modal):
+    """
+    Estado modal de un bloque de líneas en cada línea (arrays indexados por
+    línea): movimiento, G90/G91, láser, posición antes y después, offsets de
+    arco, F y S, sincronizaciones, tiempo de pausa y qué líneas mueven. modal
+    es el estado al empezar el bloque (el de la última línea del anterior).
+    """
+    letters, values, lines, n_lines = _tokens(text)
+
+    def word(code):
+        return _per_line(letters, values, lines, n_lines, code)
+
+    # Códigos G y M: puede haber varios por línea, se marcan por separado
+    is_g, is_m = letters == ord("G"), letters == ord("M")
+    g_codes, g_lines = values[is_g].round().astype(int), lines[is_g]
+    m_codes, m_lines = values[is_m].round().astype(int), lines[is_m]
+    motion = np.full(n_lines, np.nan)
+    mask = g_codes <= 3
+    motion[g_lines[mask]] = g_codes[mask]
+    motion = _fill_forward(motion, modal["motion"])
+    no_motion = np.zeros(n_lines, dtype=bool)
+    no_motion[g_lines[np.isin(g_codes, _NO_MOTION_G)]] = True
+    # Se comparan los valores sin redondear para no confundir G91.1 con G91
+    relative = np.full(n_lines, np.nan)
+    relative[g_lines[values[is_g] == 90]] = 0
+    relative[g_lines[values[is_g] == 91]] = 1
+    relative = _fill_forward(relative, modal["relative"])
+
+    laser = np.full(n_lines, np.nan)
+    laser[m_lines[np.isin(m_codes, (3, 4))]] = 1
+    laser[m_lines[m_codes == 5]] = 0
+    laser = _fill_forward(laser, modal["laser"])
+    # Las órdenes del láser y las pausas (G4) vacían el planificador
+    sync = np.zeros(n_lines, dtype=bool)
+    sync[m_lines] = True
+    dwell = np.zeros(n_lines, dtype=bool)
+    dwell[g_lines[g_codes == 4]] = True
+    sync |= dwell
+
+    x, y = word("X"), word("Y")
+    has_xy = ~np.isnan(x) | ~np.isnan(y)
+    x, y = _axis(x, relative > 0, modal["x"]), _axis(y, relative > 0, modal["y"])
+    x0 = np.concatenate(([modal["x"]], x[:-1]))
+    y0 = np.concatenate(([modal["y"]], y[:-1]))
+    i_offset, j_offset = np.nan_to_num(word("I")), np.nan_to_num(word("J"))
+    chord = np.hypot(x - x0, y - y0)
+    arc = np.isin(motion, (2, 3)) & ((i_offset != 0) | (j_offset != 0))
+    return {
+        "motion": motion,
+        "laser": laser,
+        "sync": sync,
+        "dwell_time": np.nansum(word("P")[dwell]),
+        "x": x,
+        "y": y,
+        "x0": x0,
+        "y0": y0,
+        "i": i_offset,
+        "j": j_offset,
+        "feed": _fill_forward(word("F"), modal["feed"]),
+        "power": _fill_forward(word("S"), modal["power"]),
+        "relative": relative,
+        "arc": arc,
+        "is_move": has_xy & ~no_motion & ~np.isnan(motion) & ((chord > 1e-9) | arc),
+    }
+
+
+def _line_states(gcode, feed=np.nan):
+    """
+    Recorre el programa por bloques (_chunks) y da, para cada uno, su
+    _line_state, con el número de su primera línea (desde 0) en "first".
+    feed es la F inicial.
+    """
+    modal = {
+        "motion": np.nan,
+        "relative": 0.0,
+        "laser": 0.0,
+        "x": 0.0,
+        "y": 0.0,
+        "feed": feed,
+        "power": 0.0,
+    }
+    first = 0
+    for chunk in _chunks(_text(gcode)):
+        state = _line_state(chunk, modal)
+        state["first"] = first
+        yield state
+        # El bloque termina en salto de línea: su última línea (vacía) es la
+        # primera del siguiente
+        first += len(state["x"]) - 1
+        modal = {key: state[key][-1] for key in modal}
+
+
+def _arcs(state, lines):
+    """Centro, radio, ángulo inicial y barrido (con signo) de los arcos de lines."""
+    cx = state["x0"][lines] + state["i"][lines]
+    cy = state["y0"][lines] + state["j"][lines]
+    radius = np.hypot(state["i"][lines], state["j"][lines])
+    a0 = np.arctan2(state["y0"][lines] - cy, state["x0"][lines] - cx)
+    a1 = np.arctan2(state["y"][lines] - cy, state["x"][lines] - cx)
+    clockwise = state["motion"][lines] == 2
+    sweep = a1 - a0
+    sweep = np.where(clockwise & (sweep >= 0), sweep - 2 * math.pi, sweep)
+    sweep = np.where(~clockwise & (sweep <= 0), sweep + 2 * math.pi, sweep)
+    return cx, cy, radius, a0, sweep
+
+
+def _burning(state, move):
+    return (
+        (state["laser"][move] > 0)
+        & (state["power"][move] > 0)
+        & (state["motion"][move] != 0)
+    )
+
+
+def _planner_moves(state, acceleration, max_rate):
+    """
+    Tramos de un bloque para el planificador: longitud, dirección al empezar
+    y al acabar, velocidad nominal (mm/s), si queman y cuántas
+    sincronizaciones del bloque hay antes de cada uno.
+    """
+    move = np.flatnonzero(state["is_move"])
+    dx = state["x"][move] - state["x0"][move]
+    dy = state["y"][move] - state["y0"][move]
+
+    # Recta: dirección constante. Arco: tangentes al principio y al final
+    length = np.hypot(dx, dy)
+    start_dir = np.stack((dx, dy), axis=1) / np.maximum(length, 1e-12)[:, None]
+    end_dir = start_dir.copy()
+    nominal = np.where(
+        state["motion"][move] == 0, max_rate, np.minimum(state["feed"][move] / 60.0, max_rate)
+    )
+    arcs = np.flatnonzero(state["arc"][move])
+    if len(arcs):
+        cx, cy, radius, a0, sweep = _arcs(state, move[arcs])
+        length[arcs] = radius * np.abs(sweep)
+        sign = np.where(sweep < 0, -1.0, 1.0)
+        for angle, directions in ((a0, start_dir), (a0 + sweep, end_dir)):
+            directions[arcs, 0] = -np.sin(angle) * sign
+            directions[arcs, 1] = np.cos(angle) * sign
+        # Límite de aceleración centrípeta en el arco
+        nominal[arcs] = np.minimum(nominal[arcs], np.sqrt(acceleration * radius))
+    return {
+        "length": length,
+        "start_dir": start_dir,
+        "end_dir": end_dir,
+        "nominal": nominal,
+        "burning": _burning(state, move),
+        "synced": np.cumsum(state["sync"])[move],
+    }
+
+
+def move_times(length, start_dir, end_dir, nominal, synced, machine):
+    """
+    Tiempo (s) de cada tramo con el planificador de GRBL. Los tramos van
+    seguidos, de longitud length (mm), con sus direcciones unitarias al
+    empezar y al acabar y su velocidad nominal (mm/s). La máquina se detiene
+    al principio, al final y entre tramos con distinto synced.
+    """
+    acceleration = machine["acceleration"]
+    # Velocidad máxima en cada unión (fórmula de GRBL con la desviación de unión)
+    cos_theta = -(end_dir[:-1] * start_dir[1:]).sum(axis=1)
+    sin_half = np.sqrt(np.clip(0.5 * (1 - cos_theta), 0, 1))
+    with np.errstate(divide="ignore"):
+        junction2 = np.where(
+            cos_theta > 0.999999,
+            0.0,
+            acceleration
+            * machine["junction_deviation"]
+            * sin_half
+            / np.maximum(1 - sin_half, 0.0),
+        )
+    junction2 = np.minimum(junction2, np.minimum(nominal[:-1], nominal[1:]) ** 2)
+    junction2[synced[1:] != synced[:-1]] = 0.0
+    limit2 = np.concatenate(([0.0], junction2, [0.0]))
+
+    # Velocidad en cada unión: la mayor que respeta todos los límites y se
+    # puede alcanzar acelerando o frenando desde cualquier otra unión
+    s = np.concatenate(([0.0], np.cumsum(length)))
+    reach = 2 * acceleration * s
+    forward = np.minimum.accumulate(limit2 - reach) + reach
+    backward = np.minimum.accumulate((limit2 + reach)[::-1])[::-1] - reach
+    speed2 = np.maximum(np.minimum(forward, backward), 0.0)
+
+    return _segment_times(length, speed2[:-1], speed2[1:], nominal, acceleration)
+
+
+def estimate_job(gcode, machine):
+    """
+    Estima tiempos y distancias de un programa. gcode puede ser una lista de
+    líneas, un GCodeDocument o el texto en bytes; machine es machine_settings().
+    Devuelve un diccionario con burn_time, travel_time y total_time (s),
+    burn_distance y travel_distance (mm) y moves.
+    """
+    acceleration = machine["acceleration"]
+    max_rate = machine["max_rate"] / 60.0
+
+    parts, dwell_time, syncs = [], 0.0, 0
+    for state in _line_states(gcode, feed=machine["max_rate"]):
+        part = _planner_moves(state, acceleration, max_rate)
+        part["synced"] += syncs
+        syncs += int(np.count_nonzero(state["sync"]))
+        dwell_time += state["dwell_time"]
+        parts.append(part)
+    moves = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+    del parts
+    length, start_dir, end_dir = moves["length"], moves["start_dir"], moves["end_dir"]
+    nominal, synced = moves["nominal"], moves["synced"]
+    if len(length) == 0:
+        return {
+            "burn_time": 0.0,
+            "travel_time": 0.0,
+            "total_time": float(dwell_time),
+            "burn_distance": 0.0,
+            "travel_distance": 0.0,
+            "moves": 0,
+        }
+
+    times = move_times(length, start_dir, end_dir, nominal, synced, machine)
+    burning = moves["burning"]
+    burn_time = float(times[burning].sum())
+    travel_time = float(times[~burning].sum())
+    return {
+        "burn_time": burn_time,
+        "travel_time": travel_time,
+        "total_time": burn_time + travel_time + float(dwell_time),
+        "burn_distance": float(length[burning].sum()),
+        "travel_distance": float(length[~burning].sum()),
+        "moves": len(length),
+    }
+
+
+def _segments(state, arc_step):
+    """Tramos rectos de un bloque, como en toolpath_moves."""
+    move = np.flatnonzero(state["is_move"])
+    pieces = np.ones(len(move), dtype=np.int64)
+    arcs = np.flatnonzero(state["arc"][move])
+    if len(arcs):
+        cx, cy, radius, a0, sweep = _arcs(state, move[arcs])
+        pieces[arcs] = np.maximum(np.ceil(np.abs(sweep) / arc_step), 1)
+    owner = np.repeat(np.arange(len(move)), pieces)
+    line = move[owner]
+    segments = np.column_stack(
+        (state["x0"][line], state["y0"][line], state["x"][line], state["y"][line])
+    )
+    if len(arcs):
+        # Tramo k de cada arco: de a0 + barrido * k / n a a0 + barrido * (k + 1) / n
+        first = np.cumsum(pieces) - pieces
+        arc_rows = np.flatnonzero(state["arc"][line])
+        arc_index = np.searchsorted(move[arcs], line[arc_rows])
+        n = pieces[arcs][arc_index]
+        k = arc_rows - first[owner[arc_rows]]
+        start = a0[arc_index] + sweep[arc_index] * k / n
+        end = a0[arc_index] + sweep[arc_index] * (k + 1) / n
+        r = radius[arc_index]
+        segments[arc_rows, 0] = cx[arc_index] + r * np.cos(start)
+        segments[arc_rows, 1] = cy[arc_index] + r * np.sin(start)
+        segments[arc_rows, 2] = cx[arc_index] + r * np.cos(end)
+        segments[arc_rows, 3] = cy[arc_index] + r * np.sin(end)
+        # Los extremos del arco, exactos
+        last = k == n - 1
+        segments[arc_rows[last], 2] = state["x"][line[arc_rows[last]]]
+        segments[arc_rows[last], 3] = state["y"][line[arc_rows[last]]]
+    return {
+        "lines": line + state["first"] + 1,
+        "segments": segments,
+        "burning": _burning(state, move)[owner],
+    }
+
+
+def toolpath_moves(gcode, arc_step=math.pi / 18):
+    """
+    Tramos rectos del programa, para dibujar el avance del trabajo. Devuelve
+    un diccionario con lines (línea de cada tramo, numeradas desde 1),
+    segments (x0, y0, x1, y1) y burning. Los arcos se dividen en tramos de
+    como mucho arc_step radianes, todos con la línea del arco.
+    """
+    parts = [_segments(state, arc_step) for state in _line_states(gcode)]
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def format_duration(seconds):
+    """Duración legible: 1h 02m 03s, 4m 05s o 12s."""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m {seconds:02d}s"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+
+def summary(estimate):
+    """Resumen de una línea del resultado de estimate_job."""
+    return (
+        f"Tiempo estimado {format_duration(estimate['total_time'])} "
+        f"(grabado {format_duration(estimate['burn_time'])}, "
+        f"desplazamientos {format_duration(estimate['travel_time'])})"
+    )
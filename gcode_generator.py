@@ -1,116 +1,525 @@
+import logging
+import math
+import os
 import re
-from shapely.geometry import Polygon, MultiPolygon, LineString
-from shapely.affinity import translate
-from vector_canvas import DEFAULT_GRAPHIC_INFO
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from shapely.geometry import MultiPolygon, LineString
+from shapely.affinity import rotate
+import numpy as np
+from geometry import DEFAULT_GRAPHIC_INFO, offset_parts
+from gcode_document import GCodeDocument
+from gcode_encoder import GCodeWriter, encode_lines
+from arc_fitting import fit_arcs
+from raster import raster_gcode
+from contour_fill import contour_rings, order_rings, prefer_contour, span_overhead
+from scan_angle import best_scan_angle, candidate_angles
+from gcode_estimator import estimate_job, machine_settings, summary
+import instrumentation
 
 
-def generate_gcode(geometry, config, app_name=""):
+def toolpath_settings(config):
+    """
+    Parámetros de trazado leídos de la configuración tipada (typed_config).
+    Es un diccionario simple para poder pasarlo a otros procesos.
+    """
     # config es el configparser de la aplicación, extraemos de eĺ los datos que nos interesan
-    feed_rate = config["Engraver"].get("feed_rate")
-    fast_move_rate = config["Engraver"].get("fast_move_rate", 6000)
-    laser_power = config["Engraver"].get("laser_power", 1000)
     laser_on_cmd = config["Engraver"].get("laser_on_cmd", "M3")
-    laser_off_cmd = config["Engraver"].get("laser_off_cmd", "M5")
-    trace_outline = config["GCode"].get("trace_outline", True)
-    fill_inner = config["GCode"].get("fill_inner", True)
-    offset_distance = config["GCode"].get("offset_distance", 0.0)
-    fill_spacing = config["GCode"].get("fill_spacing", 0.1)
-
-    gcode = []
-    full_laser_on_cmd = f"{laser_on_cmd} S{laser_power:.0f}"
-
-    def trace(coords):
-        gcode.append("; Trazando contorno...")
-        if len(coords) < 2:
-            return
-        gcode.append(f"G0 X{coords[0][0]:.3f} Y{coords[0][1]:.3f}")
-        gcode.append(full_laser_on_cmd)
-        for point in coords[1:]:
-            gcode.append(f"G1 X{point[0]:.3f} Y{point[1]:.3f} F{feed_rate}")
-        gcode.append(laser_off_cmd)
-        gcode.append("")
-
-    def fill(poly):
-        gcode.append(f"; Rellenando ...")
-        minx, miny, maxx, maxy = poly.bounds
-        y = miny
-        direction_is_left_to_right = True
-        while y <= maxy:
-            scanline = LineString([(minx, y), (maxx, y)])
-            intersection = poly.intersection(scanline)
-            if not intersection.is_empty:
-                lines = (
-                    list(intersection.geoms)
-                    if hasattr(intersection, "geoms")
-                    else [intersection]
-                )
-                lines.sort(
-                    key=lambda line: line.coords[0][0],
-                    reverse=not direction_is_left_to_right,
+    laser_power = config["Engraver"].get("laser_power", 1000)
+    return {
+        "feed_rate": config["Engraver"].get("feed_rate"),
+        "fast_move_rate": config["Engraver"].get("fast_move_rate", 6000),
+        "laser_power": laser_power,
+        "laser_off_cmd": config["Engraver"].get("laser_off_cmd", "M5"),
+        "full_laser_on_cmd": f"{laser_on_cmd} S{laser_power:.0f}",
+        "trace_outline": config["GCode"].get("trace_outline", True),
+        "fill_inner": config["GCode"].get("fill_inner", True),
+        "offset_distance": config["GCode"].get("offset_distance", 0.0),
+        "fill_spacing": config["GCode"].get("fill_spacing", 0.1),
+        "compact_output": config["GCode"].get("compact_output", False),
+        "arc_tolerance": config["GCode"].get("arc_tolerance", 0.0),
+        "fill_mode": config["GCode"].get("fill_mode", "vector"),
+        "workers": config["GCode"].get("workers", 1),
+        "fill_angles": config["GCode"].get("fill_angles", 1),
+        "report_vanished": config["GCode"].get("report_vanished", True),
+        "machine": machine_settings(config),
+    }
+
+
+def gcode_header(settings, app_name=""):
+    return [
+        f"; G-code generado por {app_name}",
+        f"; Velocidad: {settings['feed_rate']}mm/min, Potencia: {settings['laser_power']}",
+        "G21 ; Unidades en mm",
+        "G90 ; Coordenadas absolutas",
+        f"{settings['laser_off_cmd']}  ; Apagar láser",
+        f"G0 F{settings['fast_move_rate']} ; Velocidad de movimiento rápido",
+        "",
+    ]
+
+
+GCODE_FOOTER = ["G0 X0 Y0 ; Volver al origen", "M2 ; Fin del programa"]
+# Por debajo de este número de polígonos no compensa arrancar procesos
+MIN_PARALLEL_POLYGONS = 16
+
+
+def resolve_workers(workers):
+    """workers <= 0 significa tantos procesos como núcleos."""
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def trace_path(gcode, coords, settings):
+    """
+    Añade a gcode (un GCodeWriter) el recorrido de una polilínea con el láser
+    encendido. Los tramos rectos se formatean todos de una vez.
+    """
+    feed_rate = settings["feed_rate"]
+    feed = f" F{feed_rate}".encode()
+    arc_tolerance = settings["arc_tolerance"]
+    gcode.append("; Trazando contorno...")
+    if len(coords) < 2:
+        return
+    gcode.append(f"G0 X{coords[0][0]:.3f} Y{coords[0][1]:.3f}")
+    gcode.append(settings["full_laser_on_cmd"])
+    if arc_tolerance > 0:
+        # Los tramos circulares se emiten como G2/G3 en lugar de muchos G1
+        x, y = coords[0]
+        run = []
+
+        def flush():
+            if run:
+                points = np.asarray(run, dtype=float)
+                gcode.rows([b"G1 X", points[:, 0], b" Y", points[:, 1], feed])
+                run.clear()
+
+        for segment in fit_arcs(coords, arc_tolerance):
+            end = segment[1]
+            if segment[0] == "arc":
+                flush()
+                center, clockwise = segment[2], segment[3]
+                gcode.append(
+                    f"G{2 if clockwise else 3} X{end[0]:.3f} Y{end[1]:.3f}"
+                    f" I{center[0] - x:.3f} J{center[1] - y:.3f} F{feed_rate}"
                 )
-                for line in lines:
-                    coords = list(line.coords)
-                    start_pt, end_pt = (
-                        (coords[0], coords[-1])
-                        if direction_is_left_to_right
-                        else (coords[-1], coords[0])
-                    )
-                    gcode.append(f"G0 X{start_pt[0]:.3f} Y{start_pt[1]:.3f}")
-                    gcode.append(full_laser_on_cmd)
-                    gcode.append(f"G1 X{end_pt[0]:.3f} Y{end_pt[1]:.3f} F{feed_rate}")
-                    gcode.append(laser_off_cmd)
+            else:
+                run.append(end)
+            x, y = end
+        flush()
+    else:
+        points = np.asarray(coords, dtype=float)
+        gcode.rows([b"G1 X", points[1:, 0], b" Y", points[1:, 1], feed])
+    gcode.append(settings["laser_off_cmd"])
+    gcode.append("")
+
+
+def fill_polygon(gcode, poly, settings, scan_origin=None, angle=0.0):
+    """
+    Añade a gcode (un GCodeWriter) el relleno de un polígono con líneas
+    horizontales alternas, o giradas angle grados.
+    Con scan_origin las líneas caen en y = scan_origin + k * fill_spacing, una
+    rejilla común a todos los polígonos (la usa el procesado por teselas).
+    """
+    fill_spacing = settings["fill_spacing"]
+    gcode.append(f"; Rellenando ...")
+    if angle:
+        # Se rellena en horizontal el polígono girado y cada tramo se gira de vuelta
+        poly = rotate(poly, -angle, origin=(0, 0))
+    minx, miny, maxx, maxy = poly.bounds
+    if scan_origin is None:
+        y = miny
+    else:
+        k = math.ceil((miny - scan_origin) / fill_spacing)
+        y = scan_origin + k * fill_spacing
+    direction_is_left_to_right = True
+    # Extremos de cada tramo: se formatean todos juntos al final
+    starts, ends = [], []
+    while y <= maxy:
+        scanline = LineString([(minx, y), (maxx, y)])
+        intersection = poly.intersection(scanline)
+        if not intersection.is_empty:
+            lines = (
+                list(intersection.geoms)
+                if hasattr(intersection, "geoms")
+                else [intersection]
+            )
+            lines.sort(
+                key=lambda line: line.coords[0][0],
+                reverse=not direction_is_left_to_right,
+            )
+            for line in lines:
+                coords = list(line.coords)
+                if direction_is_left_to_right:
+                    starts.append(coords[0])
+                    ends.append(coords[-1])
+                else:
+                    starts.append(coords[-1])
+                    ends.append(coords[0])
 
-            direction_is_left_to_right = not direction_is_left_to_right
+        direction_is_left_to_right = not direction_is_left_to_right
+        if scan_origin is None:
             y += fill_spacing
-        gcode.append("")
-
-    gcode.append(f"; G-code generado por {app_name}")
-    gcode.append(f"; Velocidad: {feed_rate}mm/min, Potencia: {laser_power}")
-    gcode.append("G21 ; Unidades en mm")
-    gcode.append("G90 ; Coordenadas absolutas")
-    gcode.append(f"{laser_off_cmd}  ; Apagar láser")
-    gcode.append(f"G0 F{fast_move_rate} ; Velocidad de movimiento rápido")
+        else:
+            k += 1
+            y = scan_origin + k * fill_spacing
+
+    if starts:
+        starts = np.asarray(starts, dtype=float)
+        ends = np.asarray(ends, dtype=float)
+        if angle:
+            cos_a = math.cos(math.radians(angle))
+            sin_a = math.sin(math.radians(angle))
+            starts, ends = (
+                np.column_stack(
+                    (
+                        p[:, 0] * cos_a - p[:, 1] * sin_a,
+                        p[:, 0] * sin_a + p[:, 1] * cos_a,
+                    )
+                )
+                for p in (starts, ends)
+            )
+        laser_on = f"\n{settings['full_laser_on_cmd']}\nG1 X".encode()
+        laser_off = f" F{settings['feed_rate']}\n{settings['laser_off_cmd']}".encode()
+        # Cada tramo son 4 líneas: G0 al inicio, láser encendido, G1 al final, apagado
+        gcode.rows(
+            [b"G0 X", starts[:, 0], b" Y", starts[:, 1], laser_on]
+            + [ends[:, 0], b" Y", ends[:, 1], laser_off]
+        )
     gcode.append("")
 
-    if geometry.is_empty:
-        gcode.append("; No se encontró geometría para generar.")
-        return gcode
 
-    min_x, min_y, _, _ = geometry.bounds
-    machine_geom = translate(geometry, xoff=-min_x, yoff=-min_y)
-    geoms_to_process = (
-        list(machine_geom.geoms) if hasattr(machine_geom, "geoms") else [machine_geom]
-    )
+def polygon_toolpaths(poly, settings):
+    """
+    Trayectorias de un polígono de la placa, ya en coordenadas de máquina y
+    con el offset aplicado (puede ser un MultiPolygon si el offset lo partió):
+    traza y rellena cada parte.
+    Es una función pura para poder ejecutarla en otro proceso. Devuelve
+    (líneas de G-code, partes que se rellenan en raster, tramos ahorrados
+    en cada parte con el relleno girado).
+    """
+    fill_mode = settings["fill_mode"]
+    spacing = settings["fill_spacing"]
+    gcode, raster_parts, saved_spans = GCodeWriter(), [], []
+    parts = poly.geoms if isinstance(poly, MultiPolygon) else [poly]
 
-    for poly in geoms_to_process:
-        if not isinstance(poly, Polygon) or poly.is_empty:
+    candidates = candidate_angles(settings["fill_angles"])
+    for p in parts:
+        if settings["trace_outline"]:
+            trace_path(gcode, list(p.exterior.coords), settings)
+            for interior in p.interiors:
+                trace_path(gcode, list(interior.coords), settings)
+        if not settings["fill_inner"]:
             continue
-        # Ajuste de la geometría con el offset para no quemar la zona exterior
-        # TODO: Esto puede hacer que desaparezcan línea que sean más finas que el offset
-        # Estudiar si hay que solucionarlo o lo doy por bueno
-        poly_to_process = (
-            poly.buffer(offset_distance) if abs(offset_distance) > 1e-6 else poly
-        )
-        if poly_to_process.is_empty:
+        if fill_mode == "raster":
+            raster_parts.append(p)
             continue
-        offset_polygons = (
-            list(poly_to_process.geoms)
-            if isinstance(poly_to_process, MultiPolygon)
-            else [poly_to_process]
+        # Ángulo de las líneas de relleno, el que da menos tramos
+        angle, spans, horizontal_spans = 0.0, 0.0, 0.0
+        if fill_mode in ("vector", "auto") and len(candidates) > 1:
+            angle, spans, horizontal_spans = best_scan_angle(p, spacing, candidates)
+        rings = []
+        if fill_mode == "contour" or (
+            fill_mode == "auto"
+            and prefer_contour(
+                p, spacing, settings["feed_rate"], settings["machine"], angle
+            )
+        ):
+            rings = contour_rings(p, spacing)
+        # Un polígono más estrecho que el paso no da ningún anillo: se rellena con líneas
+        if rings:
+            gcode.append("; Relleno concéntrico ...")
+            for ring in order_rings(rings, p.exterior.coords[0]):
+                trace_path(gcode, ring, settings)
+        else:
+            if angle:
+                saved_spans.append(horizontal_spans - spans)
+            fill_polygon(gcode, p, settings, angle=angle)
+    return gcode.getvalue(), raster_parts, saved_spans
+
+
+def _polygon_batch(polygons, settings):
+    return [polygon_toolpaths(poly, settings) for poly in polygons]
+
+
+# Procesos de generación compartidos entre llamadas: arrancarlos es caro (en
+# Windows y macOS cada uno vuelve a importar el programa principal, con wx)
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _shared_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Termina los procesos de generación compartidos (al salir de la aplicación)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _map_polygons(polygons, settings):
+    """
+    polygon_toolpaths de cada polígono, en varios procesos si hay suficientes.
+    Los resultados llegan en el orden de polygons, así que el G-code es el
+    mismo que en serie.
+    """
+    workers = resolve_workers(settings["workers"])
+    if workers > 1 and len(polygons) >= MIN_PARALLEL_POLYGONS:
+        chunksize = max(1, len(polygons) // (workers * 4))
+        executor = _shared_pool(workers)
+        # Como mucho 2 lotes por proceso en vuelo: si quien consume va más
+        # lento (el envío a la máquina), la generación se detiene
+        pending = deque()
+        try:
+            for i in range(0, len(polygons), chunksize):
+                batch = polygons[i : i + chunksize]
+                pending.append(executor.submit(_polygon_batch, batch, settings))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            # Si se deja de consumir a medias, los lotes pendientes no se calculan
+            for future in pending:
+                future.cancel()
+    else:
+        for poly in polygons:
+            yield polygon_toolpaths(poly, settings)
+
+
+# Elementos desaparecidos que se listan como comentario en el G-code
+MAX_VANISHED_COMMENTS = 20
+
+
+def report_vanished(gcode, vanished, offset_distance):
+    """Avisa en el log y en el G-code de las partes que el offset hace desaparecer."""
+    message = (
+        f"{len(vanished)} elementos desaparecen con el offset de {offset_distance} mm "
+        f"(son más finos que {2 * abs(offset_distance):.3f} mm)"
+    )
+    logging.warning(message)
+    gcode.append(f"; Aviso: {message}")
+    for part in vanished[:MAX_VANISHED_COMMENTS]:
+        x, y = part.centroid.coords[0]
+        gcode.append(f"; Desaparece: X{x:.3f} Y{y:.3f}")
+    gcode.append("")
+
+
+def _toolpath_blocks(geometry, settings, app_name):
+    """
+    El programa completo como bloques de bytes con líneas completas: cabecera,
+    uno por polígono según se generan y al final el raster y el pie.
+    """
+    header = GCodeWriter()
+    header.extend(gcode_header(settings, app_name))
+    if geometry.is_empty:
+        header.append("; No se encontró geometría para generar.")
+        yield header.getvalue()
+        return
+
+    # Ajuste de la geometría con el offset para no quemar la zona exterior.
+    # Las partes más finas que el offset desaparecen y se avisa de ellas
+    polygons, vanished = offset_parts(geometry, settings["offset_distance"])
+    if vanished and settings["report_vanished"]:
+        report_vanished(header, vanished, settings["offset_distance"])
+    yield header.getvalue()
+
+    # En modo raster el relleno de todos los polígonos se hace de una vez al final
+    raster_polygons = []
+    saved_spans = []
+    with instrumentation.span("toolpaths", polygons=len(polygons)):
+        for data, parts, spans in _map_polygons(polygons, settings):
+            if data:
+                yield data
+            raster_polygons.extend(parts)
+            saved_spans.extend(spans)
+
+    if saved_spans:
+        saved = sum(saved_spans)
+        overhead = span_overhead(
+            settings["fill_spacing"], settings["feed_rate"], settings["machine"]
         )
+        instrumentation.count(rotated_fills=len(saved_spans))
+        logging.info(
+            f"Relleno girado en {len(saved_spans)} polígonos: unos {saved:.0f} tramos "
+            f"y {saved * overhead:.0f} s menos (estimado)"
+        )
+
+    tail = GCodeWriter()
+    if raster_polygons:
+        with instrumentation.span("raster"):
+            tail.extend(raster_gcode(raster_polygons, settings))
+    tail.extend(GCODE_FOOTER)
+    instrumentation.count(polygons=len(polygons))
+    yield tail.getvalue()
+
+
+def compact_block(data):
+    """compact_gcode sobre un bloque de bytes; devuelve (bytes, estadísticas)."""
+    lines, stats = compact_gcode(data.decode("utf-8").split("\n")[:-1])
+    return encode_lines(lines), stats
+
 
-        for p in offset_polygons:
-            if trace_outline:
-                trace(list(p.exterior.coords))
-                for interior in p.interiors:
-                    trace(list(interior.coords))
-            if fill_inner:
-                fill(p)
+def gcode_blocks(geometry, config, app_name=""):
+    """
+    G-code de la geometría como bloques de bytes con líneas completas, que se
+    entregan en cuanto cada polígono está listo (para enviarlos a la máquina
+    sin esperar al programa entero). Con compact_output cada bloque se compacta
+    por separado, como en las teselas, y no lleva la estimación de tiempo.
+    """
+    settings = toolpath_settings(config)
+    for data in _toolpath_blocks(geometry, settings, app_name):
+        if settings["compact_output"]:
+            data = compact_block(data)[0]
+        yield data
 
-    gcode.append("G0 X0 Y0 ; Volver al origen")
-    gcode.append("M2 ; Fin del programa")
 
-    return gcode
+@instrumentation.traced("generate_gcode")
+def generate_gcode(geometry, config, app_name=""):
+    """
+    G-code de la geometría con la configuración tipada, como GCodeDocument.
+    La estimación de tiempos calculada para la cabecera queda en su atributo estimate.
+    """
+    settings = toolpath_settings(config)
+    gcode = GCodeWriter()
+    for data in _toolpath_blocks(geometry, settings, app_name):
+        gcode.write(data)
+    if geometry.is_empty:
+        return GCodeDocument(gcode.getvalue())
+    if instrumentation.is_enabled():
+        # len() cuenta los saltos de línea de todo el programa
+        instrumentation.count(lines=len(gcode))
+
+    if settings["compact_output"]:
+        with instrumentation.span("compact_gcode"):
+            lines, stats = compact_gcode(gcode.lines())
+            gcode = GCodeWriter()
+            gcode.extend(lines)
+        logging.info(
+            f"G-code compactado: {stats['bytes_before']} -> {stats['bytes_after']} bytes "
+            f"({stats['saved_percent']:.1f}% menos)"
+        )
+
+    with instrumentation.span("estimate"):
+        estimate = estimate_job(gcode, machine_settings(config))
+    # Tras la línea de velocidad y potencia de la cabecera
+    gcode.insert(2, f"; {summary(estimate)}")
+    logging.info(summary(estimate))
+    document = GCodeDocument(gcode.getvalue())
+    document.estimate = estimate
+    return document
+
+
+_COMMENT_RE = re.compile(r"\([^)]*\)|;.*$")
+_WORD_RE = re.compile(r"([A-Z])\s*([-+]?\d*\.?\d+)")
+# Palabras que puede llevar una línea de movimiento para poder compactarla
+_MOTION_WORDS = set("GXYIJFS")
+
+
+def format_number(value):
+    """Formatea con 3 decimales quitando los ceros sobrantes: 1.500 -> 1.5, 2.000 -> 2"""
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _sent_size(line):
+    # Bytes que realmente viajan por el puerto serie (sin comentarios, con salto de línea)
+    clean = _COMMENT_RE.sub("", line).strip()
+    return len(clean) + 1 if clean else 0
+
+
+def compact_gcode(gcode_lines):
+    """
+    Compacta un programa G-code: omite las palabras modales repetidas (G0/G1, F, S),
+    los ejes que no cambian, los ceros decimales sobrantes y los espacios en las
+    líneas de movimiento. Los comentarios y el resto de líneas se conservan.
+    Devuelve (líneas, estadísticas) con los bytes a enviar antes y después.
+    """
+    result = []
+    motion = None
+    relative = False
+    modal = {}
+    bytes_before = 0
+    bytes_after = 0
+    for line in gcode_lines:
+        bytes_before += _sent_size(line)
+        clean = _COMMENT_RE.sub("", line).strip().upper()
+        words = _WORD_RE.findall(clean)
+        letters = {letter for letter, _value in words}
+        g_codes = [int(float(value)) for letter, value in words if letter == "G"]
+        is_motion = (
+            not relative
+            and letters <= _MOTION_WORDS
+            and letters & {"X", "Y"}
+            and not _WORD_RE.sub("", clean).strip()
+            and len(g_codes) <= 1
+            and all(g in (0, 1, 2, 3) for g in g_codes)
+            and (g_codes or motion in (0, 1))
+        )
+        if not is_motion:
+            # Otras líneas pasan tal cual, pero pueden cambiar el estado modal
+            for code in g_codes:
+                if code in (0, 1, 2, 3):
+                    motion = code
+                elif code in (90, 91):
+                    relative = code == 91
+                elif code not in (20, 21):
+                    # G28, G92...: la posición deja de ser conocida
+                    modal.pop("X", None)
+                    modal.pop("Y", None)
+            for letter, value in words:
+                if letter in "FS":
+                    modal[letter] = format_number(float(value))
+                elif letter in "XY":
+                    modal.pop(letter, None)
+            result.append(line)
+            bytes_after += _sent_size(line)
+            continue
+
+        new_motion = g_codes[0] if g_codes else motion
+        is_arc = new_motion in (2, 3)
+        changed = []
+        for letter, value in words:
+            if letter != "G":
+                text = format_number(float(value))
+                # En los arcos I/J no son modales y GRBL exige X/Y en el plano
+                if is_arc and letter in "XYIJ" or modal.get(letter) != text:
+                    changed.append((letter, text))
+        if not any(letter in "XY" for letter, _text in changed):
+            # Movimiento nulo: no hace falta enviarlo
+            continue
+        out = []
+        # G2/G3 se mantiene siempre explícito para poder reanudar en cualquier línea
+        if new_motion != motion or is_arc:
+            out.append(f"G{new_motion}")
+            motion = new_motion
+        for letter, text in changed:
+            out.append(f"{letter}{text}")
+            if letter not in "IJ":
+                modal[letter] = text
+        compacted = "".join(out)
+        result.append(compacted)
+        bytes_after += len(compacted) + 1
+
+    saved = bytes_before - bytes_after
+    stats = {
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "saved": saved,
+        "saved_percent": 100.0 * saved / bytes_before if bytes_before else 0.0,
+    }
+    return result, stats
 
 
 def _add_point_to_path(paths, points, color):
@@ -124,12 +533,38 @@ def _add_point_to_path(paths, points, color):
         )
 
 
+def _arc_points(start, end, center, clockwise, max_step=0.2):
+    """Puntos de un arco G2/G3 para la vista previa, sin incluir el inicial."""
+    radius = math.dist(start, center)
+    start_angle = math.atan2(start[1] - center[1], start[0] - center[0])
+    end_angle = math.atan2(end[1] - center[1], end[0] - center[0])
+    sweep = end_angle - start_angle
+    if clockwise and sweep >= 0:
+        sweep -= 2 * math.pi
+    elif not clockwise and sweep <= 0:
+        sweep += 2 * math.pi
+    steps = max(2, int(math.ceil(abs(sweep) * radius / max_step)))
+    points = [
+        (
+            center[0] + radius * math.cos(start_angle + sweep * i / steps),
+            center[1] + radius * math.sin(start_angle + sweep * i / steps),
+        )
+        for i in range(1, steps)
+    ]
+    points.append(end)
+    return points
+
+
+@instrumentation.traced("parse_gcode_for_preview")
 def parse_gcode_for_preview(gcode_lines):
 
     result = DEFAULT_GRAPHIC_INFO.copy()
-    g_re = re.compile(r"G([0-3])")
+    g_re = re.compile(r"G(\d+)")
     x_re = re.compile(r"X(-?\d+\.?\d*)")
     y_re = re.compile(r"Y(-?\d+\.?\d*)")
+    i_re = re.compile(r"I(-?\d+\.?\d*)")
+    j_re = re.compile(r"J(-?\d+\.?\d*)")
+    s_re = re.compile(r"S(\d+\.?\d*)")
 
     CMD_TRAVEL = 0
     CMD_WRITE = 1
@@ -138,6 +573,10 @@ def parse_gcode_for_preview(gcode_lines):
 
     # Para saber si estamos viajando o grabando
     current_mode = CMD_TRAVEL
+    # Modo de movimiento modal: las líneas compactadas pueden omitir G0/G1
+    modal_mode = None
+    # Potencia modal; en modo raster los G1 con S0 son desplazamientos
+    power = None
 
     min_x, min_y, max_x, max_y = 0.0, 0.0, 0.0, 0.0
     current_x, current_y = 0.0, 0.0
@@ -149,13 +588,19 @@ def parse_gcode_for_preview(gcode_lines):
         if not clean_line:
             continue
 
-        g_match = g_re.search(clean_line)
-        if not g_match:
-            continue
+        s_match = s_re.search(clean_line)
+        if s_match:
+            power = float(s_match.group(1))
 
-        cmd_val = int(g_match.group(1))
-        if cmd_val > CMD_WRITE:
+        g_codes = [int(g) for g in g_re.findall(clean_line)]
+        motion_codes = [g for g in g_codes if g <= 3]
+        if motion_codes:
+            modal_mode = motion_codes[-1]
+        elif g_codes or modal_mode is None:
             continue
+
+        # Los arcos G2/G3 también son trazos de grabado
+        cmd_val = min(modal_mode, CMD_WRITE) if power != 0 else CMD_TRAVEL
         start_pos = (current_x, current_y)
 
         if cmd_val != current_mode:
@@ -176,23 +621,33 @@ def parse_gcode_for_preview(gcode_lines):
             current_y = float(y_match.group(1))
 
         end_pos = (current_x, current_y)
-        if current_x > max_x:
-            max_x = current_x
-        if current_y > max_y:
-            max_y = current_y
-        if current_x < min_x:
-            min_x = current_x
-        if current_y < min_y:
-            min_y = current_y
-
-        if start_pos == end_pos:
+        new_points = [end_pos]
+        i_match = i_re.search(clean_line)
+        j_match = j_re.search(clean_line)
+        if modal_mode in (2, 3) and (i_match or j_match):
+            center = (
+                start_pos[0] + (float(i_match.group(1)) if i_match else 0.0),
+                start_pos[1] + (float(j_match.group(1)) if j_match else 0.0),
+            )
+            new_points = _arc_points(start_pos, end_pos, center, modal_mode == 2)
+        elif start_pos == end_pos:
             continue
 
-        points.append(end_pos)
+        for x, y in new_points:
+            if x > max_x:
+                max_x = x
+            if y > max_y:
+                max_y = y
+            if x < min_x:
+                min_x = x
+            if y < min_y:
+                min_y = y
+        points.extend(new_points)
     # Guardo el último trazo
     _add_point_to_path(
         paths, points, travel_color if current_mode == CMD_TRAVEL else burn_color
     )
     result["bounds"] = (min_x, min_y, max_x, max_y)
     result["polygons"] = paths
+    instrumentation.count(lines=len(gcode_lines), paths=len(paths))
     return result
@@ -0,0 +1,145 @@
+import instrumentation
+
+# shapely (y con él numpy) se importa dentro de las funciones: VectorCanvas solo
+# necesita DEFAULT_GRAPHIC_INFO y así la ventana se abre sin cargarlo
+
+# Información gráfica vacía que entienden VectorCanvas y las vistas previas
+DEFAULT_GRAPHIC_INFO = {"bounds": (0, 0, 0, 0), "polygons": []}
+
+
+# Anchura mínima (mm) de una primitiva; las más finas se engrosan
+MIN_FEATURE_WIDTH = 0.01
+
+# Último resultado de offset_parts: (geometría, distancia, resultado)
+_offset_cache = (None, None, None)
+
+
+def primitive_shape(primitive):
+    """Forma de una primitiva tal como entra en la unión."""
+    geom = primitive["shape"]
+    # Si es muy delgado (por ejemplo, área muy pequeña o es una línea), engrosar
+    if hasattr(geom, "bounds"):
+        minx, miny, maxx, maxy = geom.bounds
+        width = maxx - minx
+        height = maxy - miny
+        if width < MIN_FEATURE_WIDTH or height < MIN_FEATURE_WIDTH:
+            geom = geom.buffer(MIN_FEATURE_WIDTH / 2, cap_style=1)
+    return geom
+
+
+def universe_box(bounds):
+    """Rectángulo que rodea bounds con un margen del 1%, para invertir la polaridad."""
+    from shapely import Polygon
+
+    margin = (bounds[2] - bounds[0]) * 0.01 if (bounds[2] - bounds[0]) > 0 else 1.0
+    return Polygon(
+        [
+            (bounds[0] - margin, bounds[1] - margin),
+            (bounds[2] + margin, bounds[1] - margin),
+            (bounds[2] + margin, bounds[3] + margin),
+            (bounds[0] - margin, bounds[3] + margin),
+        ]
+    )
+
+
+@instrumentation.traced("primitives_to_geometry")
+def primitives_to_geometry(primitives, invert_polarity=False):
+    from shapely import Polygon, unary_union
+
+    if not primitives:
+        return Polygon()
+    dark_geoms = [primitive_shape(prim) for prim in primitives]
+
+    final_geometry = unary_union(dark_geoms)
+    instrumentation.count(
+        primitives=len(primitives), parts=len(getattr(final_geometry, "geoms", [0]))
+    )
+
+    if invert_polarity:
+        if final_geometry.is_empty:
+            return Polygon()
+        universe = universe_box(final_geometry.bounds)
+        final_geometry = universe.difference(final_geometry)
+
+    return final_geometry
+
+
+@instrumentation.traced("offset")
+def offset_parts(geometry, distance):
+    """
+    Polígonos de geometry llevados al origen de la máquina (esquina inferior
+    izquierda en 0, 0) y con el offset aplicado a todos a la vez con
+    shapely.buffer. Devuelve (partes con offset, partes que desaparecen).
+    El resultado se guarda junto a la geometría, así que regenerar el G-code
+    con otros parámetros de relleno no repite el offset.
+    """
+    import shapely
+    from shapely.affinity import translate
+
+    global _offset_cache
+    cached_geometry, cached_distance, result = _offset_cache
+    if cached_geometry is geometry and cached_distance == distance:
+        return result
+
+    min_x, min_y = geometry.bounds[:2]
+    parts = shapely.get_parts(translate(geometry, xoff=-min_x, yoff=-min_y))
+    parts = parts[(shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)]
+    vanished = parts[:0]
+    if abs(distance) > 1e-6:
+        # Mismos segmentos por cuarto de círculo que Polygon.buffer (16, no 8)
+        offset = shapely.buffer(parts, distance, quad_segs=16)
+        empty = shapely.is_empty(offset)
+        # Con offset negativo desaparecen las partes más finas que 2 * |distance|
+        vanished = parts[empty]
+        parts = offset[~empty]
+    result = (list(parts), list(vanished))
+    _offset_cache = (geometry, distance, result)
+    instrumentation.count(parts=len(parts), vanished=len(vanished))
+    return result
+
+
+@instrumentation.traced("geometry_to_polygons")
+def geometry_to_polygons(geometry):
+    from shapely import MultiPolygon, Polygon
+
+    def _draw_polygon(polygon):
+        perimeter = {"mode": "fill", "color": (0, 100, 0, 250), "points": []}
+
+        if (
+            not hasattr(polygon, "exterior")
+            or polygon.exterior is None
+            or polygon.is_empty
+        ):
+            return perimeter
+        exterior_coords = list(polygon.exterior.coords)
+        if not exterior_coords:
+            return perimeter
+        points = []
+        points.append(exterior_coords)
+        for interior in getattr(polygon, "interiors", []):
+            interior_coords = list(interior.coords)
+            points.append(interior_coords)
+        perimeter["points"] = points
+        return perimeter
+
+    result = DEFAULT_GRAPHIC_INFO.copy()
+    if not geometry.is_empty:
+        result["bounds"] = geometry.bounds
+        if isinstance(geometry, MultiPolygon):
+            polygons = [_draw_polygon(part) for part in geometry.geoms]
+        elif isinstance(geometry, Polygon):
+            polygons = [_draw_polygon(geometry)]
+        else:
+            polygons = []
+        result["polygons"] = polygons
+        if instrumentation.is_enabled():
+            instrumentation.count(
+                polygons=len(polygons),
+                vertices=sum(len(ring) for p in polygons for ring in p["points"]),
+            )
+    return result
+
+
+def primitives_to_polygons(primitives, invert_polarity=False):
+    geometry = primitives_to_geometry(primitives, invert_polarity)
+    return geometry_to_polygons(geometry)
@@ -4,8 +4,27 @@ import os
 from shapely.geometry import Polygon, MultiPolygon, LineString, Point
 from shapely.ops import unary_union
 from shapely.affinity import rotate as shapely_rotate, scale as shapely_scale, translate
+import instrumentation
 from expression_evaluator import ExpressionEvaluator
 
+# Error de cuerda máximo por defecto (mm) al convertir arcos y círculos en polígonos.
+# Debe ser pequeño frente al diámetro del punto del láser.
+DEFAULT_MAX_CHORD_ERROR = 0.005
+
+
+def arc_segments(radius, angle, max_error):
+    """Número de segmentos para que la flecha de cada cuerda no supere max_error."""
+    if radius <= max_error:
+        step = math.pi / 2
+    else:
+        step = 2 * math.acos(1 - max_error / radius)
+    return max(1, int(math.ceil(abs(angle) / step)))
+
+
+def quad_segs(radius, max_error):
+    """Segmentos por cuarto de circunferencia, en el formato de buffer() de Shapely."""
+    return max(2, arc_segments(radius, math.pi / 2, max_error))
+
 
 def apply_transformations(shape, transform):
     """
@@ -35,8 +54,10 @@ class GerberParser:
     Implementa arcos (G02/G03) y lee atributos de fichero X2.
     """
 
-    def __init__(self):
+    def __init__(self, max_chord_error=DEFAULT_MAX_CHORD_ERROR):
         self.expr_eval = ExpressionEvaluator()
+        # Política de teselado común a arcos, círculos y extremos redondeados
+        self.max_chord_error = max_chord_error
 
         # Estado de coordenadas y gráficos
         self.x, self.y = 0.0, 0.0
@@ -54,6 +75,8 @@ class GerberParser:
         # Diccionarios de definiciones
         self.apertures = {}
         self.aperture_macros = {}
+        # Geometrías de macros ya instanciadas, por (nombre, parámetros)
+        self._macro_instances = {}
 
         # Estado de la región
         self.region_contours = []
@@ -180,22 +203,54 @@ class GerberParser:
             return "dark" if primitive_polarity == "clear" else "clear"
         return primitive_polarity
 
-    def _evaluate_expression(self, expr_str, variables):
-        return self.expr_eval.evaluate(expr_str, variables)
+    def _circle(self, cx, cy, radius):
+        return Point(cx, cy).buffer(
+            radius, quad_segs=quad_segs(radius, self.max_chord_error)
+        )
+
+    def _round_buffer(self, geom, radius, cap_style=1):
+        return geom.buffer(
+            radius,
+            quad_segs=quad_segs(radius, self.max_chord_error),
+            cap_style=cap_style,
+        )
+
+    def _compile_expression(self, expr_str):
+        try:
+            return self.expr_eval.compile(expr_str)
+        except ValueError as e:
+            # El error se notifica al instanciar la apertura, como antes
+            error = e
+
+            def fail(variables):
+                raise error
+
+            return fail
+
+    def _get_macro_instance(self, macro_name, ad_params):
+        key = (macro_name, tuple(ad_params))
+        shape = self._macro_instances.get(key)
+        if shape is None:
+            shape = self._instantiate_macro(macro_name, ad_params)
+            self._macro_instances[key] = shape
+        return shape
 
     def _instantiate_macro(self, macro_name, ad_params):
         if macro_name not in self.aperture_macros:
             raise ValueError(f"Macro de apertura '{macro_name}' no definida.")
         macro_def = self.aperture_macros[macro_name]
-        variables = {i + 1: p for i, p in enumerate(ad_params)}
+        # Vector de variables: variables[n] es $n
+        variables = [None] + list(ad_params)
         macro_geometries = []
         for item in macro_def:
             if item[0] == "var_def":
-                var_num = int(item[1][1:])
-                variables[var_num] = self._evaluate_expression(item[2], variables)
+                value = item[2](variables)
+                if item[1] >= len(variables):
+                    variables.extend([None] * (item[1] + 1 - len(variables)))
+                variables[item[1]] = value
             elif item[0] == "primitive":
-                code = int(item[1])
-                params = [self._evaluate_expression(p, variables) for p in item[2]]
+                code = item[1]
+                params = [param(variables) for param in item[2]]
                 # 7 (Thermal) no tiene exposure
                 exposure = bool(params.pop(0)) if code != 7 else True
                 primitive_geom = None
@@ -206,7 +261,7 @@ class GerberParser:
                     # Circle: Exposure, Diameter, Center X, Center Y[, Rotation]
                     dia, cx, cy = params[0], params[1], params[2]
                     rot = params[3] if len(params) > 3 else 0.0
-                    primitive_geom = Point(cx, cy).buffer(dia / 2.0)
+                    primitive_geom = self._circle(cx, cy, dia / 2.0)
                     if rot != 0:
                         primitive_geom = shapely_rotate(
                             primitive_geom, rot, origin=(cx, cy)
@@ -278,8 +333,8 @@ class GerberParser:
                 ):
                     # Thermal: Center X, Center Y, Outer diameter, Inner diameter, Gap, Rotation
                     cx, cy, outer_dia, inner_dia, gap, rot = params
-                    outer = Point(cx, cy).buffer(outer_dia / 2.0)
-                    inner = Point(cx, cy).buffer(inner_dia / 2.0)
+                    outer = self._circle(cx, cy, outer_dia / 2.0)
+                    inner = self._circle(cx, cy, inner_dia / 2.0)
                     thermal = outer.difference(inner)
                     # Gaps: crear 4 rectángulos y restarlos
                     for i in range(4):
@@ -326,21 +381,34 @@ class GerberParser:
         return final_geom
 
     def _handle_aperture_macro(self, command_block):
+        """
+        Compila la macro una sola vez: cada expresión queda analizada y lista
+        para evaluarse con los parámetros de cada apertura.
+        """
         lines = [line.strip() for line in command_block.split("*") if line.strip()]
         macro_name = lines.pop(0)
         macro_definition = []
         for line in lines:
             if "=" in line:
                 var, expr = line.split("=", 1)
-                macro_definition.append(("var_def", var.strip(), expr.strip()))
+                macro_definition.append(
+                    ("var_def", int(var.strip()[1:]), self._compile_expression(expr))
+                )
             else:
                 # Eliminar comentarios
                 if not line.startswith("0"):
                     parts = line.split(",")
                     macro_definition.append(
-                        ("primitive", parts[0].strip(), [p.strip() for p in parts[1:]])
+                        (
+                            "primitive",
+                            int(parts[0].strip()),
+                            [self._compile_expression(p.strip()) for p in parts[1:]],
+                        )
                     )
         self.aperture_macros[macro_name] = macro_definition
+        # Una macro redefinida invalida sus instancias anteriores
+        for key in [k for k in self._macro_instances if k[0] == macro_name]:
+            del self._macro_instances[key]
 
     def _handle_aperture_define(self, command):
         match = re.match(r"ADD(\d+)(.*)", command)
@@ -361,9 +429,9 @@ class GerberParser:
         try:
             if template_name == "C":
                 dia = params[0]
-                shape = Point(0, 0).buffer(dia / 2.0)
+                shape = self._circle(0, 0, dia / 2.0)
                 if len(params) > 1:
-                    shape = shape.difference(Point(0, 0).buffer(params[1] / 2.0))
+                    shape = shape.difference(self._circle(0, 0, params[1] / 2.0))
                 aperture_info.update({"shape": shape, "diameter": dia})
             elif template_name == "R":
                 w, h = params[0], params[1]
@@ -371,18 +439,18 @@ class GerberParser:
                     [(-w / 2, -h / 2), (w / 2, -h / 2), (w / 2, h / 2), (-w / 2, h / 2)]
                 )
                 if len(params) > 2:
-                    shape = shape.difference(Point(0, 0).buffer(params[2] / 2.0))
+                    shape = shape.difference(self._circle(0, 0, params[2] / 2.0))
                 aperture_info["shape"] = shape
             elif template_name == "O":
                 w, h = params[0], params[1]
                 if w > h:
                     line = LineString([(-(w - h) / 2, 0), ((w - h) / 2, 0)])
-                    shape = line.buffer(h / 2, cap_style=1)
+                    shape = self._round_buffer(line, h / 2)
                 else:
                     line = LineString([(0, -(h - w) / 2), (0, (h - w) / 2)])
-                    shape = line.buffer(w / 2, cap_style=1)
+                    shape = self._round_buffer(line, w / 2)
                 if len(params) > 2:
-                    shape = shape.difference(Point(0, 0).buffer(params[2] / 2.0))
+                    shape = shape.difference(self._circle(0, 0, params[2] / 2.0))
                 aperture_info["shape"] = shape
             elif template_name == "P":
                 dia, n_vertices, rot = (
@@ -400,10 +468,10 @@ class GerberParser:
                 ]
                 shape = Polygon(points)
                 if len(params) > 3:
-                    shape = shape.difference(Point(0, 0).buffer(params[3] / 2.0))
+                    shape = shape.difference(self._circle(0, 0, params[3] / 2.0))
                 aperture_info["shape"] = shape
             else:
-                shape = self._instantiate_macro(template_name, params)
+                shape = self._get_macro_instance(template_name, params)
                 aperture_info.update({"shape": shape, "type": "MACRO"})
         except Exception as e:
             print(f"ERROR: Parámetros incorrectos para apertura D{d_code}: {e}")
@@ -438,7 +506,9 @@ class GerberParser:
             end_angle = start_angle + (-2 * math.pi if clockwise else 2 * math.pi)
 
         total_angle = abs(end_angle - start_angle)
-        num_segments = max(2, int(math.ceil(total_angle * radius / 0.05)))
+        num_segments = max(
+            2, arc_segments(radius, total_angle, self.max_chord_error)
+        )
 
         points = [start]
         for i in range(1, num_segments):
@@ -536,7 +606,7 @@ class GerberParser:
                     path = LineString([start_point, end_point])
 
                 if path:
-                    buffered_path = path.buffer(width / 2.0, cap_style=1)
+                    buffered_path = self._round_buffer(path, width / 2.0)
                     transformed_path = apply_transformations(
                         buffered_path, self.transforms
                     )
@@ -570,6 +640,7 @@ class GerberParser:
 
         self.x, self.y = new_x, new_y
 
+    @instrumentation.traced("parse")
     def parse(self, gerber_content=None, filepath=None, encoding="utf-8"):
         """
         Analiza el contenido de un fichero Gerber.
@@ -640,7 +711,12 @@ class GerberParser:
                         for contour in self.region_contours:
                             points = []
                             for action in contour:
-                                if action[0] in ("move", "line", "arc"):
+                                if action[0] == "arc" and points:
+                                    arc = self._create_arc_path(
+                                        points[-1], action[1], action[2], action[3]
+                                    )
+                                    points.extend(list(arc.coords)[1:])
+                                elif action[0] in ("move", "line", "arc"):
                                     points.append(action[1])
                             if len(points) < 3:
                                 # No podemos formar un polígono con menos de 3 puntos
@@ -695,6 +771,7 @@ class GerberParser:
                     break
                 else:
                     self._execute_operation(cmd)
+        instrumentation.count(bytes=len(gerber_content), primitives=len(self.primitives))
 
     def get_primitives(self):
         return self.primitives
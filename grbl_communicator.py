@@ -1,16 +1,155 @@
+import asyncio
+import json
 import logging
+import os
+import queue
 import re
 import serial
-import time
+import threading
+import numpy as np
 import serial.tools.list_ports
+from gcode_document import GCodeDocument, NormalizedGCode
+from grbl_transport import MAX_LINE_BYTES, AsyncGrblTransport, is_realtime_command
+
+
+_WORD_RE = re.compile(rb"([GMXYFS])\s*([-+]?\d*\.?\d+)")
+_COMMENT_RE = re.compile(rb"\([^)]*\)|;.*$")
+
+# Cola entre la generación y el envío: bloques de hasta STREAM_CHUNK_LINES líneas
+STREAM_QUEUE_CHUNKS = 16
+STREAM_CHUNK_LINES = 256
+# Bloques del planificador de GRBL (BLOCK_BUFFER_SIZE). Su "ok" solo indica que
+# la línea ha entrado en el planificador, no que se haya ejecutado.
+PLANNER_BLOCKS = 16
+
+
+def _clean_line(line):
+    """Elimina comentarios y espacios de una línea, devolviendo bytes."""
+    if isinstance(line, str):
+        line = line.encode()
+    return _COMMENT_RE.sub(b"", line).strip()
+
+
+def _check_line_length(normalized, start_line=1):
+    """Comprueba antes de enviar que ninguna línea desborda el buffer de línea de GRBL."""
+    numbers = normalized.long_lines(MAX_LINE_BYTES)
+    numbers = numbers[numbers >= start_line]
+    if len(numbers):
+        logging.error(
+            f"{len(numbers)} líneas tienen más de {MAX_LINE_BYTES - 1} caracteres "
+            f"y GRBL las rechazaría (líneas {numbers[:10].tolist()})"
+        )
+        return False
+    return True
+
+
+def safe_resume_line(numbers, last_acked, queued=0):
+    """
+    Línea desde la que reanudar sin dejar huecos tras confirmarse last_acked:
+    se retroceden los bloques que podían quedar en el planificador y las
+    queued líneas que esperaban en el buffer de recepción. Se cuentan solo
+    las líneas que se envían de verdad (numbers, de NormalizedGCode).
+    """
+    sent = int(np.searchsorted(numbers, last_acked, side="right"))
+    index = sent - PLANNER_BLOCKS - queued
+    return int(numbers[index]) if index > 0 else 1
+
+
+def parse_status(report):
+    """
+    Campos de un informe de estado '<Run|MPos:1.000,2.000,0.000|FS:500,0>'.
+    Devuelve un diccionario con el estado y las posiciones (MPos, WPos, WCO)
+    que traiga, como tuplas de float.
+    """
+    fields = report.strip().strip("<>").split("|")
+    status = {"state": fields[0]}
+    for field in fields[1:]:
+        name, separator, value = field.partition(":")
+        if separator and name in ("MPos", "WPos", "WCO"):
+            try:
+                status[name] = tuple(float(v) for v in value.split(","))
+            except ValueError:
+                pass
+    return status
+
+
+def build_resume_preamble(lines, laser_off_cmd="M5"):
+    """
+    Recorre las líneas ya ejecutadas y devuelve los comandos necesarios para
+    restablecer el estado modal (unidades, modo de coordenadas, avance, potencia
+    del láser y modo de movimiento) y situar el cabezal donde se quedó, con el
+    láser apagado. No tiene en cuenta desplazamientos G92 del propio programa.
+    """
+    units = b"G21"
+    distance = b"G90"
+    motion = 0
+    feed = None
+    spindle = None
+    power = None
+    x, y = 0.0, 0.0
+    for line in lines:
+        if isinstance(line, str):
+            line = line.encode()
+        line = _COMMENT_RE.sub(b"", bytes(line)).upper()
+        new_x = new_y = None
+        for letter, value in _WORD_RE.findall(line):
+            if letter == b"G":
+                code = float(value)
+                if code in (20, 21):
+                    units = b"G%d" % code
+                elif code in (90, 91):
+                    distance = b"G%d" % code
+                elif code in (0, 1, 2, 3):
+                    motion = int(code)
+            elif letter == b"M":
+                code = int(float(value))
+                if code in (3, 4, 5):
+                    spindle = code
+            elif letter == b"F":
+                feed = value
+            elif letter == b"S":
+                power = value
+            elif letter == b"X":
+                new_x = float(value)
+            elif letter == b"Y":
+                new_y = float(value)
+        if distance == b"G91":
+            x += new_x or 0.0
+            y += new_y or 0.0
+        else:
+            x = x if new_x is None else new_x
+            y = y if new_y is None else new_y
+
+    preamble = [units.decode(), "G90", laser_off_cmd, f"G0 X{x:.3f} Y{y:.3f}"]
+    if motion == 1 and feed is not None:
+        # Movimiento nulo para dejar G1 y el avance como modales
+        preamble.append(f"G1 X{x:.3f} Y{y:.3f} F{feed.decode()}")
+    elif feed is not None:
+        preamble.append(f"F{feed.decode()}")
+    if distance == b"G91":
+        preamble.append("G91")
+    if spindle in (3, 4):
+        preamble.append(f"M{spindle}" + (f" S{power.decode()}" if power else ""))
+    return preamble
 
 
 class GrblCommunicator:
     global _
 
-    def __init__(self):
+    def __init__(self, loop=None):
         self.serial_port = None
         self.grbl_ready = False
+        self.transport = None
+        # Se puede compartir un mismo event loop entre varias máquinas
+        self._loop = loop
+        self._loop_thread = None
+        self.command_timeout = 10.0
+        # Punto de control: fichero donde se guarda la última línea confirmada
+        self.checkpoint_file = None
+        self.checkpoint_interval = 25
+        self.laser_off_cmd = "M5"
+        # Error del último envío (None si terminó bien)
+        self.stream_error = None
 
     @staticmethod
     def get_available_ports():
@@ -20,6 +159,19 @@ class GrblCommunicator:
     def is_connected(self):
         return self.serial_port is not None and self.serial_port.is_open
 
+    def _ensure_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        if not self._loop.is_running() and self._loop_thread is None:
+            self._loop_thread = threading.Thread(
+                target=self._loop.run_forever, name="grbl-loop", daemon=True
+            )
+            self._loop_thread.start()
+
+    def _run(self, coro, timeout=None):
+        """Ejecuta una corrutina en el loop del transporte y espera su resultado."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
     def connect(self, port, baudrate=115200):
         if self.is_connected():
             self.disconnect()
@@ -30,6 +182,9 @@ class GrblCommunicator:
             # Esperar a que GRBL se reinicie y envíe el mensaje de bienvenida
             # time.sleep(2)
             self._flush_input_buffer()
+            self._ensure_loop()
+            self.transport = AsyncGrblTransport(self.serial_port, self._loop)
+            self._run(self.transport.start())
             self.grbl_ready = True
             logging.info(("Connected to GRBL on {port}").format(port=port))
             return True
@@ -39,16 +194,28 @@ class GrblCommunicator:
             return False
 
     def disconnect(self):
+        if self.transport:
+            self._run(self.transport.stop())
+            self.transport = None
         if self.is_connected():
             self.serial_port.close()
             logging.info("Disconnected from GRBL")
         self.grbl_ready = False
 
+    def close(self):
+        """Desconecta y detiene el event loop propio, si se creó uno."""
+        self.disconnect()
+        if self._loop_thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop_thread = None
+            self._loop.close()
+            self._loop = None
+
     def _flush_input_buffer(self):
         # Limpiar cualquier dato de inicio de GRBL
         if self.serial_port:
-            while self.serial_port.in_waiting > 0:
-                self.serial_port.readline()
+            self.serial_port.reset_input_buffer()
 
     def check_state_ready(self):
         if not self.serial_port or not self.serial_port.is_open or not self.grbl_ready:
@@ -61,67 +228,246 @@ class GrblCommunicator:
             return None
         if not isinstance(command, bytes):
             command = bytes(command.encode())
-        command = command.strip() + b"\n"  # GRBL espera un salto de línea al final
         try:
-            self.serial_port.write(command)
-            response = self.serial_port.readline().decode("utf-8").strip()
-            logging.info(f"Sent: {command.strip()} | Received: {response}")
+            if is_realtime_command(command):
+                self._loop.call_soon_threadsafe(self.transport.send_realtime, command)
+                logging.info(f"Sent: {command}")
+                return None
+            command = command.strip()
+            response = self._run(
+                self.transport.send_line(command), self.command_timeout
+            )
+            logging.info(f"Sent: {command} | Received: {response}")
             return response
         except Exception as e:
-            logging.error(f"Error al enviar comando: {e}")
+            logging.error(f"Error al enviar comando: {e!r}")
             return None
 
-    def stream_gcode_text(self, text):
+    def get_status(self):
+        """Pide un informe de estado a GRBL ('<Idle|MPos:...>')."""
         if not self.check_state_ready():
             return None
-        self._flush_input_buffer()
-        for line in text:
-            if not self._send_line(line):
-                break
-        logging.info("Transmisión de G-code completada.")
+        try:
+            return self._run(self.transport.request_status(), self.command_timeout)
+        except Exception as e:
+            logging.error(f"Error pidiendo el estado: {e!r}")
+            return None
 
-    def stream_gcode_file(self, filename):
+    def start_status_polling(self, listener, interval=0.2):
+        """listener(estado) se llama desde el hilo del transporte."""
+        if not self.check_state_ready():
+            return
+        self.transport.status_listeners.append(listener)
+        self._loop.call_soon_threadsafe(self.transport.start_status_polling, interval)
+
+    def stop_status_polling(self):
+        if self.transport:
+            self.transport.status_listeners.clear()
+            self._loop.call_soon_threadsafe(self.transport.stop_status_polling)
+
+    def cancel_stream(self):
+        if self.transport:
+            self._loop.call_soon_threadsafe(self.transport.cancel_stream)
+
+    def stream_gcode_text(self, text, progress=None, start_line=1):
+        document = GCodeDocument.from_lines(list(text))
+        return self.stream_gcode_document(document, progress, start_line)
+
+    def stream_gcode_file(self, filename, progress=None, start_line=1):
+        with GCodeDocument.open(filename) as document:
+            return self.stream_gcode_document(document, progress, start_line)
+
+    def stream_gcode_document(self, document, progress=None, start_line=1):
+        """
+        Envía un GCodeDocument. El documento se normaliza una sola vez (queda
+        guardado en él), así que el envío solo escribe líneas ya preparadas.
+        Si se indica, progress(enviadas, total) se llama tras cada línea.
+        """
+        if not self.check_state_ready():
+            return None
+        return self._stream_lines(
+            document, document.normalized(), progress, start_line, document.name
+        )
+
+    def stream_gcode_blocks(self, blocks, progress=None, source=None):
+        """
+        Envía el G-code a medida que se genera. blocks es un iterable de bloques
+        de bytes con líneas completas (gcode_blocks, generate_gcode_tiled); se
+        recorre en otro hilo que deja las líneas ya limpias en una cola acotada,
+        así que la máquina empieza a grabar mientras se generan los siguientes
+        polígonos y la generación se detiene si va demasiado por delante.
+        progress(enviadas, None) se llama tras cada línea confirmada.
+        Devuelve el número de la última línea confirmada por GRBL.
+        Las líneas se cuentan ya limpias, así que no coinciden con las del
+        programa: los puntos de control se guardan como no reanudables.
+        """
         if not self.check_state_ready():
             return None
-        self._flush_input_buffer()
-        with open(filename, "r") as f:
-            for line in f:
+        chunks = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        stop = threading.Event()
+        state = {"last_acked": 0, "error": None}
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for data in blocks:
+                    normalized = NormalizedGCode(data)
+                    if not _check_line_length(normalized):
+                        state["error"] = "line too long"
+                        return
+                    lines = [line for _number, line in normalized.iter_lines()]
+                    for i in range(0, len(lines), STREAM_CHUNK_LINES):
+                        if not put(lines[i : i + STREAM_CHUNK_LINES]):
+                            return
+            except Exception as e:
+                logging.error(f"Error generando el G-code: {e!r}")
+                state["error"] = "generation"
+            finally:
+                put(None)
+
+        async def queued_lines():
+            number = 0
+            while True:
+                chunk = await self._loop.run_in_executor(None, chunks.get)
+                if chunk is None:
+                    return
+                for line in chunk:
+                    number += 1
+                    yield number, line
+
+        def acknowledged(number):
+            state["last_acked"] = number
+            if number % self.checkpoint_interval == 0:
+                self._write_checkpoint(source, number, None, resumable=False)
+            if progress:
+                progress(number, None)
+
+        producer = threading.Thread(target=produce, name="gcode-producer", daemon=True)
+        producer.start()
+        try:
+            error = self._run(self.transport.stream(queued_lines(), acknowledged))[1]
+        finally:
+            stop.set()
+            producer.join()
+        error = state["error"] or error
+        return self._finish_stream(source, state["last_acked"], None, error, resumable=False)
+
+    def _stream_lines(self, document, normalized, progress, start_line, source=None):
+        """
+        Envía las líneas desde start_line (numeradas desde 1). Si no se empieza
+        por la primera, antes se restablece el estado modal de las anteriores.
+        Devuelve el número de la última línea confirmada por GRBL.
+        """
+        total = len(document)
+        last_acked = start_line - 1
+        if not _check_line_length(normalized, start_line):
+            return self._finish_stream(
+                source, last_acked, total, "line too long", resume=start_line
+            )
+        if start_line > 1:
+            preamble = build_resume_preamble(
+                (document.line_bytes(i) for i in range(start_line - 1)),
+                self.laser_off_cmd,
+            )
+            logging.info(f"Reanudando en la línea {start_line}: {preamble}")
+            for line in preamble:
                 if not self._send_line(line):
-                    break
+                    return self._finish_stream(
+                        source, last_acked, total, "resume preamble failed", resume=start_line
+                    )
+        state = {"last_acked": last_acked, "queued": 0}
+
+        def resume_line(number):
+            # Lo anterior a start_line no se ha enviado en este trabajo
+            line = safe_resume_line(normalized.numbers, number, state["queued"])
+            return max(line, start_line)
+
+        def acknowledged(number):
+            state["last_acked"] = number
+            state["queued"] = self.transport.pending_lines
+            if number % self.checkpoint_interval == 0:
+                self._write_checkpoint(source, number, total, resume=resume_line(number))
+            if progress:
+                progress(number, total)
 
-        logging.info("Transmisión de G-code completada.")
+        lines = normalized.iter_lines(start_line)
+        error = self._run(self.transport.stream(lines, acknowledged))[1]
+        last_acked = total if error is None else state["last_acked"]
+        return self._finish_stream(
+            source, last_acked, total, error, resume=resume_line(last_acked)
+        )
+
+    def _finish_stream(self, source, last_acked, total, error, resumable=True, resume=None):
+        self.stream_error = error
+        self._write_checkpoint(source, last_acked, total, resumable, resume)
+        if error is None:
+            logging.info("Transmisión de G-code completada.")
+        else:
+            logging.warning(
+                f"Transmisión interrumpida ({error}). Última línea confirmada: {last_acked}"
+            )
+        return last_acked
+
+    def _write_checkpoint(self, source, line, total, resumable=True, resume=None):
+        """
+        line es la última línea confirmada y resume la primera que puede no
+        haberse ejecutado (safe_resume_line), desde la que se reanuda.
+        """
+        if not self.checkpoint_file:
+            return
+        checkpoint = {
+            "source": source,
+            "line": line,
+            "total": total,
+            "resumable": resumable,
+            "resume": resume,
+        }
+        # Escritura atómica para no dejar un fichero corrupto si se va la luz
+        tmp_file = f"{self.checkpoint_file}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_file, self.checkpoint_file)
+        except OSError as e:
+            logging.error(f"Error guardando el punto de control: {e}")
+
+    def load_checkpoint(self):
+        """
+        Devuelve el último punto de control guardado o None. Solo se puede
+        reanudar desde los que tienen resumable (los antiguos no lo llevan),
+        a partir de su línea resume.
+        """
+        if not self.checkpoint_file:
+            return None
+        try:
+            with open(self.checkpoint_file, "r") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("resume") is None:
+            # Sin las líneas enviadas a mano: se retrocede al menos el planificador
+            line = checkpoint.get("line") or 0
+            checkpoint["resume"] = max(line + 1 - PLANNER_BLOCKS, 1)
+        return checkpoint
 
     def _send_line(self, line):
         # Ignorar líneas vacías y comentarios
-        line = re.sub(r"\([^)]*\)|;.*$", "", line)
-        line = line.strip()
+        line = _clean_line(line)
         if not line:
             return True
         response = self.send_command(line)
-        time.sleep(0.05)
         # GRBL suele responder con 'ok' o un mensaje de error.
-        retries = 0
-        while response != "ok":
-            if response and "error" in response.lower():
-                logging.warning(f"Error GRBL: {response} en línea: {line}")
-                return False  # Detener si hay un error
-            # Si no es 'ok' o error, espera un poco y lee de nuevo (podría ser un mensaje de estado)
-            time.sleep(0.1)
-            response = self.serial_port.readline()
-            if response == b"":
-                if retries == 0:
-                    # Si no hay respuesta, intenta enviar un ? para pedir estado
-                    self.serial_port.write(b"?\n")
-                    time.sleep(0.1)
-                    response = self.serial_port.readline().decode("utf-8").strip()
-                retries += 1
-                print(retries)
-            else:
-                response = response.decode("utf-8").strip()
-
-            if retries >= 100:
-                return False
-
+        if response != "ok":
+            logging.warning(f"Error GRBL: {response} en línea: {line}")
+            return False  # Detener si hay un error
         return True
 
 
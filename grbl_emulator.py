@@ -0,0 +1,112 @@
+import os
+import re
+import threading
+import time
+
+WELCOME = b"\r\nGrbl 1.1h ['$' for help]\r\n"
+
+
+class GrblEmulator:
+    """
+    Emulador mínimo de GRBL sobre un pseudo-terminal (solo POSIX).
+    Responde 'ok' a cada línea, informes de estado a '?', y simula un tiempo
+    de ejecución por línea. Sirve para probar el streaming y el dispatcher sin
+    máquina: basta con conectar un GrblCommunicator a `emulator.port`.
+    """
+
+    def __init__(self, line_delay=0.0, error_prefix=b"ERR"):
+        self.line_delay = line_delay
+        self.error_prefix = error_prefix
+        self.lines_received = 0
+        self.position = [0.0, 0.0]
+        self.state = "Idle"
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        import pty
+        import tty
+
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+        if self._thread:
+            self._thread.join(1.0)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _write(self, data):
+        with self._lock:
+            os.write(self._master, data)
+
+    def _status(self):
+        x, y = self.position
+        return f"<{self.state}|MPos:{x:.3f},{y:.3f},0.000|FS:0,0>\r\n".encode()
+
+    def _run(self):
+        line = bytearray()
+        while self._running:
+            try:
+                data = os.read(self._master, 1024)
+            except OSError:
+                break
+            for byte in data:
+                if byte == ord("?"):
+                    self._write(self._status())
+                elif byte == 0x18:
+                    line.clear()
+                    self._write(WELCOME)
+                elif byte in (ord("!"), ord("~")) or byte >= 0x80:
+                    continue
+                elif byte == ord("\n"):
+                    self._execute(bytes(line).strip())
+                    line.clear()
+                elif byte != ord("\r"):
+                    line.append(byte)
+
+    def _execute(self, line):
+        if line.upper().startswith(self.error_prefix):
+            self._write(b"error:2\r\n")
+            return
+        if line:
+            self.lines_received += 1
+            self.state = "Run"
+            for axis, value in re.findall(rb"([XY])(-?\d*\.?\d+)", line.upper()):
+                self.position[0 if axis == b"X" else 1] = float(value)
+            if self.line_delay:
+                time.sleep(self.line_delay)
+            self.state = "Idle"
+        self._write(b"ok\r\n")
+
+
+if __name__ == "__main__":
+    with GrblEmulator(line_delay=0.001) as emulator:
+        print(f"Emulador GRBL escuchando en {emulator.port} (Ctrl+C para salir)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
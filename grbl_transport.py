@@ -0,0 +1,235 @@
+import asyncio
+import collections
+import logging
+
+# Caracteres de tiempo real de GRBL: se procesan al llegar, sin pasar por el buffer
+REALTIME_COMMANDS = (b"?", b"!", b"~", b"\x18")
+
+# Tamaño del buffer de recepción serie de GRBL
+RX_BUFFER_SIZE = 128
+# Longitud máxima de una línea, con su salto (LINE_BUFFER_SIZE de GRBL)
+MAX_LINE_BYTES = 80
+
+
+def is_realtime_command(command):
+    return command in REALTIME_COMMANDS or (len(command) == 1 and command[0] >= 0x80)
+
+
+async def _iterate(lines):
+    """Recorre un iterable normal o asíncrono."""
+    if hasattr(lines, "__aiter__"):
+        async for item in lines:
+            yield item
+    else:
+        for item in lines:
+            yield item
+
+
+class AsyncGrblTransport:
+    """
+    Transporte asíncrono sobre un puerto serie ya abierto.
+    Un único lector (loop.add_reader sobre el descriptor del puerto, o un hilo
+    del executor si la plataforma no lo permite) reparte las respuestas:
+    'ok'/'error' resuelven los envíos pendientes en orden, los informes de
+    estado '<...>' se notifican a los oyentes y las alarmas cancelan lo pendiente.
+    Los envíos usan el protocolo de conteo de caracteres, así que streaming,
+    comandos de tiempo real y consultas de estado se multiplexan sin esperas activas.
+    """
+
+    def __init__(self, serial_port, loop, rx_buffer_size=RX_BUFFER_SIZE):
+        self.serial_port = serial_port
+        self.loop = loop
+        self.rx_buffer_size = rx_buffer_size
+        self.status = None
+        self.alarm = None
+        self.status_listeners = []
+        self._rx = bytearray()
+        self._pending = collections.deque()
+        self._pending_bytes = 0
+        self._space = asyncio.Event()
+        self._status_waiters = []
+        self._fd = None
+        self._reader_task = None
+        self._poll_task = None
+        self._cancelled = False
+
+    async def start(self):
+        try:
+            fd = self.serial_port.fileno()
+            self.loop.add_reader(fd, self._on_readable)
+            self._fd = fd
+        except (AttributeError, NotImplementedError, OSError):
+            # Windows (Proactor) no soporta add_reader: leemos en el executor
+            self._reader_task = self.loop.create_task(self._executor_reader())
+
+    async def stop(self):
+        self.stop_status_polling()
+        if self._fd is not None:
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._fail_pending("closed")
+
+    def _on_readable(self):
+        try:
+            data = self.serial_port.read(self.serial_port.in_waiting or 1)
+        except Exception as e:
+            logging.error(f"Error leyendo del puerto serie: {e}")
+            self.loop.remove_reader(self._fd)
+            self._fd = None
+            self._fail_pending("error:io")
+            return
+        self._feed(data)
+
+    async def _executor_reader(self):
+        while True:
+            # El puerto se abre con timeout, así que read() nunca bloquea indefinidamente
+            data = await self.loop.run_in_executor(
+                None, lambda: self.serial_port.read(self.serial_port.in_waiting or 1)
+            )
+            if data:
+                self._feed(data)
+
+    def _feed(self, data):
+        self._rx += data
+        while True:
+            pos = self._rx.find(b"\n")
+            if pos < 0:
+                break
+            line = bytes(self._rx[:pos]).strip().decode("utf-8", errors="replace")
+            del self._rx[: pos + 1]
+            if line:
+                self._dispatch(line)
+
+    def _dispatch(self, line):
+        if line.startswith("<"):
+            self.status = line
+            for listener in self.status_listeners:
+                listener(line)
+            waiters, self._status_waiters = self._status_waiters, []
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(line)
+        elif line == "ok" or line.startswith("error"):
+            if not self._pending:
+                # Respuesta a líneas en blanco enviadas al despertar a GRBL
+                logging.debug(f"Respuesta sin envío pendiente: {line}")
+                return
+            future, length = self._pending.popleft()
+            self._pending_bytes -= length
+            self._space.set()
+            if not future.done():
+                future.set_result(line)
+        elif line.startswith("ALARM"):
+            logging.warning(f"GRBL: {line}")
+            self.alarm = line
+            self._fail_pending(line)
+        else:
+            logging.info(f"GRBL: {line}")
+            if line.startswith("Grbl"):
+                # Mensaje de bienvenida tras un reset: el buffer de GRBL está vacío
+                self.alarm = None
+                self._fail_pending("reset")
+
+    def _fail_pending(self, response):
+        while self._pending:
+            future, _ = self._pending.popleft()
+            if not future.done():
+                future.set_result(response)
+        self._pending_bytes = 0
+        self._space.set()
+
+    @property
+    def pending_lines(self):
+        """Líneas enviadas que GRBL aún no ha confirmado (siguen en su buffer de recepción)."""
+        return len(self._pending)
+
+    async def _wait_space(self, length):
+        while self._pending_bytes + length > self.rx_buffer_size and self._pending:
+            self._space.clear()
+            await self._space.wait()
+
+    async def _queue_line(self, line):
+        return await self._queue_data(bytes(line).strip() + b"\n")
+
+    async def _queue_data(self, data):
+        """Encola una línea ya preparada, con su salto de línea."""
+        await self._wait_space(len(data))
+        future = self.loop.create_future()
+        self._pending.append((future, len(data)))
+        self._pending_bytes += len(data)
+        self.serial_port.write(data)
+        return future
+
+    async def send_line(self, line):
+        """Envía una línea y espera su respuesta ('ok', 'error:n', alarma...)."""
+        return await (await self._queue_line(line))
+
+    def send_realtime(self, command):
+        """Los comandos de tiempo real se escriben directamente, sin contar bytes."""
+        self.serial_port.write(command)
+
+    async def request_status(self):
+        waiter = self.loop.create_future()
+        self._status_waiters.append(waiter)
+        self.send_realtime(b"?")
+        return await waiter
+
+    def start_status_polling(self, interval=0.2):
+        if self._poll_task is None:
+            self._poll_task = self.loop.create_task(self._poll_status(interval))
+
+    def stop_status_polling(self):
+        if self._poll_task:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+    async def _poll_status(self, interval):
+        while True:
+            self.send_realtime(b"?")
+            await asyncio.sleep(interval)
+
+    def cancel_stream(self):
+        self._cancelled = True
+
+    async def stream(self, lines, on_ack=None):
+        """
+        Envía (número, línea) manteniendo lleno el buffer de GRBL. Las líneas
+        llegan ya normalizadas y con su salto (NormalizedGCode), y lines puede
+        ser un iterable asíncrono, para líneas que se van produciendo.
+        on_ack(número) se llama, en orden, al confirmar cada línea.
+        Devuelve (última línea confirmada, respuesta de error o None).
+        """
+        self._cancelled = False
+        state = {"last": None, "error": None}
+
+        def acknowledged(number, future):
+            response = future.result()
+            if state["error"]:
+                return
+            if response != "ok":
+                state["error"] = response
+                return
+            state["last"] = number
+            if on_ack:
+                on_ack(number)
+
+        in_flight = []
+        async for number, line in _iterate(lines):
+            if state["error"] or self._cancelled:
+                break
+            future = await self._queue_data(line)
+            future.add_done_callback(lambda f, n=number: acknowledged(n, f))
+            in_flight.append(future)
+            # Descartar las ya confirmadas para no acumular futuros
+            if len(in_flight) > 256:
+                in_flight = [f for f in in_flight if not f.done()]
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        # Los callbacks de los futuros se ejecutan en la siguiente iteración del loop
+        await asyncio.sleep(0)
+        if self._cancelled and not state["error"]:
+            state["error"] = "cancelled"
+        return state["last"], state["error"]
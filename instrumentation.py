@@ -0,0 +1,205 @@
+"""
+Instrumentación ligera del pipeline Gerber -> G-code.
+
+Las fases se marcan con el decorador `traced` o con el context manager `span`,
+y los contadores (primitivas, vértices, líneas...) se suman a la fase en curso
+con `count`. Mientras está desactivada, `span` devuelve un objeto vacío y
+`traced` solo comprueba un booleano, así que el coste es despreciable.
+
+    instrumentation.enable(memory=True)
+    ...
+    instrumentation.dump_chrome_trace("trace.json")  # chrome://tracing, Perfetto
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+_enabled = False
+_trace_memory = False
+_events = []
+_lock = threading.Lock()
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def enable(memory=False):
+    """Activa la instrumentación; con memory=True mide también el pico de memoria."""
+    global _enabled, _trace_memory
+    _trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def disable():
+    global _enabled, _trace_memory
+    _enabled = False
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _trace_memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Descarta los eventos registrados."""
+    global _origin
+    with _lock:
+        _events.clear()
+        _origin = time.perf_counter()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def count(self, **counters):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "counters", "start", "memory_start", "child_peak")
+
+    def __init__(self, name, counters):
+        self.name = name
+        self.counters = dict(counters)
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        if _trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # El pico de la fase exterior hasta ahora no se pierde al reiniciarlo
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        stack = _local.stack
+        stack.pop()
+        event = {
+            "name": self.name,
+            "start": self.start - _origin,
+            "duration": end - self.start,
+            "thread": threading.get_ident(),
+            "counters": self.counters,
+        }
+        if _trace_memory and tracemalloc.is_tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            event["peak_memory"] = max(0, peak - self.memory_start)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        with _lock:
+            _events.append(event)
+        return False
+
+    def count(self, **counters):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+def span(name, **counters):
+    """Context manager que mide una fase del pipeline."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, counters)
+
+
+def count(**counters):
+    """Suma contadores a la fase en curso del hilo actual."""
+    if not _enabled:
+        return
+    stack = getattr(_local, "stack", None)
+    if stack:
+        stack[-1].count(**counters)
+
+
+def traced(name):
+    """Decorador que mide cada llamada a la función como una fase `name`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def events():
+    with _lock:
+        return list(_events)
+
+
+def report():
+    """
+    Resumen por fase: llamadas, tiempo total y máximo, contadores acumulados y
+    pico de memoria, en el orden en que aparecieron las fases.
+    """
+    summary = {}
+    for event in events():
+        stage = summary.setdefault(
+            event["name"],
+            {"calls": 0, "total": 0.0, "max": 0.0, "counters": {}},
+        )
+        stage["calls"] += 1
+        stage["total"] += event["duration"]
+        stage["max"] = max(stage["max"], event["duration"])
+        for key, value in event["counters"].items():
+            stage["counters"][key] = stage["counters"].get(key, 0) + value
+        if "peak_memory" in event:
+            stage["peak_memory"] = max(
+                stage.get("peak_memory", 0), event["peak_memory"]
+            )
+    return summary
+
+
+def dump_json(filename):
+    with open(filename, "w") as f:
+        json.dump({"stages": report(), "events": events()}, f, indent=2)
+
+
+def dump_chrome_trace(filename):
+    """Escribe los eventos en el formato Trace Event de Chrome (chrome://tracing)."""
+    pid = os.getpid()
+    trace_events = []
+    for event in events():
+        args = dict(event["counters"])
+        if "peak_memory" in event:
+            args["peak_memory"] = event["peak_memory"]
+        trace_events.append(
+            {
+                "name": event["name"],
+                "ph": "X",
+                "ts": event["start"] * 1e6,
+                "dur": event["duration"] * 1e6,
+                "pid": pid,
+                "tid": event["thread"],
+                "args": args,
+            }
+        )
+    with open(filename, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
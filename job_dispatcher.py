@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import queue
+import threading
+import time
+import serial
+from app_config import load_config, typed_config
+from grbl_communicator import GrblCommunicator
+from gcode_document import GCodeDocument
+
+APP_NAME = "Laser4PCB"
+# Respuestas del transporte que indican que la máquina ya no responde
+TRANSPORT_ERRORS = ("error:io", "closed")
+
+
+def gerber_gcode_blocks(filename, config):
+    """
+    G-code de un fichero Gerber en bloques de bytes, generados a medida que se
+    consumen: enviado con stream_gcode_blocks, la máquina empieza a grabar
+    antes de que el programa esté completo.
+    """
+    from gcode_generator import gcode_blocks
+    from geometry import primitives_to_geometry
+    from gerber_parser import GerberParser
+    from tiling import generate_gcode_tiled
+
+    gerber = GerberParser(max_chord_error=config["GCode"]["max_chord_error"])
+    gerber.parse(filepath=str(filename))
+    primitives = gerber.get_primitives()
+    invert = config["GCode"]["invert_layer"]
+    tile_size = config["GCode"]["tile_size"]
+    if tile_size > 0:
+        yield from generate_gcode_tiled(primitives, config, APP_NAME, tile_size, invert)
+    else:
+        geometry = primitives_to_geometry(primitives, invert_polarity=invert)
+        yield from gcode_blocks(geometry, config, APP_NAME)
+
+
+class Job:
+    """
+    Trabajo de grabado: un fichero G-code, una lista de líneas o un iterable
+    de bloques de bytes que se envían según se generan.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, source, name=None):
+        self.id = next(self._ids)
+        self.source = source
+        self.name = name or (source if isinstance(source, str) else f"job-{self.id}")
+        self.status = "queued"
+        self.machine = None
+        self.lines_sent = 0
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+
+class Machine:
+    """Una grabadora del banco con sus estadísticas de uso."""
+
+    def __init__(self, name, port, communicator):
+        self.name = name
+        self.port = port
+        self.grbl = communicator
+        self.online = False
+        self.current_job = None
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.lines_sent = 0
+        self.busy_time = 0.0
+
+    def stats(self, elapsed):
+        return {
+            "port": self.port,
+            "online": self.online,
+            "current_job": self.current_job.name if self.current_job else None,
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "lines_sent": self.lines_sent,
+            "busy_time": round(self.busy_time, 3),
+            "utilization": round(self.busy_time / elapsed, 3) if elapsed > 0 else 0.0,
+            "lines_per_second": (
+                round(self.lines_sent / self.busy_time, 1) if self.busy_time > 0 else 0.0
+            ),
+        }
+
+
+class JobDispatcher:
+    """
+    Reparte una cola de trabajos G-code entre varias máquinas GRBL.
+    Todas las conexiones comparten un único event loop de asyncio; cada máquina
+    tiene un hilo trabajador que toma el siguiente trabajo cuando queda libre.
+    """
+
+    def __init__(self, ports, baudrate=115200):
+        self.ports = list(ports)
+        self.baudrate = baudrate
+        self.machines = []
+        self.jobs = []
+        self._queue = queue.Queue()
+        self._loop = None
+        self._loop_thread = None
+        self._workers = []
+        self._started = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever, name="dispatcher-loop", daemon=True
+        )
+        self._loop_thread.start()
+        self._started = time.perf_counter()
+        for i, port in enumerate(self.ports, 1):
+            machine = Machine(f"M{i}", port, GrblCommunicator(loop=self._loop))
+            machine.online = machine.grbl.connect(port, self.baudrate)
+            self.machines.append(machine)
+            if not machine.online:
+                logging.error(f"{machine.name}: no se pudo conectar a {port}")
+                continue
+            worker = threading.Thread(
+                target=self._worker, args=(machine,), name=machine.name, daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        return sum(m.online for m in self.machines)
+
+    def submit(self, source, name=None):
+        job = Job(source, name)
+        self.jobs.append(job)
+        self._queue.put(job)
+        return job
+
+    def wait(self):
+        """Espera a que se hayan procesado todos los trabajos encolados."""
+        self._queue.join()
+
+    def stop(self):
+        for _worker in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        for machine in self.machines:
+            machine.grbl.disconnect()
+            machine.online = False
+        if self._loop_thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop_thread = None
+
+    def _worker(self, machine):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._run_job(machine, job)
+                if not machine.online:
+                    self._requeue(job)
+            finally:
+                self._queue.task_done()
+            if not machine.online:
+                logging.error(f"{machine.name}: máquina fuera de servicio")
+                self._machine_lost()
+                return
+
+    def _requeue(self, job):
+        """Devuelve a la cola un trabajo interrumpido por un fallo de la máquina."""
+        if not isinstance(job.source, str) and not hasattr(job.source, "__len__"):
+            # Los bloques ya generados se han consumido: no se puede repetir
+            return
+        job.status = "queued"
+        job.machine = None
+        job.started = job.finished = None
+        job.lines_sent = 0
+        self._queue.put(job)
+        logging.info(f"{job.name} vuelve a la cola")
+
+    def _machine_lost(self):
+        """Sin ninguna máquina en servicio, los trabajos pendientes fallan."""
+        with self._lock:
+            if any(m.online for m in self.machines):
+                return
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                if job is not None:
+                    job.status = "failed"
+                self._queue.task_done()
+
+    def _run_job(self, machine, job):
+        machine.current_job = job
+        job.machine = machine.name
+        job.status = "running"
+        job.started = time.perf_counter()
+        logging.info(f"{machine.name}: iniciando {job.name}")
+        machine.grbl.stream_error = None
+        try:
+            if isinstance(job.source, str) or hasattr(job.source, "__len__"):
+                if isinstance(job.source, str):
+                    document = GCodeDocument.open(job.source)
+                else:
+                    document = GCodeDocument.from_lines(list(job.source))
+                with document:
+                    total = len(document)
+                    sent = machine.grbl.stream_gcode_document(document)
+                    # Sin las líneas vacías ni los comentarios, que no se envían
+                    lines_sent = document.normalized().lines_through(sent) if sent else 0
+            else:
+                # El total solo se conoce al acabar la generación
+                sent = machine.grbl.stream_gcode_blocks(job.source, source=job.name)
+                total = sent if machine.grbl.stream_error is None else None
+                lines_sent = sent
+        except serial.SerialException as e:
+            logging.error(f"{machine.name}: error de comunicación en {job.name}: {e}")
+            machine.online = False
+            total, sent, lines_sent = None, None, 0
+        except Exception as e:
+            logging.error(f"{machine.name}: error en {job.name}: {e}")
+            total, sent, lines_sent = None, None, 0
+        error = machine.grbl.stream_error
+        if (
+            error in TRANSPORT_ERRORS
+            or (error or "").startswith("ALARM")
+            or not machine.grbl.check_state_ready()
+        ):
+            # Desconectada o en alarma: no debe tomar más trabajos
+            machine.online = False
+        job.finished = time.perf_counter()
+        job.lines_sent = lines_sent or 0
+        job.status = "done" if sent is not None and sent == total else "failed"
+        machine.busy_time += job.duration
+        machine.lines_sent += job.lines_sent
+        if job.status == "done":
+            machine.jobs_completed += 1
+        else:
+            machine.jobs_failed += 1
+        machine.current_job = None
+        logging.info(f"{machine.name}: {job.name} {job.status} en {job.duration:.2f}s")
+
+    def report(self):
+        """Estadísticas por máquina: trabajos, líneas, utilización y líneas/s."""
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "elapsed": round(elapsed, 3),
+            "queued": self._queue.qsize(),
+            "machines": {m.name: m.stats(elapsed) for m in self.machines},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Envía trabajos G-code a un banco de grabadoras GRBL."
+    )
+    parser.add_argument("--port", action="append", required=True, help="puerto serie")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument(
+        "--gerber",
+        action="append",
+        default=[],
+        help="fichero Gerber que se genera y envía a la vez",
+    )
+    parser.add_argument(
+        "--config",
+        default=f"{APP_NAME}.ini",
+        help="fichero de configuración .ini para --gerber",
+    )
+    parser.add_argument("files", nargs="*", help="ficheros G-code")
+    args = parser.parse_args()
+    if not args.files and not args.gerber:
+        parser.error("no hay ningún trabajo")
+
+    logging.basicConfig(level=logging.INFO)
+    dispatcher = JobDispatcher(args.port, args.baudrate)
+    if not dispatcher.start():
+        raise SystemExit("No hay ninguna máquina conectada.")
+    for filename in args.files:
+        dispatcher.submit(filename)
+    if args.gerber:
+        config = typed_config(load_config(args.config))
+        for filename in args.gerber:
+            dispatcher.submit(gerber_gcode_blocks(filename, config), name=filename)
+    dispatcher.wait()
+    for name, stats in dispatcher.report()["machines"].items():
+        print(name, stats)
+    dispatcher.stop()
+
+
+if __name__ == "__main__":
+    main()
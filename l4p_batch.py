@@ -0,0 +1,179 @@
+"""
+Conversor por lotes Gerber -> G-code sin interfaz gráfica.
+
+No importa wx: solo el parser, las funciones de geometría y el generador, así
+que se puede usar en un servidor de compilación. Lee la configuración del mismo
+fichero .ini que la aplicación y puede convertir varios ficheros en paralelo.
+
+Ejemplo:
+    python l4p_batch.py --jobs 4 --output-dir out --report out/report.json *.gtl
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from app_config import load_config, typed_config
+from gcode_document import GCodeDocument
+from gcode_estimator import estimate_job, machine_settings
+from gcode_generator import generate_gcode
+import instrumentation
+from geometry import primitives_to_geometry
+from gerber_parser import GerberParser
+from tiling import generate_gcode_tiled
+
+APP_NAME = "Laser4PCB"
+
+
+def convert_file(filename, config, output_dir, invert=False, tile_jobs=1):
+    """
+    Convierte un fichero Gerber y escribe el G-code en output_dir.
+    Devuelve un diccionario con los tiempos de cada fase, apto para JSON.
+    Con GCode.tile_size > 0 la placa se procesa por teselas y el G-code se
+    escribe a medida que se genera (en ese caso "gcode" incluye la escritura).
+    """
+    source = Path(filename)
+    target = Path(output_dir) / f"{source.stem}.gcode"
+    report = {"input": str(source), "output": str(target)}
+    timings = {}
+    start = time.perf_counter()
+    try:
+        t = time.perf_counter()
+        gerber = GerberParser(max_chord_error=config["GCode"]["max_chord_error"])
+        gerber.parse(filepath=str(source))
+        primitives = gerber.get_primitives()
+        timings["parse"] = time.perf_counter() - t
+
+        tile_size = config["GCode"]["tile_size"]
+        if tile_size > 0:
+            t = time.perf_counter()
+            line_count = 0
+            with open(target, "wb") as f:
+                for block in generate_gcode_tiled(
+                    primitives, config, APP_NAME, tile_size, invert, tile_jobs
+                ):
+                    f.write(block)
+                    line_count += block.count(b"\n")
+            timings["gcode"] = time.perf_counter() - t
+
+            # Las teselas no llevan estimación: se hace sobre el fichero escrito
+            t = time.perf_counter()
+            with GCodeDocument.open(target) as document:
+                estimate = estimate_job(document, machine_settings(config))
+            timings["estimate"] = time.perf_counter() - t
+        else:
+            t = time.perf_counter()
+            geometry = primitives_to_geometry(primitives, invert_polarity=invert)
+            timings["geometry"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            document = generate_gcode(geometry, config, APP_NAME)
+            timings["gcode"] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            target.write_bytes(document.buffer)
+            timings["write"] = time.perf_counter() - t
+            line_count = len(document)
+            # Ya calculada al generar (solo falta si la geometría está vacía)
+            estimate = document.estimate or estimate_job(document, machine_settings(config))
+
+        report.update(
+            {
+                "status": "ok",
+                "primitives": len(primitives),
+                "lines": line_count,
+                "bytes": target.stat().st_size,
+                "estimated_time": round(estimate["total_time"], 1),
+            }
+        )
+    except Exception as e:
+        logging.error(f"Error convirtiendo {source}: {e}")
+        report.update({"status": "error", "error": str(e)})
+    timings["total"] = time.perf_counter() - start
+    report["timings"] = {k: round(v, 4) for k, v in timings.items()}
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convierte ficheros Gerber a G-code sin interfaz gráfica."
+    )
+    parser.add_argument("inputs", nargs="+", help="ficheros Gerber")
+    parser.add_argument(
+        "--config", default=f"{APP_NAME}.ini", help="fichero de configuración .ini"
+    )
+    parser.add_argument("--output-dir", default=".", help="carpeta de salida")
+    parser.add_argument(
+        "--jobs", type=int, default=1, help="número de procesos en paralelo"
+    )
+    parser.add_argument("--report", help="fichero JSON con los tiempos")
+    parser.add_argument(
+        "--invert", action="store_true", help="invertir la polaridad de la capa"
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=float,
+        help="procesar por teselas de este tamaño en mm (0 = sin teselas)",
+    )
+    parser.add_argument(
+        "--tile-jobs",
+        type=int,
+        default=1,
+        help="procesos para las teselas de cada fichero",
+    )
+    parser.add_argument(
+        "--trace",
+        help="fichero de traza de Chrome con las fases de cada conversión "
+        "(solo con --jobs 1)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    config = typed_config(load_config(args.config))
+    if args.tile_size is not None:
+        config["GCode"]["tile_size"] = args.tile_size
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.trace:
+        instrumentation.enable(memory=True)
+    start = time.perf_counter()
+    if args.jobs > 1 and len(args.inputs) > 1:
+        # Los ficheros ya se reparten entre procesos: cada uno genera en serie
+        # en lugar de arrancar a su vez tantos procesos como núcleos
+        config["GCode"]["workers"] = 1
+    tasks = [
+        (f, config, args.output_dir, args.invert, args.tile_jobs) for f in args.inputs
+    ]
+    if args.jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(convert_file, *zip(*tasks)))
+    else:
+        results = [convert_file(*task) for task in tasks]
+    wall_time = time.perf_counter() - start
+
+    for result in results:
+        if result["status"] == "ok":
+            logging.info(
+                f"{result['input']} -> {result['output']}: {result['lines']} líneas "
+                f"en {result['timings']['total']:.2f}s"
+            )
+    report = {
+        "jobs": args.jobs,
+        "wall_time": round(wall_time, 4),
+        "files": results,
+    }
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.trace:
+        instrumentation.dump_chrome_trace(args.trace)
+    failed = sum(r["status"] != "ok" for r in results)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import logging
+import wx
+import instrumentation
+from utils import build_wildcard, get_filename_from_fileDialog
+
+global _
+
+
+class ProfileDialog(wx.Dialog):
+    """Muestra los tiempos y contadores de cada fase del pipeline."""
+
+    def __init__(self, parent):
+        super().__init__(
+            parent,
+            wx.ID_ANY,
+            _("Profiling"),
+            size=(800, 400),
+            style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER,
+        )
+        self.InitUI()
+        self.refresh()
+        self.CentreOnParent()
+
+    def InitUI(self):
+        main_sizer = wx.BoxSizer(wx.VERTICAL)
+
+        self.enable_chk = wx.CheckBox(
+            self, label=_("Record timings, counters and peak memory")
+        )
+        self.enable_chk.SetValue(instrumentation.is_enabled())
+        self.enable_chk.Bind(wx.EVT_CHECKBOX, self.on_enable)
+        main_sizer.Add(self.enable_chk, 0, wx.ALL, 10)
+
+        self.list = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        for i, (label, width) in enumerate(
+            (
+                (_("Stage"), 170),
+                (_("Calls"), 50),
+                (_("Total (ms)"), 80),
+                (_("Max (ms)"), 80),
+                (_("Peak memory (KB)"), 110),
+                (_("Counters"), 260),
+            )
+        ):
+            self.list.InsertColumn(i, label, width=width)
+        main_sizer.Add(self.list, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        for label, handler in (
+            (_("Refresh"), lambda event: self.refresh()),
+            (_("Reset"), self.on_reset),
+            (_("Save JSON..."), self.on_save_json),
+            (_("Save Chrome trace..."), self.on_save_trace),
+        ):
+            button = wx.Button(self, label=label)
+            button.Bind(wx.EVT_BUTTON, handler)
+            button_sizer.Add(button, 0, wx.ALL, 5)
+        button_sizer.AddStretchSpacer()
+        button_sizer.Add(wx.Button(self, wx.ID_CLOSE), 0, wx.ALL, 5)
+        self.Bind(
+            wx.EVT_BUTTON, lambda event: self.EndModal(wx.ID_CLOSE), id=wx.ID_CLOSE
+        )
+        main_sizer.Add(button_sizer, 0, wx.EXPAND | wx.ALL, 5)
+
+        self.SetSizer(main_sizer)
+
+    def refresh(self):
+        self.list.DeleteAllItems()
+        for row, (name, stage) in enumerate(instrumentation.report().items()):
+            counters = ", ".join(f"{k}={v}" for k, v in stage["counters"].items())
+            peak = stage.get("peak_memory")
+            values = (
+                name,
+                str(stage["calls"]),
+                f"{stage['total'] * 1000:.1f}",
+                f"{stage['max'] * 1000:.1f}",
+                f"{peak / 1024:.0f}" if peak is not None else "",
+                counters,
+            )
+            self.list.InsertItem(row, values[0])
+            for col, value in enumerate(values[1:], 1):
+                self.list.SetItem(row, col, value)
+
+    def on_enable(self, event):
+        if self.enable_chk.GetValue():
+            instrumentation.enable(memory=True)
+        else:
+            instrumentation.disable()
+
+    def on_reset(self, event):
+        instrumentation.reset()
+        self.refresh()
+
+    def on_save_json(self, event):
+        self._save(
+            _("Save profile"), _("JSON files"), "*.json", instrumentation.dump_json
+        )
+
+    def on_save_trace(self, event):
+        self._save(
+            _("Save Chrome trace"),
+            _("Chrome trace files"),
+            "*.json",
+            instrumentation.dump_chrome_trace,
+        )
+
+    def _save(self, title, description, pattern, writer):
+        with wx.FileDialog(
+            self,
+            title,
+            wildcard=build_wildcard(((description, pattern),)),
+            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT,
+        ) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            filename = get_filename_from_fileDialog(fileDialog)
+            try:
+                writer(filename)
+            except IOError as e:
+                logging.error(f"Error saving profile {filename}: {e}")
+                wx.MessageBox(str(e), title, wx.OK | wx.ICON_ERROR, self)
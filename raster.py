@@ -0,0 +1,126 @@
+"""
+Grabado en modo raster.
+
+La geometría se rasteriza en un bitmap de NumPy con la resolución del punto
+láser (fill_spacing) y cada fila se convierte en tramos encendidos/apagados
+que se emiten como `G1 X... S...` en modo láser de GRBL (M4, $32=1), barriendo
+en zigzag y saltando las filas y márgenes vacíos.
+
+La rejilla de píxeles está anclada al origen de la máquina, de modo que dos
+trozos de la misma placa (por ejemplo, dos teselas) caen en los mismos píxeles.
+"""
+
+import math
+
+import numpy as np
+from shapely.geometry import MultiPolygon, Polygon
+
+
+def _rings(geometry):
+    if isinstance(geometry, Polygon):
+        polygons = [geometry]
+    elif isinstance(geometry, MultiPolygon):
+        polygons = list(geometry.geoms)
+    else:
+        polygons = [g for g in geometry if isinstance(g, Polygon)]
+    for polygon in polygons:
+        if polygon.is_empty:
+            continue
+        yield polygon.exterior.coords, False
+        for interior in polygon.interiors:
+            yield interior.coords, True
+
+
+def rasterize(geometry, resolution):
+    """
+    Rasteriza un Polygon, MultiPolygon o lista de Polygon con la regla de
+    devanado no nulo, así que los polígonos que se solapan se unen en lugar de
+    anularse. Un píxel está encendido si su centro cae dentro de la geometría.
+    Devuelve (bitmap, col0, row0): bitmap[r, c] es el píxel de centro
+    ((col0 + c + 0.5) * resolution, (row0 + r + 0.5) * resolution).
+    """
+    edges, winding = [], []
+    for coords, hole in _rings(geometry):
+        ring = np.asarray(coords, dtype=float)[:, :2]
+        x, y = ring[:, 0], ring[:, 1]
+        edges.append(np.hstack((ring[:-1], ring[1:])))
+        # Sentido de cada arista en vertical, con los exteriores orientados al
+        # revés que los agujeros: dentro de un agujero el devanado vuelve a 0
+        clockwise = np.dot(x[:-1], y[1:]) < np.dot(x[1:], y[:-1])
+        winding.append(np.where(y[1:] > y[:-1], 1, -1) * (1 if clockwise == hole else -1))
+    if not edges:
+        return np.zeros((0, 0), dtype=bool), 0, 0
+    x1, y1, x2, y2 = np.vstack(edges).T / resolution
+    winding = np.concatenate(winding).astype(np.int16)
+
+    col0 = math.floor(min(x1.min(), x2.min()))
+    row0 = math.floor(min(y1.min(), y2.min()))
+    width = math.ceil(max(x1.max(), x2.max())) - col0 + 1
+    height = math.ceil(max(y1.max(), y2.max())) - row0 + 1
+
+    # Filas cuyo centro cruza cada arista: ylo <= y < yhi (así cada vértice cuenta una vez)
+    ylo, yhi = np.minimum(y1, y2), np.maximum(y1, y2)
+    first = np.ceil(ylo - 0.5).astype(np.int64)
+    last = np.ceil(yhi - 0.5).astype(np.int64)
+    counts = np.maximum(last - first, 0)
+    edge = np.repeat(np.arange(len(x1)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = first[edge] + offsets
+    yc = rows + 0.5
+    xc = x1[edge] + (yc - y1[edge]) * (x2[edge] - x1[edge]) / (y2[edge] - y1[edge])
+
+    # Cada cruce suma su sentido a partir del primer píxel cuyo centro queda a su derecha
+    cols = np.clip(np.ceil(xc - 0.5).astype(np.int64) - col0, 0, width)
+    crossings = np.zeros((height, width + 1), dtype=np.int16)
+    np.add.at(crossings, (rows - row0, cols), winding[edge])
+    bitmap = np.cumsum(crossings, axis=1, dtype=np.int16)[:, :width] != 0
+    return bitmap, col0, row0
+
+
+def row_runs(bitmap):
+    """Tramos encendidos por fila: arrays (fila, columna inicial, columna final exclusiva)."""
+    padded = np.zeros((bitmap.shape[0], bitmap.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = bitmap
+    changes = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(changes == 1)
+    ends = np.nonzero(changes == -1)[1]
+    return rows, starts, ends
+
+
+def raster_gcode(geometry, settings):
+    """G-code raster de la geometría, con los parámetros de toolpath_settings."""
+    resolution = settings["fill_spacing"]
+    feed_rate = settings["feed_rate"]
+    power = f"{settings['laser_power']:.0f}"
+    bitmap, col0, row0 = rasterize(geometry, resolution)
+    rows, starts, ends = row_runs(bitmap)
+    if len(rows) == 0:
+        return []
+
+    gcode = ["; Raster ...", "M4 S0"]
+    boundaries = np.flatnonzero(np.diff(rows)) + 1
+    left_to_right = True
+    feed = f" F{feed_rate}"
+    for row_slice in np.split(np.arange(len(rows)), boundaries):
+        row = rows[row_slice[0]]
+        y = (row0 + row + 0.5) * resolution
+        x_start = (col0 + starts[row_slice]) * resolution
+        x_end = (col0 + ends[row_slice]) * resolution
+        if left_to_right:
+            pairs = zip(x_start, x_end)
+        else:
+            pairs = zip(x_end[::-1], x_start[::-1])
+        first = True
+        for a, b in pairs:
+            if first:
+                gcode.append(f"G0 X{a:.3f} Y{y:.3f}")
+                first = False
+            else:
+                gcode.append(f"G1 X{a:.3f} S0{feed}")
+                feed = ""
+            gcode.append(f"G1 X{b:.3f} S{power}{feed}")
+            feed = ""
+        left_to_right = not left_to_right
+    gcode.append(settings["laser_off_cmd"])
+    gcode.append("")
+    return gcode
@@ -0,0 +1,43 @@
+"""
+Ángulo de las líneas de relleno.
+
+Con líneas siempre horizontales una pista vertical se rellena con miles de
+tramos cortos, y cada uno obliga a encender y apagar el láser. Para cada
+polígono se elige, entre un número limitado de ángulos comunes a todo el
+trabajo, el que da menos tramos.
+"""
+
+import math
+
+import numpy as np
+
+
+def candidate_angles(count):
+    """count ángulos repartidos en [0, 180) grados; el primero es siempre 0."""
+    count = max(1, count)
+    return [180.0 * i / count for i in range(count)]
+
+
+def scan_spans(polygon, spacing, angle=0.0):
+    """
+    Número estimado de tramos al rellenar con líneas a angle grados: cada
+    línea corta el contorno dos veces por tramo.
+    """
+    a = math.radians(angle)
+    crossings = 0.0
+    for ring in (polygon.exterior, *polygon.interiors):
+        coords = np.asarray(ring.coords)
+        # Coordenada perpendicular a las líneas de relleno
+        v = coords[:, 1] * math.cos(a) - coords[:, 0] * math.sin(a)
+        crossings += np.abs(np.diff(v)).sum()
+    return crossings / spacing / 2
+
+
+def best_scan_angle(polygon, spacing, angles):
+    """
+    Devuelve (ángulo, tramos, tramos en horizontal) con el ángulo de angles que
+    da menos tramos. A igualdad se queda con el primero (0 grados).
+    """
+    spans = [scan_spans(polygon, spacing, angle) for angle in angles]
+    best = int(np.argmin(spans))
+    return angles[best], spans[best], spans[0]
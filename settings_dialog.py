@@ -29,6 +29,10 @@ class SettingsDialog(wx.Dialog):
         self.add_gcode_controls(gcode_box)
         main_sizer.Add(gcode_box, 0, wx.EXPAND | wx.ALL, 10)
 
+        machine_box = wx.StaticBoxSizer(wx.VERTICAL, self, _("Machine"))
+        self.add_machine_controls(machine_box)
+        main_sizer.Add(machine_box, 0, wx.EXPAND | wx.ALL, 10)
+
         button_sizer = wx.BoxSizer(wx.HORIZONTAL)
 
         button_sizer.Add(
@@ -103,7 +107,7 @@ class SettingsDialog(wx.Dialog):
         sizer_parent.Add(grid_sizer, 1, wx.EXPAND | wx.ALL, 5)
 
     def add_gcode_controls(self, sizer_parent):
-        gcode_grid_sizer = wx.FlexGridSizer(rows=4, cols=2, vgap=8, hgap=15)
+        gcode_grid_sizer = wx.FlexGridSizer(rows=9, cols=2, vgap=8, hgap=15)
         gcode_grid_sizer.AddGrowableCol(1)
 
         self.trace_outline_chk = wx.CheckBox(self, label=_("Trace Outline"))
@@ -119,6 +123,41 @@ class SettingsDialog(wx.Dialog):
         gcode_grid_sizer.Add(self.fill_inner_chk, 0, wx.ALIGN_CENTER_VERTICAL)
         gcode_grid_sizer.AddSpacer(0)
 
+        self.compact_output_chk = wx.CheckBox(self, label=_("Compact output"))
+        self.compact_output_chk.SetToolTip(
+            _("Omit repeated modal words and trailing zeros to send fewer bytes")
+        )
+        self.compact_output_chk.SetValue(
+            self.config.getboolean("GCode", "compact_output")
+        )
+        gcode_grid_sizer.Add(self.compact_output_chk, 0, wx.ALIGN_CENTER_VERTICAL)
+        gcode_grid_sizer.AddSpacer(0)
+
+        gcode_grid_sizer.Add(
+            wx.StaticText(self, label=_("Fill mode:")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        # Claves de GCode.fill_mode y su texto en el diálogo
+        self.fill_modes = {
+            "vector": _("Vector (scanlines)"),
+            "raster": _("Raster (laser mode M4)"),
+            "contour": _("Contour (concentric rings)"),
+            "auto": _("Automatic (fastest per polygon)"),
+        }
+        self.fill_mode_choice = wx.Choice(
+            self, choices=list(self.fill_modes.values())
+        )
+        fill_mode = self.config.get("GCode", "fill_mode")
+        keys = list(self.fill_modes)
+        self.fill_mode_choice.SetSelection(
+            keys.index(fill_mode) if fill_mode in keys else 0
+        )
+        self.fill_mode_choice.SetToolTip(
+            _("Raster mode needs GRBL laser mode enabled ($32=1)")
+        )
+        gcode_grid_sizer.Add(self.fill_mode_choice, 1, wx.EXPAND)
+
         gcode_grid_sizer.Add(
             wx.StaticText(self, label=_("Displacement Distance:")),
             0,
@@ -139,8 +178,90 @@ class SettingsDialog(wx.Dialog):
         )
         gcode_grid_sizer.Add(self.fill_spacing_ctrl, 1, wx.EXPAND)
 
+        gcode_grid_sizer.Add(
+            wx.StaticText(self, label=_("Arc tolerance (0 = no arcs):")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        self.arc_tolerance_ctrl = wx.TextCtrl(
+            self, value=str(self.config.getfloat("GCode", "arc_tolerance"))
+        )
+        self.arc_tolerance_ctrl.SetToolTip(
+            _("Maximum deviation in mm when replacing polylines with G2/G3 arcs")
+        )
+        gcode_grid_sizer.Add(self.arc_tolerance_ctrl, 1, wx.EXPAND)
+
+        gcode_grid_sizer.Add(
+            wx.StaticText(self, label=_("Max chord error (mm):")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        self.max_chord_error_ctrl = wx.TextCtrl(
+            self, value=str(self.config.getfloat("GCode", "max_chord_error"))
+        )
+        self.max_chord_error_ctrl.SetToolTip(
+            _(
+                "Maximum distance between a Gerber arc or circle and its polygon. "
+                "Keep it well below the laser spot size."
+            )
+        )
+        gcode_grid_sizer.Add(self.max_chord_error_ctrl, 1, wx.EXPAND)
+
+        gcode_grid_sizer.Add(
+            wx.StaticText(self, label=_("Tile size (mm, 0 = no tiles):")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        self.tile_size_ctrl = wx.TextCtrl(
+            self, value=str(self.config.getfloat("GCode", "tile_size"))
+        )
+        self.tile_size_ctrl.SetToolTip(
+            _("Process large panels in square tiles to limit memory use")
+        )
+        gcode_grid_sizer.Add(self.tile_size_ctrl, 1, wx.EXPAND)
+
         sizer_parent.Add(gcode_grid_sizer, 1, wx.EXPAND | wx.ALL, 5)
 
+    def add_machine_controls(self, sizer_parent):
+        # Solo se usan para estimar la duración del trabajo
+        grid_sizer = wx.FlexGridSizer(rows=3, cols=2, vgap=8, hgap=15)
+        grid_sizer.AddGrowableCol(1)
+
+        grid_sizer.Add(
+            wx.StaticText(self, label=_("Acceleration (mm/s²):")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        self.acceleration_ctrl = wx.TextCtrl(
+            self, value=str(self.config.getfloat("Machine", "acceleration"))
+        )
+        self.acceleration_ctrl.SetToolTip(_("GRBL setting $120"))
+        grid_sizer.Add(self.acceleration_ctrl, 1, wx.EXPAND)
+
+        grid_sizer.Add(
+            wx.StaticText(self, label=_("Junction deviation (mm):")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        self.junction_deviation_ctrl = wx.TextCtrl(
+            self, value=str(self.config.getfloat("Machine", "junction_deviation"))
+        )
+        self.junction_deviation_ctrl.SetToolTip(_("GRBL setting $11"))
+        grid_sizer.Add(self.junction_deviation_ctrl, 1, wx.EXPAND)
+
+        grid_sizer.Add(
+            wx.StaticText(self, label=_("Maximum rate (mm/min):")),
+            0,
+            wx.ALIGN_CENTER_VERTICAL,
+        )
+        self.max_rate_ctrl = wx.TextCtrl(
+            self, value=str(self.config.getfloat("Machine", "max_rate"))
+        )
+        self.max_rate_ctrl.SetToolTip(_("GRBL setting $110"))
+        grid_sizer.Add(self.max_rate_ctrl, 1, wx.EXPAND)
+
+        sizer_parent.Add(grid_sizer, 1, wx.EXPAND | wx.ALL, 5)
+
     def on_save(self, event):
         if event.Id == wx.ID_OK:
             try:
@@ -149,6 +270,18 @@ class SettingsDialog(wx.Dialog):
                 fast_move_rate = int(self.fast_move_rate_ctrl.GetValue())
                 offset_distance = float(self.offset_distance_ctrl.GetValue())
                 fill_spacing = float(self.fill_spacing_ctrl.GetValue())
+                arc_tolerance = float(self.arc_tolerance_ctrl.GetValue())
+                max_chord_error = float(self.max_chord_error_ctrl.GetValue())
+                if max_chord_error <= 0:
+                    raise ValueError(_("the chord error must be greater than 0"))
+                tile_size = float(self.tile_size_ctrl.GetValue())
+                if tile_size < 0:
+                    raise ValueError(_("the tile size cannot be negative"))
+                acceleration = float(self.acceleration_ctrl.GetValue())
+                junction_deviation = float(self.junction_deviation_ctrl.GetValue())
+                max_rate = float(self.max_rate_ctrl.GetValue())
+                if acceleration <= 0 or junction_deviation < 0 or max_rate <= 0:
+                    raise ValueError(_("invalid machine parameters"))
 
                 self.config.set("Engraver", "feed_rate", str(feed_rate))
                 self.config.set("Engraver", "fast_move_rate", str(fast_move_rate))
@@ -168,8 +301,25 @@ class SettingsDialog(wx.Dialog):
                 self.config.set(
                     "GCode", "fill_inner", str(self.fill_inner_chk.GetValue())
                 )
+                self.config.set(
+                    "GCode", "compact_output", str(self.compact_output_chk.GetValue())
+                )
                 self.config.set("GCode", "offset_distance", str(offset_distance))
                 self.config.set("GCode", "fill_spacing", str(fill_spacing))
+                self.config.set("GCode", "arc_tolerance", str(arc_tolerance))
+                self.config.set("GCode", "max_chord_error", str(max_chord_error))
+                self.config.set("GCode", "tile_size", str(tile_size))
+                self.config.set(
+                    "GCode",
+                    "fill_mode",
+                    list(self.fill_modes)[self.fill_mode_choice.GetSelection()],
+                )
+
+                self.config.set("Machine", "acceleration", str(acceleration))
+                self.config.set(
+                    "Machine", "junction_deviation", str(junction_deviation)
+                )
+                self.config.set("Machine", "max_rate", str(max_rate))
 
                 # Guardar los cambios
                 # Emitir un evento personalizado para notificar a la ventana principal
@@ -0,0 +1,203 @@
+"""
+Generación de G-code por teselas para paneles grandes.
+
+En lugar de unir todas las primitivas en una sola geometría, la placa se divide
+en teselas cuadradas. Para cada tesela se unen solo las primitivas que la tocan
+(más un margen de solape para que el offset sea exacto en el interior), se
+aplica el offset y se recorta al núcleo de la tesela:
+
+  - los contornos que se trazan son solo los tramos de contorno real que caen
+    dentro del núcleo, así que los bordes de tesela no se graban;
+  - el relleno (vectorial o raster) usa una rejilla de líneas común a toda la
+    placa, de modo que las líneas de teselas vecinas se continúan sin huecos
+    ni solapes.
+
+Las teselas se pueden procesar en varios procesos y el resultado se entrega
+tesela a tesela, así que la memoria depende del tamaño de tesela y no del de
+la placa.
+"""
+
+import logging
+import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import shapely
+from shapely.affinity import translate
+from shapely.geometry import LineString, MultiLineString, Polygon, box
+
+import instrumentation
+from gcode_encoder import GCodeWriter, encode_lines
+from gcode_generator import (
+    GCODE_FOOTER,
+    compact_block,
+    fill_polygon,
+    gcode_header,
+    toolpath_settings,
+    trace_path,
+)
+from geometry import primitive_shape, universe_box
+from raster import raster_gcode
+
+DEFAULT_TILE_SIZE = 50.0
+# Margen de solape (mm) que se añade al offset al unir cada tesela
+TILE_MARGIN = 1.0
+# Desplazamiento de la rejilla de teselas para que sus bordes no coincidan con
+# las coordenadas redondas del diseño (un contorno sobre un borde se grabaría dos veces)
+_GRID_SHIFT = 0.0123457
+
+
+def tile_boxes(bounds, tile_size):
+    """Núcleos de las teselas que cubren bounds, recorridos en zigzag."""
+    minx, miny, maxx, maxy = bounds
+    x0, y0 = minx - _GRID_SHIFT, miny - _GRID_SHIFT
+    nx = max(1, math.ceil((maxx - x0) / tile_size))
+    ny = max(1, math.ceil((maxy - y0) / tile_size))
+    for j in range(ny):
+        columns = range(nx) if j % 2 == 0 else range(nx - 1, -1, -1)
+        for i in columns:
+            yield (
+                x0 + i * tile_size,
+                y0 + j * tile_size,
+                x0 + (i + 1) * tile_size,
+                y0 + (j + 1) * tile_size,
+            )
+
+
+def _parts(geometry, kind):
+    """Partes simples del tipo kind (Polygon o LineString) de una geometría."""
+    if geometry.is_empty:
+        return []
+    if isinstance(geometry, kind):
+        return [geometry]
+    return [g for g in getattr(geometry, "geoms", []) if isinstance(g, kind)]
+
+
+@instrumentation.traced("tile")
+def tile_toolpaths(shapes, core, overlap, settings, origin, universe=None):
+    """
+    G-code de una tesela, en bytes. shapes son las formas de las primitivas que
+    tocan la tesela ampliada con overlap; con universe (bounds) se invierte la
+    polaridad. Es una función pura para poder ejecutarla en otro proceso.
+    """
+    core_box = box(*core)
+    work_box = box(
+        core[0] - overlap, core[1] - overlap, core[2] + overlap, core[3] + overlap
+    )
+    geometry = shapely.unary_union(shapes) if shapes else Polygon()
+    if universe is not None:
+        geometry = box(*universe).intersection(work_box).difference(geometry)
+    else:
+        geometry = geometry.intersection(work_box)
+    offset_distance = settings["offset_distance"]
+    if abs(offset_distance) > 1e-6 and not geometry.is_empty:
+        geometry = geometry.buffer(offset_distance)
+
+    xoff, yoff = -origin[0], -origin[1]
+    geometry = translate(geometry, xoff, yoff)
+    core_box = translate(core_box, xoff, yoff)
+
+    gcode = GCodeWriter()
+    if geometry.is_empty:
+        return gcode.getvalue()
+    if settings["trace_outline"]:
+        outline = geometry.boundary.intersection(core_box)
+        lines = _parts(outline, LineString)
+        if len(lines) > 1:
+            lines = _parts(shapely.line_merge(MultiLineString(lines)), LineString)
+        for line in lines:
+            trace_path(gcode, list(line.coords), settings)
+    if settings["fill_inner"]:
+        polygons = _parts(geometry.intersection(core_box), Polygon)
+        if settings["fill_mode"] == "raster":
+            # La rejilla de píxeles está anclada al origen: las teselas encajan
+            gcode.extend(raster_gcode(polygons, settings))
+        else:
+            # Los anillos concéntricos seguirían los bordes de la tesela, así que
+            # los modos contour y auto usan aquí las líneas horizontales
+            for polygon in polygons:
+                fill_polygon(gcode, polygon, settings, scan_origin=0.0)
+    instrumentation.count(shapes=len(shapes), lines=len(gcode))
+    return gcode.getvalue()
+
+
+def _run_tiles(tasks, jobs):
+    if jobs <= 1:
+        for task in tasks:
+            yield tile_toolpaths(*task)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Como mucho 2 teselas por proceso en vuelo, para acotar la memoria
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(tile_toolpaths, *task))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_gcode_tiled(
+    primitives,
+    config,
+    app_name="",
+    tile_size=DEFAULT_TILE_SIZE,
+    invert_polarity=False,
+    jobs=1,
+):
+    """
+    Equivalente por teselas de primitives_to_geometry + generate_gcode.
+    Es un generador de bloques de bytes con líneas completas: cada tesela se
+    entrega en cuanto está lista, lista para escribirse o enviarse.
+    """
+    settings = toolpath_settings(config)
+    compact = settings["compact_output"]
+    stats = {"bytes_before": 0, "bytes_after": 0}
+
+    def emit(data):
+        # Cada bloque se compacta por separado: el estado modal no se arrastra
+        if compact and data:
+            data, block_stats = compact_block(data)
+            stats["bytes_before"] += block_stats["bytes_before"]
+            stats["bytes_after"] += block_stats["bytes_after"]
+        return data
+
+    shapes = [primitive_shape(p) for p in primitives]
+    yield emit(encode_lines(gcode_header(settings, app_name)))
+    if not shapes:
+        yield encode_lines(["; No se encontró geometría para generar."])
+        return
+
+    bounds = tuple(shapely.total_bounds(shapes))
+    universe = universe_box(bounds).bounds if invert_polarity else None
+    area = universe or bounds
+    overlap = abs(settings["offset_distance"]) + TILE_MARGIN
+    tree = shapely.STRtree(shapes)
+
+    def tasks():
+        for core in tile_boxes(area, tile_size):
+            work_box = box(
+                core[0] - overlap,
+                core[1] - overlap,
+                core[2] + overlap,
+                core[3] + overlap,
+            )
+            indices = sorted(tree.query(work_box))
+            if not indices and universe is None:
+                continue
+            selected = [shapes[i] for i in indices]
+            yield (selected, core, overlap, settings, area[:2], universe)
+
+    tiles = 0
+    for data in _run_tiles(tasks(), jobs):
+        tiles += 1
+        if data:
+            yield emit(data)
+    yield emit(encode_lines(GCODE_FOOTER))
+    logging.info(f"G-code generado en {tiles} teselas de {tile_size} mm")
+    if compact and stats["bytes_before"]:
+        saved = stats["bytes_before"] - stats["bytes_after"]
+        logging.info(
+            f"G-code compactado: {stats['bytes_before']} -> {stats['bytes_after']} bytes "
+            f"({saved * 100 / stats['bytes_before']:.1f}% menos)"
+        )
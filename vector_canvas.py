@@ -1,9 +1,14 @@
 import wx
-
-DEFAULT_GRAPHIC_INFO = {"bounds": (0, 0, 0, 0), "polygons": []}
+import instrumentation
+from geometry import DEFAULT_GRAPHIC_INFO
 
 global _
 
+# Colores de los tramos ya ejecutados y radio (px) de la marca del cabezal
+DONE_BURN_COLOR = (220, 40, 40, 255)
+DONE_TRAVEL_COLOR = (150, 150, 150, 200)
+HEAD_RADIUS = 6
+
 
 class VectorCanvas(wx.Panel):
     def __init__(self, parent, graphic_info=None, default_text=None, **kwargs):
@@ -17,6 +22,14 @@ class VectorCanvas(wx.Panel):
         self.dragging = False
         self.last_mouse_pos = None
         self.has_valid_content = False
+        # Capa de avance del trabajo: tramos (toolpath_moves), cuántos se han
+        # ejecutado y posición del cabezal. Mientras está activa la escena se
+        # guarda en un bitmap y solo se redibuja lo que cambia
+        self.progress_moves = None
+        self.done_moves = 0
+        self.head_position = None
+        self._scene = None
+        self._scene_view = None
         self.set_graphic_info(graphic_info)
 
         self.Bind(wx.EVT_PAINT, self.on_paint)
@@ -37,9 +50,94 @@ class VectorCanvas(wx.Panel):
             else DEFAULT_GRAPHIC_INFO
         )
         self.has_valid_content = len(self.graphic_info["polygons"]) > 0
+        self.clear_progress()
         self.zoom_to_fit()
         self.Refresh()
 
+    def set_progress_moves(self, moves):
+        """Activa la capa de avance con los tramos de toolpath_moves()."""
+        self.progress_moves = moves
+        self.done_moves = 0
+        self.head_position = None
+        self._scene = None
+        self.Refresh()
+
+    def clear_progress(self):
+        self.progress_moves = None
+        self.done_moves = 0
+        self.head_position = None
+        self._scene = None
+        self.Refresh()
+
+    def set_progress(self, line):
+        """
+        Marca como ejecutados los tramos hasta la línea line (incluida). Los
+        nuevos se pintan sobre la escena guardada y solo se invalida su zona.
+        """
+        # numpy se importa aquí para no cargarlo antes de abrir la ventana
+        import numpy as np
+
+        if self.progress_moves is None:
+            return
+        done = int(np.searchsorted(self.progress_moves["lines"], line, side="right"))
+        if done == self.done_moves:
+            return
+        if done < self.done_moves or not self._scene_is_current():
+            # Vuelta atrás (nuevo envío): se repinta todo
+            self.done_moves = done
+            self._scene = None
+            self.Refresh()
+            return
+        start, self.done_moves = self.done_moves, done
+        dc = wx.MemoryDC(self._scene)
+        gc = wx.GraphicsContext.Create(dc)
+        gc.SetTransform(self.get_transform_matrix())
+        self.draw_done_moves(gc, start, done)
+        del gc
+        dc.SelectObject(wx.NullBitmap)
+        segments = self.progress_moves["segments"][start:done]
+        x = np.concatenate((segments[:, 0], segments[:, 2]))
+        y = np.concatenate((segments[:, 1], segments[:, 3]))
+        self._refresh_world_rect(x.min(), y.min(), x.max(), y.max(), margin=3)
+
+    def set_head_position(self, position):
+        """Mueve la marca del cabezal a position (x, y) o la quita con None."""
+        if position == self.head_position:
+            return
+        for point in (self.head_position, position):
+            if point is not None:
+                x, y = point
+                self._refresh_world_rect(x, y, x, y, margin=HEAD_RADIUS + 2)
+        self.head_position = position
+
+    def _refresh_world_rect(self, min_x, min_y, max_x, max_y, margin):
+        left = int(self.offset_x + min_x * self.scale) - margin
+        right = int(self.offset_x + max_x * self.scale) + margin + 1
+        top = int(self.offset_y - max_y * self.scale) - margin
+        bottom = int(self.offset_y - min_y * self.scale) + margin + 1
+        self.RefreshRect(wx.Rect(left, top, right - left, bottom - top), False)
+
+    def _view(self):
+        return (self.scale, self.offset_x, self.offset_y, tuple(self.GetClientSize()))
+
+    def _scene_is_current(self):
+        return self._scene is not None and self._scene_view == self._view()
+
+    def _build_scene(self):
+        """Dibuja la escena completa (preview y tramos ejecutados) en un bitmap."""
+        canvas_w, canvas_h = self.GetClientSize()
+        self._scene = wx.Bitmap(max(canvas_w, 1), max(canvas_h, 1))
+        self._scene_view = self._view()
+        dc = wx.MemoryDC(self._scene)
+        dc.SetBackground(wx.Brush((235, 235, 235)))
+        dc.Clear()
+        gc = wx.GraphicsContext.Create(dc)
+        gc.SetTransform(self.get_transform_matrix())
+        self.draw(gc)
+        self.draw_done_moves(gc, 0, self.done_moves)
+        del gc
+        dc.SelectObject(wx.NullBitmap)
+
     def zoom_to_fit(self):
         """Ajusta el zoom y el pan para que la geometría ocupe toda la vista."""
         canvas_w, canvas_h = self.GetClientSize()
@@ -67,6 +165,9 @@ class VectorCanvas(wx.Panel):
         return matrix
 
     def on_paint(self, event):
+        if self.progress_moves is not None and self.has_valid_content:
+            self.on_paint_progress()
+            return
         dc = wx.AutoBufferedPaintDC(self)
         dc.SetBackground(wx.Brush((235, 235, 235)))
 
@@ -91,7 +192,53 @@ class VectorCanvas(wx.Panel):
 
         # gc.EndLayer()
 
+    def on_paint_progress(self):
+        # La región a repintar la recorta wx: solo se copia esa parte del bitmap
+        dc = wx.AutoBufferedPaintDC(self)
+        if not self._scene_is_current():
+            self._build_scene()
+        dc.DrawBitmap(self._scene, 0, 0)
+        if self.head_position is not None:
+            x, y = self.head_position
+            px = self.offset_x + x * self.scale
+            py = self.offset_y - y * self.scale
+            gc = wx.GraphicsContext.Create(dc)
+            gc.SetPen(gc.CreatePen(wx.GraphicsPenInfo(wx.BLACK, 2)))
+            gc.SetBrush(wx.Brush(wx.Colour(255, 255, 255, 160)))
+            diameter = 2 * HEAD_RADIUS
+            gc.DrawEllipse(px - HEAD_RADIUS, py - HEAD_RADIUS, diameter, diameter)
+            gc.StrokeLine(px - HEAD_RADIUS, py, px + HEAD_RADIUS, py)
+            gc.StrokeLine(px, py - HEAD_RADIUS, px, py + HEAD_RADIUS)
+
+    def draw_done_moves(self, gc, start, stop):
+        """Dibuja los tramos ejecutados start..stop sobre la preview."""
+        if stop <= start:
+            return
+        segments = self.progress_moves["segments"][start:stop].tolist()
+        burning = self.progress_moves["burning"][start:stop].tolist()
+        width = 2.0 / self.scale
+        for color, selected in ((DONE_TRAVEL_COLOR, False), (DONE_BURN_COLOR, True)):
+            path = gc.CreatePath()
+            empty = True
+            for (x0, y0, x1, y1), burn in zip(segments, burning):
+                if burn == selected:
+                    path.MoveToPoint(x0, y0)
+                    path.AddLineToPoint(x1, y1)
+                    empty = False
+            if not empty:
+                gc.SetPen(
+                    gc.CreatePen(wx.GraphicsPenInfo(wx.Colour(*color), width))
+                )
+                gc.StrokePath(path)
+
+    @instrumentation.traced("draw")
     def draw(self, gc):
+        if instrumentation.is_enabled():
+            polygons = self.graphic_info["polygons"]
+            instrumentation.count(
+                polygons=len(polygons),
+                vertices=sum(len(ring) for p in polygons for ring in p["points"]),
+            )
         cut_width = 1.0 / self.scale
         for poly in self.graphic_info["polygons"]:
             polygon = poly["points"]